@@ -0,0 +1,69 @@
+"""Add text block search index
+
+Revision ID: 352999a2821a
+Revises: 3acc25d6e8c4
+Create Date: 2026-10-18 03:30:35
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '352999a2821a'
+down_revision: Union[str, None] = '3acc25d6e8c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # 'simple' keeps German and English tokens unstemmed; the column is
+        # generated, so writers (including COPY) never have to fill it in
+        op.execute("""
+            ALTER TABLE text_blocks ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text_content, ''))) STORED
+        """)
+        op.create_index('ix_text_blocks_search_vector', 'text_blocks', ['search_vector'],
+                        unique=False, postgresql_using='gin')
+    elif dialect == 'sqlite':
+        # External-content FTS5 index kept in sync by triggers
+        op.execute("""
+            CREATE VIRTUAL TABLE text_blocks_fts USING fts5(
+                text_content, content='text_blocks', content_rowid='id'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER text_blocks_fts_insert AFTER INSERT ON text_blocks BEGIN
+                INSERT INTO text_blocks_fts(rowid, text_content) VALUES (new.id, new.text_content);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER text_blocks_fts_delete AFTER DELETE ON text_blocks BEGIN
+                INSERT INTO text_blocks_fts(text_blocks_fts, rowid, text_content)
+                VALUES ('delete', old.id, old.text_content);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER text_blocks_fts_update AFTER UPDATE OF text_content ON text_blocks BEGIN
+                INSERT INTO text_blocks_fts(text_blocks_fts, rowid, text_content)
+                VALUES ('delete', old.id, old.text_content);
+                INSERT INTO text_blocks_fts(rowid, text_content) VALUES (new.id, new.text_content);
+            END
+        """)
+        op.execute("INSERT INTO text_blocks_fts(text_blocks_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_text_blocks_search_vector', table_name='text_blocks')
+        op.drop_column('text_blocks', 'search_vector')
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS text_blocks_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS text_blocks_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS text_blocks_fts_insert")
+        op.execute("DROP TABLE IF EXISTS text_blocks_fts")
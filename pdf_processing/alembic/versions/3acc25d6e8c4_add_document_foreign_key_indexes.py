@@ -0,0 +1,29 @@
+"""Add document foreign key indexes
+
+Revision ID: 3acc25d6e8c4
+Revises: b4418702c4c1
+Create Date: 2026-10-18 03:28:38
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3acc25d6e8c4'
+down_revision: Union[str, None] = 'b4418702c4c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # text_blocks.document_id is covered by ix_text_blocks_document_page_y0
+    op.create_index('ix_style_statistics_document_id', 'style_statistics', ['document_id'], unique=False)
+    op.create_index('ix_document_analyses_document_id', 'document_analyses', ['document_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_analyses_document_id', table_name='document_analyses')
+    op.drop_index('ix_style_statistics_document_id', table_name='style_statistics')
@@ -0,0 +1,50 @@
+"""Add processing jobs
+
+Revision ID: 41337503e772
+Revises: 352999a2821a
+Create Date: 2026-10-18 03:49:41
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '41337503e772'
+down_revision: Union[str, None] = '352999a2821a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('processing_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('strategy', sa.String(), nullable=False),
+        sa.Column('force', sa.Boolean(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('progress', sa.Float(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('result_document_id', sa.Integer(), nullable=True),
+        sa.Column('worker', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+        sa.ForeignKeyConstraint(['result_document_id'], ['documents.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_processing_jobs_document_id', 'processing_jobs', ['document_id'], unique=False)
+    op.create_index('ix_processing_jobs_status_run_after', 'processing_jobs', ['status', 'run_after'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_processing_jobs_status_run_after', table_name='processing_jobs')
+    op.drop_index('ix_processing_jobs_document_id', table_name='processing_jobs')
+    op.drop_table('processing_jobs')
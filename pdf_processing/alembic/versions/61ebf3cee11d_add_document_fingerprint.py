@@ -0,0 +1,36 @@
+"""Add document fingerprint
+
+Revision ID: 61ebf3cee11d
+Revises: 6d7ccf81af5f
+Create Date: 2026-10-18 03:23:38
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '61ebf3cee11d'
+down_revision: Union[str, None] = '6d7ccf81af5f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('file_hash', sa.String(), nullable=True))
+    op.add_column('documents', sa.Column('file_size', sa.BigInteger(), nullable=True))
+    op.add_column('documents', sa.Column('file_mtime', sa.Float(), nullable=True))
+    op.add_column('documents', sa.Column('extractor_version', sa.String(), nullable=True))
+    op.create_index('ix_documents_fingerprint', 'documents', ['file_hash', 'strategy', 'extractor_version'], unique=False)
+    op.create_index('ix_documents_file_stat', 'documents', ['file_path', 'file_size', 'file_mtime'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_file_stat', table_name='documents')
+    op.drop_index('ix_documents_fingerprint', table_name='documents')
+    op.drop_column('documents', 'extractor_version')
+    op.drop_column('documents', 'file_mtime')
+    op.drop_column('documents', 'file_size')
+    op.drop_column('documents', 'file_hash')
@@ -0,0 +1,72 @@
+"""Add text block bbox columns
+
+Revision ID: b4418702c4c1
+Revises: 61ebf3cee11d
+Create Date: 2026-10-18 03:27:09
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4418702c4c1'
+down_revision: Union[str, None] = '61ebf3cee11d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('text_blocks', sa.Column('x0', sa.Float(), nullable=True))
+    op.add_column('text_blocks', sa.Column('y0', sa.Float(), nullable=True))
+    op.add_column('text_blocks', sa.Column('x1', sa.Float(), nullable=True))
+    op.add_column('text_blocks', sa.Column('y1', sa.Float(), nullable=True))
+
+    # Backfill the typed columns from the JSON bbox
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            UPDATE text_blocks SET
+                x0 = (bbox_coordinates->>'x0')::float,
+                y0 = (bbox_coordinates->>'y0')::float,
+                x1 = (bbox_coordinates->>'x1')::float,
+                y1 = (bbox_coordinates->>'y1')::float
+            WHERE bbox_coordinates IS NOT NULL
+        """)
+    else:
+        op.execute("""
+            UPDATE text_blocks SET
+                x0 = json_extract(bbox_coordinates, '$.x0'),
+                y0 = json_extract(bbox_coordinates, '$.y0'),
+                x1 = json_extract(bbox_coordinates, '$.x1'),
+                y1 = json_extract(bbox_coordinates, '$.y1')
+            WHERE bbox_coordinates IS NOT NULL
+        """)
+
+    with op.batch_alter_table('text_blocks') as batch_op:
+        batch_op.alter_column('bbox_coordinates', existing_type=sa.JSON(), nullable=True)
+    op.create_index('ix_text_blocks_document_page_y0', 'text_blocks', ['document_id', 'page_number', 'y0'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_text_blocks_document_page_y0', table_name='text_blocks')
+    # Rows written without a JSON bbox get one rebuilt from the typed columns
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            UPDATE text_blocks
+            SET bbox_coordinates = json_build_object('x0', x0, 'y0', y0, 'x1', x1, 'y1', y1)
+            WHERE bbox_coordinates IS NULL
+        """)
+    else:
+        op.execute("""
+            UPDATE text_blocks
+            SET bbox_coordinates = json_object('x0', x0, 'y0', y0, 'x1', x1, 'y1', y1)
+            WHERE bbox_coordinates IS NULL
+        """)
+    with op.batch_alter_table('text_blocks') as batch_op:
+        batch_op.alter_column('bbox_coordinates', existing_type=sa.JSON(), nullable=False)
+        batch_op.drop_column('y1')
+        batch_op.drop_column('x1')
+        batch_op.drop_column('y0')
+        batch_op.drop_column('x0')
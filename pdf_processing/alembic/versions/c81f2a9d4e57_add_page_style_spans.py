@@ -0,0 +1,36 @@
+"""Add page style spans
+
+Revision ID: c81f2a9d4e57
+Revises: 41337503e772
+Create Date: 2026-10-18 04:56:45
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f2a9d4e57'
+down_revision: Union[str, None] = '41337503e772'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('page_style_spans',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('page_number', sa.Integer(), nullable=False),
+        sa.Column('span_count', sa.Integer(), nullable=False),
+        sa.Column('rects', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_page_style_spans_document_page', 'page_style_spans', ['document_id', 'page_number'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_page_style_spans_document_page', table_name='page_style_spans')
+    op.drop_table('page_style_spans')
@@ -0,0 +1,40 @@
+"""Add active job unique index
+
+Revision ID: e2b7c4d91a06
+Revises: c81f2a9d4e57
+Create Date: 2026-10-18 07:54:54
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c4d91a06'
+down_revision: Union[str, None] = 'c81f2a9d4e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Concurrent requests may already have queued duplicates; the oldest
+    # active job of each document and strategy is kept
+    op.execute("""
+        UPDATE processing_jobs
+        SET status = 'failed', error = 'Duplicate of an earlier job', finished_at = CURRENT_TIMESTAMP
+        WHERE status IN ('queued', 'running')
+          AND id NOT IN (
+              SELECT min(id) FROM processing_jobs
+              WHERE status IN ('queued', 'running')
+              GROUP BY document_id, strategy
+          )
+    """)
+    op.create_index('ux_processing_jobs_active', 'processing_jobs', ['document_id', 'strategy'], unique=True,
+                    postgresql_where=sa.text("status IN ('queued', 'running')"),
+                    sqlite_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade() -> None:
+    op.drop_index('ux_processing_jobs_active', table_name='processing_jobs')
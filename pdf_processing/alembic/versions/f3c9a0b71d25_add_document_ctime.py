@@ -0,0 +1,28 @@
+"""Add document ctime
+
+Revision ID: f3c9a0b71d25
+Revises: e2b7c4d91a06
+Create Date: 2026-10-18 08:13:34
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c9a0b71d25'
+down_revision: Union[str, None] = 'e2b7c4d91a06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing documents have no ctime, so the next run hashes each file
+    # once and records it
+    op.add_column('documents', sa.Column('file_ctime', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('documents', 'file_ctime')
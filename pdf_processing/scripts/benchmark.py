@@ -0,0 +1,851 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import argparse
+import multiprocessing
+import random
+import resource
+import re
+from datetime import datetime
+import fitz
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from src.config.settings import DATABASE_URL
+from src.database import queries
+from src.database.models import Base, Document, TextBlock, DocumentAnalysis, StyleStatistics
+from src.database.persistence import save_result, save_batches, bulk_insert, delete_documents
+from src.database.search import search_text_blocks
+from src.pdf_processing.cleaning import TextCleaner
+from src.pdf_processing.models import TextLine, TextSpan
+from src.pdf_processing.processor import PDFProcessor
+from src.pdf_processing.span_table import SpanTable
+from src.pdf_processing.text_analysis import TextAnalyzer
+
+def make_synthetic_pdf(path: str, pages: int, lines_per_page: int, spans_per_line: int = 3):
+    """Write a PDF with a fixed number of lines (each split into several spans) per page"""
+    doc = fitz.open()
+    fonts = ["helv", "hebo", "heit"]
+    for page_num in range(pages):
+        page = doc.new_page(width=595, height=lines_per_page * 12 + 100)
+        for line_num in range(lines_per_page):
+            x = 50
+            for span_num in range(spans_per_line):
+                text = f"Zeile {line_num} Teil {span_num} "
+                page.insert_text((x, 60 + line_num * 12), text, fontsize=10,
+                                 fontname=fonts[span_num % len(fonts)])
+                x += 150
+        # Every insert_text() adds a content stream; real pages have one or
+        # a few, and per-object costs would otherwise dominate big documents
+        page.clean_contents()
+    doc.save(path, garbage=3)
+    doc.close()
+
+def bench_span_memory(args) -> bool:
+    """Peak memory of analysis extraction for one page must grow linearly with the page size"""
+    sizes = [25, 50, 100, 200, 400]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The first extraction also pays one-off allocations (fonts, caches,
+        # lazy imports) that would inflate the smallest page's baseline
+        warm_up = os.path.join(tmp_dir, "warm_up.pdf")
+        make_synthetic_pdf(warm_up, pages=1, lines_per_page=sizes[0])
+        PDFProcessor(warm_up, "analysis")._extract_pages(0, 1)
+
+        for lines in sizes:
+            path = os.path.join(tmp_dir, f"lines_{lines}.pdf")
+            make_synthetic_pdf(path, pages=1, lines_per_page=lines)
+            processor = PDFProcessor(path, "analysis")
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            [(blocks, analyzer, _)] = processor._extract_pages(0, 1)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            span_count = sum(stats.count for stats in analyzer.style_stats.values())
+            results.append((lines, span_count, peak, elapsed))
+            del blocks, analyzer, processor
+
+    print(f"{'lines':>6} {'spans':>7} {'peak KiB':>10} {'B/line':>8} {'ms':>8}")
+    for lines, span_count, peak, elapsed in results:
+        print(f"{lines:>6} {span_count:>7} {peak / 1024:>10.1f} {peak / lines:>8.0f} {elapsed * 1000:>8.1f}")
+
+    # Linear growth keeps bytes-per-line roughly constant; quadratic growth
+    # would multiply it by the 16x size ratio between the first and last run
+    first, last = results[0], results[-1]
+    ratio = (last[2] / last[0]) / (first[2] / first[0])
+    ok = ratio < args.max_ratio
+    print(f"bytes/line ratio (largest/smallest page): {ratio:.2f} "
+          f"({'ok' if ok else 'FAIL'}, limit {args.max_ratio})")
+    return ok
+
+def _layout_spans(strategy, layout, page_number: int):
+    """One TextSpan object per span, as the analysis strategy used to build them"""
+    spans = []
+    for block in layout["blocks"]:
+        for line in block.get("lines", ()):
+            for span in line["spans"]:
+                is_bold, is_italic, is_underlined = strategy._get_font_flags(span.get("flags", 0))
+                spans.append(TextSpan(
+                    text=span["text"], x0=span["bbox"][0], y0=span["bbox"][1],
+                    x1=span["bbox"][2], y1=span["bbox"][3], font_name=span["font"],
+                    font_size=span["size"], font_color=strategy._get_color_string(span.get("color")),
+                    is_bold=is_bold, is_italic=is_italic, is_underlined=is_underlined,
+                    page_number=page_number
+                ))
+    return spans
+
+def _retained(build):
+    """Result of build() and the memory it still holds once built"""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+def bench_span_table(args) -> bool:
+    """Memory and analysis time of per-span objects versus per-page SpanTables"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(tmp_dir, "spans.pdf")
+            make_synthetic_pdf(path, pages=args.pages, lines_per_page=60, spans_per_line=4)
+        strategy = PDFProcessor.STRATEGIES["analysis"]
+        with fitz.open(path) as doc:
+            layouts = [page.get_text("dict") for page in doc]
+
+    page_spans, span_bytes = _retained(lambda: [
+        _layout_spans(strategy, layout, number + 1) for number, layout in enumerate(layouts)
+    ])
+    tables, table_bytes = _retained(lambda: [
+        SpanTable.from_layout(layout, number + 1, strategy._get_color_string)
+        for number, layout in enumerate(layouts)
+    ])
+    span_count = sum(len(spans) for spans in page_spans)
+
+    start = time.perf_counter()
+    by_objects = TextAnalyzer()
+    for spans in page_spans:
+        by_objects.add_spans(spans)
+    object_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    by_table = TextAnalyzer()
+    for table in tables:
+        by_table.add_table(table)
+    table_seconds = time.perf_counter() - start
+
+    print(f"{len(layouts)} pages, {span_count} spans")
+    print(f"{'':>10} {'KiB held':>10} {'B/span':>8} {'analysis ms':>12}")
+    print(f"{'objects':>10} {span_bytes / 1024:>10.0f} {span_bytes / span_count:>8.0f} {object_seconds * 1000:>12.1f}")
+    print(f"{'table':>10} {table_bytes / 1024:>10.0f} {table_bytes / span_count:>8.0f} {table_seconds * 1000:>12.1f}")
+
+    expected, actual = by_objects.report(), by_table.report()
+    ok = [s["count"] for s in expected["common_styles"]] == [s["count"] for s in actual["common_styles"]] and all(
+        abs(expected["line_metrics"][key] - actual["line_metrics"][key]) < 1e-6 for key in expected["line_metrics"]
+    )
+    print("reports match" if ok else "FAIL: reports differ")
+    return ok
+
+def _legacy_group_into_lines(spans, y_tolerance: float = 3):
+    """The previous sort-and-walk line grouping, kept for comparison"""
+    def create_line(line_spans):
+        return TextLine(
+            spans=line_spans,
+            y0=min(s.y0 for s in line_spans),
+            y1=max(s.y1 for s in line_spans),
+            x0=min(s.x0 for s in line_spans),
+            x1=max(s.x1 for s in line_spans)
+        )
+
+    lines, current_line, current_y = [], [], None
+    for span in sorted(spans, key=lambda s: (s.y0, s.x0)):
+        if current_y is None:
+            current_y = span.y0
+        if abs(span.y0 - current_y) <= y_tolerance:
+            current_line.append(span)
+        else:
+            if current_line:
+                lines.append(create_line(current_line))
+            current_line = [span]
+            current_y = span.y0
+    if current_line:
+        lines.append(create_line(current_line))
+    return lines
+
+def _same_lines(expected, actual) -> bool:
+    return len(expected) == len(actual) and all(
+        [id(s) for s in a.spans] == [id(s) for s in b.spans]
+        and (a.x0, a.y0, a.x1, a.y1) == (b.x0, b.y0, b.x1, b.y1)
+        for a, b in zip(expected, actual)
+    )
+
+def bench_line_grouping(args) -> bool:
+    """Old and vectorized _group_into_lines, per page and over a whole document"""
+    rng = random.Random(0)
+    pages = []
+    for page_number in range(1, args.pages + 1):
+        spans = []
+        for line in range(args.lines):
+            # Baselines jitter by up to a point; spans arrive in content-stream order
+            baseline = 60 + line * 12 + rng.uniform(-1, 1)
+            for part in range(args.spans_per_line):
+                y0 = baseline + rng.uniform(-1, 1)
+                x0 = 50 + part * 120 + rng.uniform(0, 10)
+                spans.append(TextSpan(
+                    text="Teil", x0=x0, y0=y0, x1=x0 + 100, y1=y0 + 10, font_name="Helvetica",
+                    font_size=10.0, font_color="#000000", is_bold=False, is_italic=False,
+                    is_underlined=False, page_number=page_number
+                ))
+        rng.shuffle(spans)
+        pages.append(spans)
+    document = [span for spans in pages for span in spans]
+
+    analyzer = TextAnalyzer()
+    ok = True
+    print(f"{'':>10} {'spans':>8} {'legacy ms':>10} {'numpy ms':>10}")
+    for label, batches in (("per page", pages), ("document", [document])):
+        timings = {}
+        for name, group in (("legacy", _legacy_group_into_lines), ("numpy", analyzer._group_into_lines)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = [group(batch) for batch in batches]
+                best = min(best, time.perf_counter() - start)
+            timings[name] = (best, results)
+        same = all(_same_lines(a, b) for a, b in zip(timings["legacy"][1], timings["numpy"][1]))
+        ok = ok and same
+        print(f"{label:>10} {len(document):>8} {timings['legacy'][0] * 1000:>10.1f} "
+              f"{timings['numpy'][0] * 1000:>10.1f} {'' if same else 'FAIL: lines differ'}")
+    return ok
+
+def _rss_kib(field: str) -> int:
+    """A VmRSS/VmHWM line of /proc/self/status, in KiB"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+def _reset_peak_rss() -> bool:
+    """Restart the peak RSS (VmHWM) from the current RSS; Linux only"""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+def _render_in_worker(mode: str, path: str, output_path: str) -> tuple:
+    """Render with every style of the document highlighted; returns (baseline, peak) RSS in KiB.
+
+    Where the peak can be reset, it covers the rendering only; otherwise it
+    is the process's peak, which includes the extraction before it.
+    """
+    processor = PDFProcessor(path, "analysis")
+    analyzer = TextAnalyzer()
+    for page_num in range(len(processor.doc)):
+        analyzer.add_table(processor.strategy.extract_page(processor.doc[page_num])[1])
+    style_stats = [
+        StyleStatistics(font_name=s["font_name"], font_size=s["font_size"], font_color=s["font_color"],
+                        is_bold=s["is_bold"], is_italic=s["is_italic"])
+        for s in analyzer.report()["common_styles"]
+    ]
+    if _reset_peak_rss():
+        baseline, peak = _rss_kib("VmRSS"), lambda: _rss_kib("VmHWM")
+    else:
+        baseline, peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                          lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    with open(output_path + ".started", "w"):
+        pass
+    if mode == "in-memory":
+        processor.strategy.create_highlighted_pdf(processor.doc, output_path, style_stats)
+    else:
+        processor.strategy.write_highlighted_pdf(processor.doc, output_path, style_stats)
+    return baseline, peak()
+
+def bench_highlight_render(args) -> bool:
+    """Time to first output byte and peak worker memory of both highlighted-PDF renderers"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(tmp_dir, "render.pdf")
+            make_synthetic_pdf(path, pages=args.pages, lines_per_page=40)
+        print(f"{'mode':>12} {'first byte s':>13} {'done s':>8} {'MiB':>8} {'peak RSS MiB':>13}")
+        ok = True
+        for mode in ("in-memory", "incremental"):
+            output_path = os.path.join(tmp_dir, f"{mode}.pdf")
+            # A fresh process per mode, so peak RSS is not inherited from the other run
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                future = pool.submit(_render_in_worker, mode, path, output_path)
+                while not os.path.exists(output_path + ".started") and not future.done():
+                    time.sleep(0.01)
+                start = time.perf_counter()
+                first_byte = None
+                while not future.done():
+                    if first_byte is None and os.path.exists(output_path) and os.path.getsize(output_path):
+                        first_byte = time.perf_counter() - start
+                    time.sleep(0.005)
+                baseline, peak = future.result()
+                done = time.perf_counter() - start
+            with fitz.open(path) as source, fitz.open(output_path) as rendered:
+                ok = ok and len(rendered) == len(source)
+            growth = (peak - baseline) / 1024
+            # The incremental renderer holds one chunk of pages at a time, so
+            # its growth must not depend on the page count
+            bounded = mode != "incremental" or growth <= args.max_growth_mib
+            ok = ok and bounded
+            print(f"{mode:>12} {first_byte if first_byte is not None else done:>13.2f} {done:>8.2f} "
+                  f"{os.path.getsize(output_path) / 2 ** 20:>8.1f} {peak / 1024:>13.0f}"
+                  f"  (+{growth:.1f} while rendering){'' if bounded else ' FAIL'}")
+        if not ok:
+            print(f"FAIL: incremental rendering grew by more than {args.max_growth_mib:.1f} MiB "
+                  f"or lost pages")
+        return ok
+
+def make_synthetic_blocks(count: int):
+    """Build TextBlock instances shaped like real extraction output"""
+    blocks = []
+    for i in range(count):
+        blocks.append(TextBlock(
+            page_number=i // 50 + 1,
+            text_content=f"Absatz {i}: Das ist ein Beispieltext\tmit Tabulator und \\ Backslash",
+            bbox_coordinates={"x0": 72.0, "y0": 60.0 + (i % 50) * 14, "x1": 520.5, "y1": 72.0 + (i % 50) * 14},
+            font_size=11.0,
+            font_name="Helvetica",
+            font_color="#000000",
+            block_type="body"
+        ))
+    return blocks
+
+def bench_persistence(args) -> bool:
+    """Compare ORM db.add() persistence with the bulk COPY/executemany writer"""
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"{engine.dialect.name}: inserting {args.blocks} text blocks")
+    timings = {}
+    for label, bulk in (("orm", False), ("bulk", True)):
+        blocks = make_synthetic_blocks(args.blocks)
+        document = Document(
+            file_path="benchmark.pdf",
+            processed_at=datetime.now(),
+            file_name="benchmark.pdf",
+            strategy="benchmark"
+        )
+        db = Session()
+        try:
+            start = time.perf_counter()
+            save_result(db, document, blocks, bulk=bulk)
+            db.flush()
+            timings[label] = time.perf_counter() - start
+        finally:
+            # Nothing from the benchmark is kept
+            db.rollback()
+            db.close()
+        print(f"{label:>5}: {timings[label]:8.3f}s  ({args.blocks / timings[label]:,.0f} rows/s)")
+
+    print(f"speedup: {timings['orm'] / timings['bulk']:.1f}x")
+    engine.dispose()
+    return True
+
+def seed_corpus(db, documents: int, pages: int, blocks_per_page: int, page_texts=None):
+    """Insert a synthetic corpus through the bulk writer
+
+    page_texts(page) returns the texts of a page's blocks; by default they are
+    "Block {i} auf Seite {page}".
+    """
+    now = datetime.now()
+    document_rows = [
+        {"file_path": f"doc_{i}.pdf", "processed_at": now, "file_name": f"doc_{i}.pdf", "strategy": "benchmark"}
+        for i in range(documents)
+    ]
+    bulk_insert(db, Document.__table__, document_rows)
+    document_ids = db.execute(text("SELECT id FROM documents WHERE strategy = 'benchmark'")).scalars().all()
+
+    def block_rows():
+        for document_id in document_ids:
+            for page in range(1, pages + 1):
+                texts = page_texts(page) if page_texts else (f"Block {i} auf Seite {page}" for i in range(blocks_per_page))
+                for i, text_content in enumerate(texts):
+                    y0 = 60.0 + i * 14
+                    yield {
+                        "document_id": document_id, "page_number": page,
+                        "text_content": text_content, "bbox_coordinates": None,
+                        "x0": 72.0, "y0": y0, "x1": 500.0, "y1": y0 + 12,
+                        "font_size": 11.0, "font_name": "Helvetica", "font_color": "#000000",
+                        "block_type": "body"
+                    }
+
+    bulk_insert(db, TextBlock.__table__, block_rows())
+    bulk_insert(db, DocumentAnalysis.__table__, (
+        {"document_id": document_id, "analysis_data": {"common_styles": []}, "created_at": now}
+        for document_id in document_ids
+    ))
+    bulk_insert(db, StyleStatistics.__table__, (
+        {"document_id": document_id, "font_name": "Helvetica", "font_size": 9.0 + i, "font_color": "#000000",
+         "is_bold": False, "is_italic": False, "is_underlined": False, "occurrence_count": 100,
+         "examples": None, "page_distribution": None, "y_range": None, "x_range": None}
+        for document_id in document_ids for i in range(10)
+    ))
+    return document_ids
+
+def _plan_uses_index(db, statement) -> tuple:
+    """Return (uses index for every filtered table, plan text) for a statement"""
+    dialect = db.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        nodes = []
+
+        def walk(node):
+            nodes.append(node)
+            for child in node.get("Plans", []):
+                walk(child)
+
+        walk(plan[0]["Plan"])
+        seq_scans = [node for node in nodes if node["Node Type"] == "Seq Scan"]
+        lines = [f"{node['Node Type']} on {node.get('Relation Name', '-')}"
+                 + (f" using {node['Index Name']}" if "Index Name" in node else "") for node in nodes]
+        return not seq_scans, "; ".join(lines)
+
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    details = [row[-1] for row in rows]
+    full_scans = [d for d in details if d.startswith("SCAN ") and "USING" not in d]
+    return not full_scans, "; ".join(details)
+
+def bench_query_plans(args) -> bool:
+    """Seed a synthetic corpus and assert every endpoint query is answered from an index"""
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    ok = True
+    try:
+        start = time.perf_counter()
+        document_ids = seed_corpus(db, args.documents, args.pages, args.blocks_per_page)
+        db.execute(text("ANALYZE"))
+        print(f"{engine.dialect.name}: seeded {len(document_ids)} documents, "
+              f"{len(document_ids) * args.pages * args.blocks_per_page} text blocks "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        probe_id = document_ids[len(document_ids) // 2]
+        for name, statement in queries.endpoint_queries(probe_id):
+            uses_index, plan = _plan_uses_index(db, statement)
+            ok = ok and uses_index
+            print(f"{'ok  ' if uses_index else 'FAIL'} {name}: {plan}")
+    finally:
+        # Nothing from the check is kept
+        db.rollback()
+        db.close()
+        engine.dispose()
+    return ok
+
+def _search_vocabulary(size: int) -> List[str]:
+    """Distinct pseudo-words; with Zipf weights the first is in most blocks"""
+    syllables = ["ver", "wal", "tung", "an", "trag", "be", "scheid", "recht", "la", "ge",
+                 "mit", "tel", "zu", "stand", "ord", "nung", "frei", "heit", "amt", "kos"]
+    words = []
+    for i in range(size):
+        parts = []
+        while True:
+            parts.append(syllables[i % len(syllables)])
+            i //= len(syllables)
+            if not i:
+                break
+        words.append("".join(parts))
+    return words
+
+def bench_search(args) -> bool:
+    """Seed a corpus with Zipf-distributed words and time /search queries for common and rare terms"""
+    words = _search_vocabulary(args.vocabulary)
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cum_weights.append(total)
+    rng = random.Random(0)
+
+    def page_texts(page):
+        drawn = rng.choices(words, cum_weights=cum_weights, k=args.blocks_per_page * args.words_per_block)
+        return (" ".join(drawn[i:i + args.words_per_block])
+                for i in range(0, len(drawn), args.words_per_block))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_url = args.database_url or "sqlite:///" + os.path.join(tmp_dir, "search.db")
+        engine = create_engine(database_url)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        ok = True
+        try:
+            start = time.perf_counter()
+            document_ids = seed_corpus(db, args.documents, args.pages, args.blocks_per_page, page_texts)
+            db.execute(text("ANALYZE"))
+            blocks = len(document_ids) * args.pages * args.blocks_per_page
+            print(f"{engine.dialect.name}: seeded {blocks:,} text blocks in {time.perf_counter() - start:.1f}s")
+
+            queries_to_time = [
+                ("most common word", words[0], None),
+                ("common word", words[9], None),
+                ("rare word", words[-1], None),
+                ("two words", f"{words[1]} {words[50]}", None),
+                ("common, one document", words[0], document_ids[len(document_ids) // 2]),
+            ]
+            print(f"{'query':>22} {'hits':>5} {'median ms':>10} {'max ms':>8}")
+            for label, query, document_id in queries_to_time:
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    hits = search_text_blocks(db, query, limit=20, document_id=document_id)["results"]
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                ok = ok and timings[-1] <= args.max_ms
+                print(f"{label:>22} {len(hits):>5} {timings[len(timings) // 2]:>10.1f} {timings[-1]:>8.1f}")
+        finally:
+            # Nothing from the benchmark is kept
+            db.rollback()
+            db.close()
+            engine.dispose()
+    if not ok:
+        print(f"FAIL: a query took longer than {args.max_ms:.0f} ms")
+    return ok
+
+def _timed_get(url: str, timeout: float) -> tuple:
+    """GET a URL and return (status, seconds); the body is read and discarded"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return status, time.perf_counter() - start
+
+def bench_http_load(args) -> bool:
+    """Throughput and latency of a running web app under concurrent requests"""
+    base_url = args.url.rstrip("/")
+    urls = [base_url + path for path in args.paths]
+    # Round-robin over the paths so slow and fast endpoints are interleaved
+    targets = [urls[i % len(urls)] for i in range(args.requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda url: _timed_get(url, args.timeout), targets))
+    elapsed = time.perf_counter() - start
+
+    ok = all(status is not None and status < 500 for status, _ in results)
+    print(f"{args.requests} requests, concurrency {args.concurrency}: "
+          f"{elapsed:.2f}s ({args.requests / elapsed:,.1f} req/s)")
+    for url in urls:
+        latencies = sorted(seconds for (status, seconds), target in zip(results, targets) if target == url)
+        statuses = sorted({str(status) for (status, _), target in zip(results, targets) if target == url})
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"  {url}: p50 {p50 * 1000:7.1f}ms  p95 {p95 * 1000:7.1f}ms  "
+              f"max {latencies[-1] * 1000:7.1f}ms  status {','.join(statuses)}")
+    if not ok:
+        print("FAIL: some requests errored")
+    return ok
+
+CORPUS_WORDS = (
+    "Die Stellungnahme des Ausschusses wurde im Sitzungssaal verlesen und muss bis zum "
+    "Monatsende schriftlich bestätigt werden Der Vertrag regelt Zahlungsfristen Kündigung "
+    "Haftung und Gerichtsstand Alle Beteiligten sollen die Unterlagen vollständig prüfen"
+).split()
+
+def make_block_corpus(count: int, seed: int = 0):
+    """Block texts shaped like extraction output: sentences, dot leaders, numerals, line breaks"""
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(count):
+        words = rng.choices(CORPUS_WORDS, k=rng.randint(4, 60))
+        kind = i % 10
+        if kind == 0:
+            # Table of contents line with a dot leader
+            block = f"{' '.join(words[:4])} {'.' * rng.randint(5, 40)} {rng.randint(1, 300)}"
+        elif kind == 1:
+            block = f"{rng.choice(['I', 'II', 'III', 'IV', 'XII'])}.. {' '.join(words[:6])}"
+        elif kind in (2, 3):
+            # Wrapped lines joined by the strategies, with irregular spacing
+            block = "\n".join(" ".join(words[j:j + 8]) for j in range(0, len(words), 8)) + "  "
+        else:
+            block = " ".join(words) + "."
+        blocks.append(block)
+    return blocks
+
+def _legacy_clean_text(block: str) -> str:
+    """The previous per-call re.sub chain, kept for comparison"""
+    block = re.sub(r'(.)\1', r'\1', block)
+    block = re.sub(r'\.{2,}', '.', block)
+    block = re.sub(r'\s+', ' ', block)
+    block = re.sub(r'([IVX]+)\.+', r'\1.', block)
+    return block.strip()
+
+def _legacy_rules_only(block: str) -> str:
+    """The previous chain without its doubled-character rule: what TextCleaner must match"""
+    block = re.sub(r'\.{2,}', '.', block)
+    block = re.sub(r'\s+', ' ', block)
+    block = re.sub(r'([IVX]+)\.+', r'\1.', block)
+    return block.strip()
+
+def pdf_block_corpus(paths):
+    """Raw (uncleaned) block texts from real PDFs, as the dict strategy joins them"""
+    blocks = []
+    for path in paths:
+        with fitz.open(path) as doc:
+            for page in doc:
+                for block in page.get_text("dict")["blocks"]:
+                    if "lines" in block:
+                        blocks.append(" ".join(
+                            span["text"] for line in block["lines"] for span in line["spans"]
+                        ))
+    return blocks
+
+def bench_clean_text(args) -> bool:
+    """Per-block cost of the old re.sub chain versus the precompiled single-pass cleaner"""
+    blocks = pdf_block_corpus(args.pdf) if args.pdf else make_block_corpus(args.blocks)
+    cleaner = TextCleaner()
+
+    mismatches = [block for block in blocks if cleaner.clean(block) != _legacy_rules_only(block)]
+    mangled = sum(1 for block in blocks if _legacy_clean_text(block) != _legacy_rules_only(block))
+
+    timings = {}
+    for label, clean in (("legacy", _legacy_clean_text), ("cleaner", cleaner.clean)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for block in blocks:
+                clean(block)
+            best = min(best, time.perf_counter() - start)
+        timings[label] = best
+        print(f"{label:>8}: {best * 1e6 / len(blocks):7.2f} us/block")
+
+    print(f"{len(blocks)} blocks, {sum(map(len, blocks)) / len(blocks):.0f} chars on average")
+    print(f"speedup: {timings['legacy'] / timings['cleaner']:.1f}x")
+    print(f"blocks the old doubled-character rule changed: {mangled}")
+    if mismatches:
+        print(f"FAIL: {len(mismatches)} blocks differ from the old rules, e.g. {mismatches[0]!r}")
+    return not mismatches
+
+def _result_rows(result) -> tuple:
+    """Comparable content of a process_document() result, without ids and timestamps"""
+    blocks = [
+        (block.page_number, block.text_content, block.x0, block.y0, block.x1, block.y1,
+         block.font_size, block.font_name, block.font_color, block.block_type)
+        for block in result[1]
+    ]
+    if len(result) == 2:
+        return result[0].strategy, blocks
+    return (result[0].strategy, blocks, result[2].analysis_data,
+            [(row.page_number, row.rects) for row in result[4]])
+
+def bench_fused_strategies(args) -> bool:
+    """One processing run per strategy versus a single pass for all strategies"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(tmp_dir, "strategies.pdf")
+            make_synthetic_pdf(path, pages=args.pages, lines_per_page=60, spans_per_line=4)
+
+        def processor(strategy_name: str) -> PDFProcessor:
+            # No on-disk layouts, so every run parses the pages itself
+            processor = PDFProcessor(path, strategy_name)
+            processor.layout_cache.cache_dir = None
+            return processor
+
+        start = time.perf_counter()
+        separate = [processor(name).process_document() for name in args.strategies]
+        separate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fused = processor(args.strategies[0]).process_strategies(args.strategies)
+        fused_seconds = time.perf_counter() - start
+
+    print(f"strategies: {', '.join(args.strategies)}")
+    print(f"separate runs: {separate_seconds:.2f} s")
+    print(f"single pass:   {fused_seconds:.2f} s ({separate_seconds / fused_seconds:.1f}x)")
+    differing = [
+        name for name, one, other in zip(args.strategies, separate, fused)
+        if _result_rows(one) != _result_rows(other)
+    ]
+    if differing:
+        print(f"FAIL: results differ for {', '.join(differing)}")
+    return not differing
+
+def _save_in_worker(path: str, database_url: str, strategies: List[str], batch_pages: int) -> tuple:
+    """Process and store a PDF; returns (document ids, seconds to first committed row, seconds, peak RSS KiB)"""
+    Session = sessionmaker(bind=create_engine(database_url))
+    db = Session()
+    start = time.perf_counter()
+    first_row = None
+    try:
+        processor = PDFProcessor(path, strategies[0])
+        if batch_pages:
+            def progress(done: int, page_count: int):
+                nonlocal first_row
+                if first_row is None:
+                    first_row = time.perf_counter() - start
+            documents = save_batches(db, processor, strategies, batch_pages, progress=progress)
+        else:
+            documents = [save_result(db, *result) for result in processor.process_strategies(strategies)]
+            db.commit()
+        seconds = time.perf_counter() - start
+        return ([document.id for document in documents], first_row if first_row is not None else seconds,
+                seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    finally:
+        db.close()
+
+def bench_batched_save(args) -> bool:
+    """Peak memory and time to first stored row: one transaction per document versus page batches"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(tmp_dir, "batched.pdf")
+            make_synthetic_pdf(path, pages=args.pages, lines_per_page=60, spans_per_line=4)
+        database_url = args.database_url or "sqlite:///" + os.path.join(tmp_dir, "batched.db")
+        engine = create_engine(database_url)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+
+        print(f"{'mode':>14} {'first row s':>12} {'done s':>8} {'peak RSS MiB':>13} {'blocks':>9}")
+        counts = []
+        for batch_pages in (0, args.batch_pages):
+            # A fresh process per mode, so peak RSS is not inherited from the other run
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                document_ids, first_row, seconds, peak = pool.submit(
+                    _save_in_worker, path, database_url, args.strategies, batch_pages
+                ).result()
+            db = Session()
+            try:
+                counts.append(db.query(TextBlock).filter(TextBlock.document_id.in_(document_ids)).count())
+                delete_documents(db, document_ids)
+                db.commit()
+            finally:
+                db.close()
+            mode = f"batches of {batch_pages}" if batch_pages else "one commit"
+            print(f"{mode:>14} {first_row:>12.2f} {seconds:>8.2f} {peak / 1024:>13.0f} {counts[-1]:>9}")
+        engine.dispose()
+    if counts[0] != counts[1]:
+        print("FAIL: the two modes stored different numbers of text blocks")
+    return counts[0] == counts[1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Performance benchmarks and regression checks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    span_memory = subparsers.add_parser('span-memory',
+                                        help='Check that span hand-off memory is linear in page size')
+    span_memory.add_argument('--max-ratio', type=float, default=2.0,
+                             help='Maximum allowed growth of bytes per line')
+    span_memory.set_defaults(func=bench_span_memory)
+
+    span_table = subparsers.add_parser('span-table',
+                                       help='Compare TextSpan objects with columnar SpanTables')
+    span_table.add_argument('--pdf', help='PDF to analyze (default: a synthetic document)')
+    span_table.add_argument('--pages', type=int, default=200,
+                            help='Pages of the synthetic document')
+    span_table.set_defaults(func=bench_span_table)
+
+    line_grouping = subparsers.add_parser('line-grouping',
+                                          help='Compare the old and the vectorized line grouping')
+    line_grouping.add_argument('--pages', type=int, default=200)
+    line_grouping.add_argument('--lines', type=int, default=60, help='Lines per page')
+    line_grouping.add_argument('--spans-per-line', type=int, default=4)
+    line_grouping.add_argument('--repeat', type=int, default=3)
+    line_grouping.set_defaults(func=bench_line_grouping)
+
+    highlight_render = subparsers.add_parser('highlight-render',
+                                             help='Compare in-memory and incremental highlighted-PDF rendering')
+    highlight_render.add_argument('--pdf', help='PDF to render (default: a synthetic document)')
+    highlight_render.add_argument('--pages', type=int, default=2000,
+                                  help='Pages of the synthetic document')
+    highlight_render.add_argument('--max-growth-mib', type=float, default=7.0,
+                                  help='Largest allowed RSS growth of the incremental renderer')
+    highlight_render.set_defaults(func=bench_highlight_render)
+
+    persistence = subparsers.add_parser('persistence',
+                                        help='Compare ORM and bulk text block inserts')
+    persistence.add_argument('--database-url', default=DATABASE_URL,
+                             help='Database to benchmark against (changes are rolled back)')
+    persistence.add_argument('--blocks', type=int, default=100000,
+                             help='Number of text blocks to insert')
+    persistence.set_defaults(func=bench_persistence)
+
+    query_plans = subparsers.add_parser('query-plans',
+                                        help='Assert endpoint queries use indexes on a seeded corpus')
+    query_plans.add_argument('--database-url', default='sqlite://',
+                             help='Database to seed (changes are rolled back; default: in-memory SQLite)')
+    query_plans.add_argument('--documents', type=int, default=500)
+    query_plans.add_argument('--pages', type=int, default=20)
+    query_plans.add_argument('--blocks-per-page', type=int, default=20)
+    query_plans.set_defaults(func=bench_query_plans)
+
+    search = subparsers.add_parser('search',
+                                   help='Time full-text search on a seeded corpus')
+    search.add_argument('--database-url',
+                        help='Database to seed (changes are rolled back; default: a temporary SQLite file)')
+    search.add_argument('--documents', type=int, default=1000)
+    search.add_argument('--pages', type=int, default=50)
+    search.add_argument('--blocks-per-page', type=int, default=20)
+    search.add_argument('--words-per-block', type=int, default=12)
+    search.add_argument('--vocabulary', type=int, default=50000, help='Distinct words in the corpus')
+    search.add_argument('--repeat', type=int, default=5)
+    search.add_argument('--max-ms', type=float, default=100.0, help='Slowest allowed query')
+    search.set_defaults(func=bench_search)
+
+    http_load = subparsers.add_parser('http-load',
+                                      help='Concurrent request throughput against a running web app')
+    http_load.add_argument('--url', default='http://127.0.0.1:8000',
+                           help='Base URL of the running app')
+    http_load.add_argument('--paths', nargs='+', default=['/', '/view/1', '/api/documents/1/pages'],
+                           help='Paths requested round-robin')
+    http_load.add_argument('--concurrency', type=int, default=32)
+    http_load.add_argument('--requests', type=int, default=2000)
+    http_load.add_argument('--timeout', type=float, default=30.0)
+    http_load.set_defaults(func=bench_http_load)
+
+    clean_text = subparsers.add_parser('clean-text',
+                                       help='Compare the old and the precompiled text cleaning')
+    clean_text.add_argument('--blocks', type=int, default=20000,
+                            help='Synthetic blocks to clean (ignored with --pdf)')
+    clean_text.add_argument('--pdf', nargs='+', help='Take the block corpus from these PDFs')
+    clean_text.add_argument('--repeat', type=int, default=5)
+    clean_text.set_defaults(func=bench_clean_text)
+
+    fused_strategies = subparsers.add_parser('fused-strategies',
+                                             help='Compare one run per strategy with a single pass for all')
+    fused_strategies.add_argument('--pdf', help='PDF to process (default: a synthetic document)')
+    fused_strategies.add_argument('--pages', type=int, default=300,
+                                  help='Pages of the synthetic document')
+    fused_strategies.add_argument('--strategies', nargs='+', default=list(PDFProcessor.STRATEGIES))
+    fused_strategies.set_defaults(func=bench_fused_strategies)
+
+    batched_save = subparsers.add_parser('batched-save',
+                                         help='Compare peak memory of saving a document at once and in page batches')
+    batched_save.add_argument('--pdf', help='PDF to process (default: a synthetic document)')
+    batched_save.add_argument('--pages', type=int, default=1000,
+                              help='Pages of the synthetic document')
+    batched_save.add_argument('--batch-pages', type=int, default=50)
+    batched_save.add_argument('--strategies', nargs='+', default=['analysis'])
+    batched_save.add_argument('--database-url',
+                              help='Database to write to (rows are deleted afterwards; default: a temporary SQLite file)')
+    batched_save.set_defaults(func=bench_batched_save)
+
+    args = parser.parse_args()
+    sys.exit(0 if args.func(args) else 1)
@@ -0,0 +1,244 @@
+import os
+import sys
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import argparse
+import multiprocessing
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from src.pdf_processing.processor import PDFProcessor
+from src.database.connection import IngestSessionLocal, ingest_engine
+from src.database.jobs import (
+    PENDING_STRATEGY, claim_job, complete_job, fail_job, report_progress, send_heartbeat
+)
+from src.database.models import Document, ProcessingJob
+from src.database.persistence import (
+    delete_documents, move_result, reuse_result, save_batches, save_result, sweep_partial_documents
+)
+from src.config.settings import (
+    JOB_HEARTBEAT_SECONDS, JOB_LEASE_SECONDS, JOB_POLL_SECONDS, JOB_RETRY_BASE_SECONDS, PARTIAL_SAVE_STALE_SECONDS,
+    PROCESS_BATCH_PAGES
+)
+from scripts.process_pdf import find_existing_document
+
+# Minimum seconds between progress writes for one job
+PROGRESS_INTERVAL = 1.0
+# Minimum seconds between sweeps for documents of abandoned saves
+SWEEP_INTERVAL = 60.0
+
+def _claim_upload(db, document_id: int, strategy_label: str) -> bool:
+    """Take over a placeholder row; only one of several concurrent jobs can succeed"""
+    claimed = db.execute(
+        update(Document)
+        .where(Document.id == document_id, Document.strategy == PENDING_STRATEGY)
+        .values(strategy=strategy_label)
+        .execution_options(synchronize_session=False)
+    )
+    return claimed.rowcount == 1
+
+def _adopt_upload(upload: Document, result: tuple) -> tuple:
+    """Fill an uploaded, not yet processed document row with a processing result"""
+    processed = result[0]
+    for column in Document.__table__.columns:
+        if not column.primary_key:
+            setattr(upload, column.name, getattr(processed, column.name))
+    return (upload,) + result[1:]
+
+@contextmanager
+def _heartbeat(job_id: int, worker: str, interval: float):
+    """Keep the job's lease alive from a background thread while the block runs.
+
+    Extraction progress alone does not cover saving the result or a long
+    shard, and a job whose lease expires is handed to another worker.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            db = IngestSessionLocal()
+            try:
+                if not send_heartbeat(db, job_id, worker):
+                    print(f"Warning: Job {job_id} was taken over by another worker")
+                    return
+            except Exception as e:
+                print(f"Warning: Heartbeat for job {job_id} failed: {str(e)}")
+            finally:
+                db.close()
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def _complete(db, job: ProcessingJob, worker: str, result_document_id: int) -> bool:
+    """Commit the job's results as its success, or roll them back if the job was taken over"""
+    if not complete_job(db, job, worker, result_document_id):
+        db.rollback()
+        print(f"Job {job.id}: lease lost to another worker, discarding this result")
+        return False
+    db.commit()
+    return True
+
+def run_job(db, job: ProcessingJob, worker: str, page_workers: int = 1, batch_pages: int = PROCESS_BATCH_PAGES):
+    """Process the job's document and store the result.
+
+    With batch_pages > 0 the pages are extracted and committed batch by
+    batch (see save_batches()) and the job is completed afterwards; with 0
+    the result is stored in the job's transaction.
+    """
+    document = db.get(Document, job.document_id)
+    if document is None:
+        raise ValueError(f"Document {job.document_id} no longer exists")
+
+    fingerprint = None
+    if not job.force:
+        existing, fingerprint = find_existing_document(document.file_path, job.strategy, record=False)
+        if existing is not None:
+            print(f"Job {job.id}: {document.file_name} unchanged since document {existing.id}")
+            # Recorded in the job's transaction; an upload's placeholder
+            # becomes a copy of the earlier result instead of staying pending
+            target = None
+            if document.strategy == PENDING_STRATEGY and _claim_upload(db, document.id, existing.strategy):
+                target = document
+            stat = os.stat(document.file_path)
+            result = reuse_result(db, db.get(Document, existing.id), document.file_path,
+                                  stat.st_size, stat.st_mtime, stat.st_ctime, target=target)
+            _complete(db, job, worker, result.id)
+            return
+
+    last_report = 0.0
+
+    def progress(done: int, total: int):
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_INTERVAL or done == total:
+            last_report = now
+            # Own session, so progress is visible while the job's work is uncommitted
+            progress_db = IngestSessionLocal()
+            try:
+                reported = report_progress(progress_db, job.id, worker, done / total)
+            finally:
+                progress_db.close()
+            if not reported:
+                # Stops the extraction; the new holder does the work
+                raise RuntimeError(f"Job {job.id} was taken over by another worker")
+
+    processor = PDFProcessor(document.file_path, job.strategy, fingerprint=fingerprint)
+    if not batch_pages:
+        result = processor.process_document(workers=page_workers, progress=progress)
+        # The first processing of an upload fills in its placeholder row; any
+        # other strategy gets a document row of its own, as with the CLI
+        if document.strategy == PENDING_STRATEGY and _claim_upload(db, document.id, result[0].strategy):
+            result = _adopt_upload(document, result)
+        saved = save_result(db, *result)
+        if _complete(db, job, worker, saved.id):
+            print(f"Job {job.id}: processed {document.file_name} using {job.strategy} strategy")
+        return
+
+    # Batches commit on a session of their own, leaving the job's session
+    # (and the job and document loaded in it) to complete the job. Its read
+    # transaction ends first, so the job holds no more connections than
+    # INGEST_DB_POOL_SIZE allows for.
+    db.rollback()
+    save_db = IngestSessionLocal()
+    try:
+        [saved] = save_batches(save_db, processor, [job.strategy], batch_pages,
+                               workers=page_workers, progress=progress)
+        saved_id = saved.id
+    finally:
+        save_db.close()
+
+    saved = db.get(Document, saved_id)
+    if document.strategy == PENDING_STRATEGY and _claim_upload(db, document.id, saved.strategy):
+        saved = move_result(db, saved, document)
+    if _complete(db, job, worker, saved.id):
+        print(f"Job {job.id}: processed {document.file_name} using {job.strategy} strategy")
+        return
+    # Taken over after the batches were committed: the new holder saves its own
+    delete_documents(db, [saved_id])
+    db.commit()
+
+def worker_loop(name: str, poll_seconds: float, page_workers: int = 1, once: bool = False,
+                batch_pages: int = PROCESS_BATCH_PAGES):
+    """Claim and run jobs until interrupted (or, with once, until the queue is empty)"""
+    # Drop pooled connections inherited from the parent process
+    ingest_engine.dispose(close=False)
+    next_sweep = 0.0
+    while True:
+        db = IngestSessionLocal()
+        try:
+            if time.monotonic() >= next_sweep:
+                # Saves killed before they could delete their partial documents
+                swept = sweep_partial_documents(db, datetime.now() - timedelta(seconds=PARTIAL_SAVE_STALE_SECONDS))
+                if swept:
+                    print(f"Deleted partially saved documents {swept}")
+                next_sweep = time.monotonic() + SWEEP_INTERVAL
+            job = claim_job(db, name, JOB_LEASE_SECONDS)
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_seconds)
+                continue
+
+            if job.attempts > job.max_attempts:
+                # Reclaimed after its worker died on the final attempt
+                fail_job(db, job, name, job.error or "Worker stopped responding", JOB_RETRY_BASE_SECONDS)
+                continue
+
+            print(f"Job {job.id}: attempt {job.attempts}/{job.max_attempts} on {name}")
+            try:
+                with _heartbeat(job.id, name, JOB_HEARTBEAT_SECONDS):
+                    run_job(db, job, name, page_workers, batch_pages)
+            except Exception as e:
+                db.rollback()
+                print(f"Job {job.id} failed: {str(e)}")
+                if not fail_job(db, db.get(ProcessingJob, job.id), name, str(e), JOB_RETRY_BASE_SECONDS):
+                    print(f"Job {job.id}: already taken over by another worker")
+        finally:
+            db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run queued document processing jobs')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes, each running one job at a time (default: 1)')
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help='Page-range shards per document, as in process_pdf.py (default: 1)')
+    parser.add_argument('--batch-pages', type=int, default=PROCESS_BATCH_PAGES,
+                        help='Pages extracted and committed per transaction, as in process_pdf.py; '
+                             f'0 saves a document in the job\'s transaction (default: {PROCESS_BATCH_PAGES})')
+    parser.add_argument('--poll-interval', type=float, default=JOB_POLL_SECONDS,
+                        help='Seconds to wait when the queue is empty')
+    parser.add_argument('--once', action='store_true',
+                        help='Exit once the queue is empty instead of polling')
+    args = parser.parse_args()
+
+    host = socket.gethostname()
+    if args.workers <= 1:
+        worker_loop(f"{host}:{os.getpid()}", args.poll_interval, args.page_workers, args.once, args.batch_pages)
+    else:
+        processes = [
+            multiprocessing.Process(
+                target=worker_loop,
+                args=(f"{host}:{os.getpid()}:{i}", args.poll_interval, args.page_workers, args.once,
+                      args.batch_pages)
+            )
+            for i in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
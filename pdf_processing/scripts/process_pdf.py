@@ -5,63 +5,167 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
-from src.pdf_processing.processor import PDFProcessor, TextAnalysisStrategy
-from src.database.connection import SessionLocal
-from src.config.settings import PDF_FOLDER
+from src.pdf_processing.processor import PDFProcessor, EXTRACTOR_VERSION
+from src.pdf_processing.fingerprint import FileFingerprint, compute_fingerprint
+from src.database.connection import IngestSessionLocal, ingest_engine
+from src.database.models import Document
+from src.database.persistence import (
+    save_result, save_batches, reuse_result, find_unchanged_document, find_document_by_hash
+)
+from src.config.settings import PDF_FOLDER, PROCESS_BATCH_PAGES
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple, Union
 import argparse
 
-def process_single_pdf(file_name: str, strategy: str = "dict"):
+def process_single_pdf(file_name: str, strategy: Union[str, List[str]] = "dict", page_workers: int = 1,
+                       bulk: bool = True, force: bool = False,
+                       batch_pages: int = PROCESS_BATCH_PAGES) -> Tuple[str, Optional[str]]:
+    """Process one PDF and save it, returning (file_name, error message or None).
+
+    strategy may be a list of strategies: the pages are then parsed once
+    for all of them and their documents are saved together. With
+    batch_pages > 0 the pages are extracted and committed batch by batch
+    (see save_batches()); with 0 everything is saved in one transaction.
+    Unless force is set, strategies whose result for the file's content
+    already exists (same extractor version) are skipped.
+    """
+    strategies = [strategy] if isinstance(strategy, str) else list(strategy)
     file_path = os.path.join(PDF_FOLDER, file_name)
-    processor = PDFProcessor(file_path, strategy)
-    result = processor.process_document()
+    try:
+        fingerprint = None
+        if not force:
+            pending = []
+            for name in strategies:
+                existing, fingerprint = find_existing_document(file_path, name, fingerprint)
+                if existing is not None:
+                    print(f"Skipping {file_name} ({name}): unchanged since document {existing.id}")
+                else:
+                    pending.append(name)
+            if not pending:
+                return file_name, None
+            strategies = pending
+        
+        processor = PDFProcessor(file_path, strategies[0], fingerprint=fingerprint)
+        results = None
+        if not batch_pages:
+            results = processor.process_strategies(strategies, workers=page_workers)
+    except Exception as e:
+        print(f"Error processing {file_name}: {str(e)}")
+        return file_name, str(e)
     
     # Save to database
-    db = SessionLocal()
+    db = IngestSessionLocal()
     try:
-        # Handle different return types based on strategy
-        if isinstance(processor.strategy, TextAnalysisStrategy):
-            document, text_blocks, document_analysis, style_stats = result
+        if results is None:
+            save_batches(db, processor, strategies, batch_pages, workers=page_workers, bulk=bulk)
         else:
-            document, text_blocks = result
-        
-        # Save document first to get its ID
-        db.add(document)
-        db.flush()
+            # Each result is (document, text_blocks) or, for the analysis strategy,
+            # (document, text_blocks, document_analysis, style_stats, style_spans)
+            for result in results:
+                save_result(db, *result, bulk=bulk)
+            db.commit()
         
-        # Set document_id for all text blocks and save them
-        for block in text_blocks:
-            block.document_id = document.id
-            db.add(block)
-        
-        # If using analysis strategy, save analysis data
-        if isinstance(processor.strategy, TextAnalysisStrategy):
-            document_analysis.document_id = document.id
-            db.add(document_analysis)
-            
-            # Save style statistics
-            for stat in style_stats:
-                stat.document_id = document.id
-                db.add(stat)
-        
-        db.commit()
-        print(f"Successfully processed {file_name} using {strategy} strategy")
+        print(f"Successfully processed {file_name} using {', '.join(strategies)} "
+              f"{'strategy' if len(strategies) == 1 else 'strategies'}")
+        return file_name, None
         
     except Exception as e:
         db.rollback()
         print(f"Error processing {file_name}: {str(e)}")
+        return file_name, str(e)
     finally:
         db.close()
 
+def find_existing_document(file_path: str, strategy: str, fingerprint: Optional[FileFingerprint] = None,
+                           record: bool = True) -> Tuple[Optional[Document], Optional[FileFingerprint]]:
+    """Look up an earlier result for this file's content.
+
+    Checks path + size + mtime + ctime first, which needs only a stat() call, and
+    falls back to hashing the bytes (e.g. for a touched or copied file).
+    With record set, a match by hash is recorded with reuse_result(), so
+    the next run of a touched file gets by with stat() again and a copy
+    gets a document of its own. Returns the matching document, if any, and
+    the fingerprint when one was computed (or passed in) so it does not
+    have to be hashed again.
+    """
+    label = PDFProcessor.strategy_label(strategy)
+    stat = os.stat(file_path)
+    db = IngestSessionLocal()
+    try:
+        existing = find_unchanged_document(db, file_path, stat.st_size, stat.st_mtime, stat.st_ctime,
+                                           label, EXTRACTOR_VERSION)
+        if existing is not None:
+            return existing, fingerprint
+        if fingerprint is None:
+            fingerprint = compute_fingerprint(file_path)
+        existing = find_document_by_hash(db, fingerprint.sha256, label, EXTRACTOR_VERSION)
+        if existing is not None and record:
+            existing = reuse_result(db, existing, file_path, stat.st_size, stat.st_mtime, stat.st_ctime)
+            db.commit()
+            # Loaded again so it can be read once the session is closed
+            db.refresh(existing)
+        return existing, fingerprint
+    finally:
+        db.close()
+
+def _init_worker():
+    """Drop pooled connections inherited from the parent process"""
+    ingest_engine.dispose(close=False)
+
+def process_all_pdfs(pdf_files: List[str], strategy: Union[str, List[str]] = "dict", workers: int = 1,
+                     page_workers: int = 1, bulk: bool = True, force: bool = False,
+                     batch_pages: int = PROCESS_BATCH_PAGES) -> List[Tuple[str, Optional[str]]]:
+    """Process many PDFs, fanning out to a process pool when workers > 1.
+
+    Each worker opens its own fitz.Document and database session; the parent
+    only collects the per-file (file_name, error) results.
+    """
+    if workers <= 1:
+        results = []
+        for pdf_file in pdf_files:
+            print(f"\nProcessing {pdf_file}...")
+            results.append(process_single_pdf(pdf_file, strategy, page_workers, bulk, force, batch_pages))
+        return results
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(process_single_pdf, pdf_file, strategy, page_workers, bulk, force, batch_pages): pdf_file
+            for pdf_file in pdf_files
+        }
+        for future in as_completed(futures):
+            pdf_file = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The worker process itself died (e.g. a MuPDF crash)
+                print(f"Error processing {pdf_file}: {str(e)}")
+                results.append((pdf_file, str(e)))
+    return results
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process PDF files with different strategies')
-    parser.add_argument('--strategy', type=str, default='dict',
+    parser.add_argument('--strategy', type=str, nargs='+', default=['dict'],
                        choices=['dict', 'blocks', 'words', 'analysis'],
-                       help='Text extraction strategy to use')
+                       help='Text extraction strategy to use; several strategies share '
+                            'one pass over the pages and are saved together')
     parser.add_argument('--mode', type=str, default='single',
                        choices=['single', 'all'],
                        help='Process single file or all files')
     parser.add_argument('--filename', type=str,
                        help='Specific PDF file to process (optional)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Number of worker processes for --mode all (default: 1)')
+    parser.add_argument('--page-workers', type=int, default=1,
+                       help='Split each document into page-range shards extracted '
+                            'by this many processes (default: 1)')
+    parser.add_argument('--no-bulk', action='store_true',
+                       help='Insert rows through the ORM instead of COPY/executemany')
+    parser.add_argument('--batch-pages', type=int, default=PROCESS_BATCH_PAGES,
+                       help='Extract and commit each document this many pages at a time; '
+                            f'0 saves it in one transaction (default: {PROCESS_BATCH_PAGES})')
+    parser.add_argument('--force', action='store_true',
+                       help='Re-process files even if their content was already processed')
     args = parser.parse_args()
     
     pdf_files = [f for f in os.listdir(PDF_FOLDER) if f.endswith('.pdf')]
@@ -73,16 +177,21 @@ if __name__ == "__main__":
         # If filename is provided, process that specific file
         if args.filename:
             if args.filename in pdf_files:
-                process_single_pdf(args.filename, args.strategy)
+                process_single_pdf(args.filename, args.strategy, args.page_workers,
+                                   not args.no_bulk, args.force, args.batch_pages)
             else:
                 print(f"File {args.filename} not found in {PDF_FOLDER}")
         else:
             # If no filename provided, process the first PDF in the folder
             print(f"Processing first file: {pdf_files[0]}")
-            process_single_pdf(pdf_files[0], args.strategy)
+            process_single_pdf(pdf_files[0], args.strategy, args.page_workers,
+                               not args.no_bulk, args.force, args.batch_pages)
     else:  # mode == 'all'
-        print(f"Processing all {len(pdf_files)} PDF files...")
-        for pdf_file in pdf_files:
-            print(f"\nProcessing {pdf_file}...")
-            process_single_pdf(pdf_file, args.strategy)
-        print("\nCompleted processing all files!") 
\ No newline at end of file
+        print(f"Processing all {len(pdf_files)} PDF files with {args.workers} worker(s)...")
+        results = process_all_pdfs(pdf_files, args.strategy, args.workers, args.page_workers,
+                                   not args.no_bulk, args.force, args.batch_pages)
+        failed = [(name, error) for name, error in results if error]
+        print(f"\nCompleted processing all files! "
+              f"{len(results) - len(failed)} succeeded, {len(failed)} failed")
+        for name, error in failed:
+            print(f"  {name}: {error}") 
\ No newline at end of file
@@ -0,0 +1,57 @@
+import os
+import sys
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import tarfile
+import urllib.request
+
+PDFJS_VERSION = "4.6.82"
+# Earlier releases compile fonts with eval by default (CVE-2024-4367)
+PDFJS_MIN_VERSION = (4, 2, 67)
+REGISTRY_URL = "https://registry.npmjs.org/pdfjs-dist/{version}"
+# Files of the pdfjs-dist package served from /static/js/pdfjs
+FILES = {
+    "package/build/pdf.mjs": "pdf.mjs",
+    "package/build/pdf.worker.mjs": "pdf.worker.mjs",
+    "package/LICENSE": "LICENSE",
+}
+TARGET_DIR = os.path.join(project_root, "src", "web", "static", "js", "pdfjs")
+
+def _fetch(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return response.read()
+
+def vendor_pdfjs(version: str, target_dir: str):
+    """Download pdfjs-dist from npm, check it against the registry's integrity hash and unpack the viewer build"""
+    if tuple(int(part) for part in version.split(".")) < PDFJS_MIN_VERSION:
+        raise ValueError(f"pdfjs-dist {version} is affected by CVE-2024-4367, use 4.2.67 or later")
+    metadata = json.loads(_fetch(REGISTRY_URL.format(version=version)))
+    tarball = _fetch(metadata["dist"]["tarball"])
+
+    algorithm, expected = metadata["dist"]["integrity"].split("-", 1)
+    actual = base64.b64encode(hashlib.new(algorithm, tarball).digest()).decode()
+    if actual != expected:
+        raise ValueError(f"pdfjs-dist {version} tarball does not match its {algorithm} integrity hash")
+
+    os.makedirs(target_dir, exist_ok=True)
+    with tarfile.open(fileobj=io.BytesIO(tarball), mode="r:gz") as archive:
+        for member, name in FILES.items():
+            with open(os.path.join(target_dir, name), "wb") as f:
+                f.write(archive.extractfile(member).read())
+            print(f"Wrote {os.path.join(target_dir, name)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vendor pdf.js into the web app\'s static files')
+    parser.add_argument('--version', default=PDFJS_VERSION,
+                        help=f'pdfjs-dist version (default: {PDFJS_VERSION})')
+    parser.add_argument('--target', default=TARGET_DIR, help='Directory to write the files to')
+    args = parser.parse_args()
+    vendor_pdfjs(args.version, args.target)
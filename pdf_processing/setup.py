@@ -6,7 +6,10 @@ setup(
     packages=find_packages() + ['scripts'],
     install_requires=[
         "pymupdf",
+        "numpy>=1.26",
         "psycopg2-binary",
+        "asyncpg",
+        "aiosqlite",
         "fastapi",
         "uvicorn",
         "python-dotenv",
@@ -1,13 +1,80 @@
+from typing import Any, Dict
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from src.config.settings import DATABASE_URL
+from src.config.settings import (
+    DATABASE_URL, ASYNC_DATABASE_URL,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS, INGEST_DB_POOL_SIZE, INGEST_DB_MAX_OVERFLOW, INGEST_DB_STATEMENT_TIMEOUT_MS
+)
+from src.database.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
-engine = create_engine(DATABASE_URL)
+# Async drivers for the sync URL's backend, used when ASYNC_DATABASE_URL is unset
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+def async_url(url: str) -> str:
+    """Swap the driver of a sync database URL for its asyncio counterpart"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} URLs")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def engine_options(url: str, pool_size: int, max_overflow: int, statement_timeout_ms: int,
+                   is_async: bool = False) -> Dict[str, Any]:
+    """create_engine() keyword arguments for a pool profile"""
+    url = make_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() == "sqlite":
+        # SQLite keeps its default pools (in-memory databases need a single connection)
+        return options
+    
+    options.update({
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    })
+    if statement_timeout_ms and url.get_backend_name() == "postgresql":
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_ms}"}
+    return options
+
+# Sync engine: scripts, migrations and ad hoc queries
+engine = create_engine(DATABASE_URL, **engine_options(
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_STATEMENT_TIMEOUT_MS
+))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Ingestion engine: small per-process pool and no statement timeout, for
+# long bulk-write transactions in process_pdf.py and job_worker.py
+ingest_engine = create_engine(DATABASE_URL, **engine_options(
+    DATABASE_URL, INGEST_DB_POOL_SIZE, INGEST_DB_MAX_OVERFLOW, INGEST_DB_STATEMENT_TIMEOUT_MS
+))
+IngestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=ingest_engine)
+
+# Async engine: web endpoints, so queries do not block the event loop.
+# No connection is opened until the first request uses it.
+_async_database_url = ASYNC_DATABASE_URL or async_url(DATABASE_URL)
+async_engine = create_async_engine(_async_database_url, **engine_options(
+    _async_database_url, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_STATEMENT_TIMEOUT_MS, is_async=True
+))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+from src.database.models import ProcessingJob
+
+# Document.strategy of an uploaded file that has not been processed yet; the
+# first job for it fills in the row, which is listed as pending until then
+PENDING_STRATEGY = "pending"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+def _claimable(now: datetime, lease_seconds: float):
+    """Queued jobs that are due, and running jobs whose worker stopped sending heartbeats"""
+    return or_(
+        and_(ProcessingJob.status == JOB_QUEUED, ProcessingJob.run_after <= now),
+        and_(
+            ProcessingJob.status == JOB_RUNNING,
+            ProcessingJob.heartbeat_at < now - timedelta(seconds=lease_seconds)
+        )
+    )
+
+def claim_job(db: Session, worker: str, lease_seconds: float) -> Optional[ProcessingJob]:
+    """Atomically take the oldest claimable job and mark it running, or return None.
+
+    On PostgreSQL, FOR UPDATE SKIP LOCKED lets concurrent workers pass over
+    rows another worker is claiming. The conditional UPDATE makes the claim
+    safe on SQLite too, where the lock clause is not supported.
+    """
+    now = datetime.utcnow()
+    job_id = db.execute(
+        select(ProcessingJob.id)
+        .where(_claimable(now, lease_seconds))
+        .order_by(ProcessingJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar()
+    if job_id is None:
+        db.rollback()
+        return None
+
+    claimed = db.execute(
+        update(ProcessingJob)
+        .where(ProcessingJob.id == job_id, _claimable(now, lease_seconds))
+        .values(
+            status=JOB_RUNNING,
+            attempts=ProcessingJob.attempts + 1,
+            progress=0.0,
+            error=None,
+            worker=worker,
+            started_at=now,
+            heartbeat_at=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount != 1:
+        # Another worker got there first
+        db.rollback()
+        return None
+    db.commit()
+    return db.get(ProcessingJob, job_id)
+
+def _held_by(job_id: int, worker: str):
+    """The job, as long as it is still running under this worker's claim"""
+    return and_(
+        ProcessingJob.id == job_id,
+        ProcessingJob.status == JOB_RUNNING,
+        ProcessingJob.worker == worker
+    )
+
+def send_heartbeat(db: Session, job_id: int, worker: str) -> bool:
+    """Extend the worker's lease on a running job; False if the job was taken over"""
+    beat = db.execute(
+        update(ProcessingJob)
+        .where(_held_by(job_id, worker))
+        .values(heartbeat_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return beat.rowcount == 1
+
+def report_progress(db: Session, job_id: int, worker: str, progress: float) -> bool:
+    """Record extraction progress; doubles as the job's heartbeat. False if the job was taken over"""
+    reported = db.execute(
+        update(ProcessingJob)
+        .where(_held_by(job_id, worker))
+        .values(progress=progress, heartbeat_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return reported.rowcount == 1
+
+def complete_job(db: Session, job: ProcessingJob, worker: str, result_document_id: int) -> bool:
+    """Mark a job succeeded; the caller commits together with the job's results.
+
+    Returns False, changing nothing, if the job is no longer held by
+    worker (its lease expired and another worker reclaimed it); the caller
+    must then roll back instead of committing.
+    """
+    completed = db.execute(
+        update(ProcessingJob)
+        .where(_held_by(job.id, worker))
+        .values(
+            status=JOB_SUCCEEDED,
+            progress=1.0,
+            result_document_id=result_document_id,
+            finished_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return completed.rowcount == 1
+
+def fail_job(db: Session, job: ProcessingJob, worker: str, error: str, retry_base_seconds: float) -> bool:
+    """Requeue a failed attempt with exponential backoff, or give up after max_attempts.
+
+    Returns False, changing nothing, if the job is no longer held by worker.
+    """
+    if job.attempts < job.max_attempts:
+        values = {
+            "status": JOB_QUEUED,
+            "run_after": datetime.utcnow() + timedelta(seconds=retry_base_seconds * 2 ** (job.attempts - 1))
+        }
+    else:
+        values = {"status": JOB_FAILED, "finished_at": datetime.utcnow()}
+    failed = db.execute(
+        update(ProcessingJob)
+        .where(_held_by(job.id, worker))
+        .values(error=error, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return failed.rowcount == 1
+
+def job_status(job: ProcessingJob) -> Dict[str, Any]:
+    """JSON representation served by the jobs API"""
+    return {
+        "id": job.id,
+        "document_id": job.document_id,
+        "strategy": job.strategy,
+        "status": job.status,
+        "progress": job.progress,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "result_document_id": job.result_document_id,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
@@ -1,6 +1,8 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, ForeignKey, Boolean
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, DateTime, Float, JSON, ForeignKey, Boolean, Index, LargeBinary, DDL, event, text
+)
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -13,6 +15,17 @@ class Document(Base):
     processed_at = Column(DateTime, nullable=False)
     file_name = Column(String, nullable=False)
     strategy = Column(String, nullable=False)
+    file_hash = Column(String, nullable=True)  # SHA-256 of the PDF bytes
+    file_size = Column(BigInteger, nullable=True)
+    file_mtime = Column(Float, nullable=True)
+    # Unlike the mtime, a write always moves the ctime and it cannot be set back
+    file_ctime = Column(Float, nullable=True)
+    extractor_version = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_documents_fingerprint", "file_hash", "strategy", "extractor_version"),
+        Index("ix_documents_file_stat", "file_path", "file_size", "file_mtime"),
+    )
 
 class TextBlock(Base):
     __tablename__ = "text_blocks"
@@ -21,17 +34,74 @@ class TextBlock(Base):
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
     page_number = Column(Integer, nullable=False)
     text_content = Column(String, nullable=False)
-    bbox_coordinates = Column(JSON, nullable=False)
+    bbox_coordinates = Column(JSON, nullable=True)
+    x0 = Column(Float, nullable=True)
+    y0 = Column(Float, nullable=True)
+    x1 = Column(Float, nullable=True)
+    y1 = Column(Float, nullable=True)
     font_size = Column(Float, nullable=False)
     font_name = Column(String, nullable=False)
     font_color = Column(String, nullable=False)
     block_type = Column(String, nullable=False)
+    # Full-text search data (search_vector on PostgreSQL, text_blocks_fts on
+    # SQLite) is maintained by the database itself; see TEXT_BLOCK_SEARCH_DDL
+
+    __table_args__ = (
+        # Ordered page reads: WHERE document_id = ? ORDER BY page_number, y0.
+        # Leading with document_id, it also serves as the foreign key index.
+        Index("ix_text_blocks_document_page_y0", "document_id", "page_number", "y0"),
+    )
+
+# Full-text index over text_blocks.text_content, per dialect, run after
+# create_all creates the table. Migrated databases get the same index from
+# 352999a2821a, which keeps its own copy; change both together.
+TEXT_BLOCK_SEARCH_DDL = {
+    # 'simple' keeps German and English tokens unstemmed; the column is
+    # generated, so writers (including COPY) never have to fill it in
+    "postgresql": [
+        """
+        ALTER TABLE text_blocks ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text_content, ''))) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_text_blocks_search_vector ON text_blocks USING gin (search_vector)",
+    ],
+    # External-content FTS5 index kept in sync by triggers
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS text_blocks_fts USING fts5(
+            text_content, content='text_blocks', content_rowid='id'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS text_blocks_fts_insert AFTER INSERT ON text_blocks BEGIN
+            INSERT INTO text_blocks_fts(rowid, text_content) VALUES (new.id, new.text_content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS text_blocks_fts_delete AFTER DELETE ON text_blocks BEGIN
+            INSERT INTO text_blocks_fts(text_blocks_fts, rowid, text_content)
+            VALUES ('delete', old.id, old.text_content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS text_blocks_fts_update AFTER UPDATE OF text_content ON text_blocks BEGIN
+            INSERT INTO text_blocks_fts(text_blocks_fts, rowid, text_content)
+            VALUES ('delete', old.id, old.text_content);
+            INSERT INTO text_blocks_fts(rowid, text_content) VALUES (new.id, new.text_content);
+        END
+        """,
+    ],
+}
+
+for _dialect, _statements in TEXT_BLOCK_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(TextBlock.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
 
 class DocumentAnalysis(Base):
     __tablename__ = "document_analyses"
     
     id = Column(Integer, primary_key=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
     analysis_data = Column(JSON, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -39,7 +109,7 @@ class StyleStatistics(Base):
     __tablename__ = "style_statistics"
     
     id = Column(Integer, primary_key=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
     font_name = Column(String, nullable=False)
     font_size = Column(Float, nullable=False)
     font_color = Column(String, nullable=False)
@@ -50,4 +120,52 @@ class StyleStatistics(Base):
     examples = Column(JSON, nullable=True)  # Store text examples
     page_distribution = Column(JSON, nullable=True)  # Store page numbers
     y_range = Column(JSON, nullable=True)  # Store y coordinate range
-    x_range = Column(JSON, nullable=True)  # Store x coordinate range
\ No newline at end of file
+    x_range = Column(JSON, nullable=True)  # Store x coordinate range
+
+class PageStyleSpans(Base):
+    """Spans of the document's common styles on one page, stored at processing time"""
+    __tablename__ = "page_style_spans"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    page_number = Column(Integer, nullable=False)
+    span_count = Column(Integer, nullable=False)
+    # span_count STYLE_RECT_DTYPE records (src/pdf_processing/span_table.py):
+    # float32 bbox and the index of the span's style among the document's
+    # StyleStatistics ordered by id
+    rects = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        # Page window reads: WHERE document_id = ? AND page_number BETWEEN ? AND ?
+        Index("ix_page_style_spans_document_page", "document_id", "page_number", unique=True),
+    )
+
+class ProcessingJob(Base):
+    __tablename__ = "processing_jobs"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    strategy = Column(String, nullable=False)  # PDFProcessor strategy key, e.g. 'dict'
+    force = Column(Boolean, nullable=False, default=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    progress = Column(Float, nullable=False, default=0.0)  # fraction of pages extracted
+    error = Column(String, nullable=True)
+    result_document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    worker = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # retry backoff
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Claim query: WHERE status = ? AND run_after <= now ORDER BY id
+        Index("ix_processing_jobs_status_run_after", "status", "run_after"),
+        # At most one queued or running job per document and strategy, even
+        # when two requests queue one at the same time
+        Index("ux_processing_jobs_active", "document_id", "strategy", unique=True,
+              postgresql_where=text("status IN ('queued', 'running')"),
+              sqlite_where=text("status IN ('queued', 'running')")),
+    )
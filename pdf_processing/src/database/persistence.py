@@ -0,0 +1,399 @@
+import io
+import json
+from datetime import datetime
+from itertools import chain, groupby, islice
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+import os
+from sqlalchemy import JSON, Boolean, Float, Integer, LargeBinary, Table, delete, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from src.database.models import Document, TextBlock, DocumentAnalysis, StyleStatistics, PageStyleSpans
+from src.pdf_processing.span_table import PageStylesSpool
+
+if TYPE_CHECKING:
+    from src.pdf_processing.processor import PDFProcessor
+
+COPY_CHUNK_ROWS = 10000
+
+# Characters that must be escaped in PostgreSQL's COPY text format
+_COPY_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r",
+})
+
+def _row_values(instance, columns: List[str]) -> Dict[str, Any]:
+    """Read the given column values off an ORM instance, leaving out attributes never set"""
+    # Loaded/assigned column values live in the instance __dict__; going
+    # through it skips the instrumented attribute descriptors. Unset
+    # columns stay out of the row so the insert applies their defaults
+    state = instance.__dict__
+    return {name: state[name] for name in columns if name in state}
+
+def _python_defaults(table: Table, columns: List[str]) -> Dict[str, Callable[[], Any]]:
+    """Client-side column defaults (Column(default=...)) of the insert columns missing from `columns`"""
+    defaults = {}
+    for name in _insert_columns(table):
+        default = table.c[name].default
+        if name in columns or default is None:
+            continue
+        if default.is_scalar:
+            defaults[name] = lambda value=default.arg: value
+        elif default.is_callable:
+            # SQLAlchemy wraps callables to take the execution context
+            defaults[name] = lambda function=default.arg: function(None)
+    return defaults
+
+def _insert_columns(table: Table) -> List[str]:
+    """Columns to write: everything except the autoincrement primary key"""
+    return [column.name for column in table.columns if not column.primary_key]
+
+def _escape_copy_text(value: str) -> str:
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        return value.translate(_COPY_ESCAPES)
+    return value
+
+def _copy_encoder(column) -> Callable[[Any], str]:
+    """Return a function rendering one column value in COPY text format"""
+    if isinstance(column.type, JSON):
+        encode = lambda value: _escape_copy_text(json.dumps(value))
+    elif isinstance(column.type, Boolean):
+        encode = lambda value: "t" if value else "f"
+    elif isinstance(column.type, (Float, Integer)):
+        encode = str
+    elif isinstance(column.type, LargeBinary):
+        # bytea hex input (\x...), with the backslash escaped for COPY
+        encode = lambda value: "\\\\x" + value.hex()
+    else:
+        encode = lambda value: _escape_copy_text(str(value))
+    return lambda value: "\\N" if value is None else encode(value)
+
+def _copy_rows(connection: Connection, table: Table, columns: List[str], rows: List[Dict[str, Any]]):
+    """Write one chunk of rows into the table with COPY FROM STDIN"""
+    encoders = [(name, _copy_encoder(table.c[name])) for name in columns]
+    buffer = io.StringIO()
+    buffer.writelines(
+        "\t".join([encode(row[name]) for name, encode in encoders]) + "\n"
+        for row in rows
+    )
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+def _row_chunks(rows: Iterable[Dict[str, Any]]) -> Iterator[Tuple[FrozenSet[str], List[Dict[str, Any]]]]:
+    """Split rows, in order, into chunks of at most COPY_CHUNK_ROWS consecutive rows with the same keys"""
+    for keys, run in groupby(rows, key=frozenset):
+        while True:
+            chunk = list(islice(run, COPY_CHUNK_ROWS))
+            if not chunk:
+                break
+            yield keys, chunk
+
+def bulk_insert(db: Session, table: Table, rows: Iterable[Dict[str, Any]]) -> int:
+    """Insert plain row dicts into a table within the session's transaction.
+
+    PostgreSQL gets COPY FROM STDIN; other engines fall back to executemany.
+    Rows need not all set the same columns: each run of consecutive rows
+    with the same keys is written with its own column list, so rows keep
+    their order. Returns the number of rows written.
+    """
+    connection = db.connection()
+    use_copy = connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2"
+    total = 0
+    for keys, chunk in _row_chunks(rows):
+        if use_copy:
+            # COPY writes exactly the columns present in the rows, which leaves
+            # the others to their server defaults. Client-side defaults, which
+            # executemany() applies by itself, are filled in here
+            columns = [name for name in _insert_columns(table) if name in keys]
+            defaults = _python_defaults(table, columns)
+            if defaults:
+                chunk = [dict(row, **{name: default() for name, default in defaults.items()}) for row in chunk]
+            _copy_rows(connection, table, columns + list(defaults), chunk)
+        else:
+            connection.execute(table.insert(), chunk)
+        total += len(chunk)
+    return total
+
+def bulk_insert_text_blocks(db: Session, document_id: int, text_blocks: Iterable[TextBlock]) -> int:
+    """Bulk write TextBlock instances for a document without the ORM unit of work"""
+    table = TextBlock.__table__
+    columns = _insert_columns(table)
+    rows = (
+        dict(_row_values(block, columns), document_id=document_id)
+        for block in text_blocks
+    )
+    return bulk_insert(db, table, rows)
+
+def bulk_insert_style_statistics(db: Session, document_id: int, style_stats: Iterable[StyleStatistics]) -> int:
+    """Bulk write StyleStatistics instances for a document without the ORM unit of work"""
+    table = StyleStatistics.__table__
+    columns = _insert_columns(table)
+    rows = (
+        dict(_row_values(stat, columns), document_id=document_id)
+        for stat in style_stats
+    )
+    return bulk_insert(db, table, rows)
+
+def bulk_insert_page_style_spans(db: Session, document_id: int, style_spans: Iterable[PageStyleSpans]) -> int:
+    """Bulk write PageStyleSpans instances for a document without the ORM unit of work"""
+    table = PageStyleSpans.__table__
+    columns = _insert_columns(table)
+    rows = (
+        dict(_row_values(page, columns), document_id=document_id)
+        for page in style_spans
+    )
+    return bulk_insert(db, table, rows)
+
+def find_unchanged_document(db: Session, file_path: str, file_size: int, file_mtime: float, file_ctime: float,
+                            strategy: str, extractor_version: str) -> Optional[Document]:
+    """Cheap check: a document already processed from this path with identical size, mtime and ctime.
+
+    Size and mtime alone miss a rewrite that restores the mtime (cp -p,
+    rsync, os.utime); the ctime moves on every write and cannot be set back.
+    """
+    return db.query(Document).filter(
+        Document.file_path == file_path,
+        Document.file_size == file_size,
+        Document.file_mtime == file_mtime,
+        Document.file_ctime == file_ctime,
+        Document.strategy == strategy,
+        Document.extractor_version == extractor_version
+    ).order_by(Document.id.desc()).first()
+
+def find_document_by_hash(db: Session, file_hash: str, strategy: str, extractor_version: str) -> Optional[Document]:
+    """A document already processed from identical bytes with the same strategy and extractor"""
+    return db.query(Document).filter(
+        Document.file_hash == file_hash,
+        Document.strategy == strategy,
+        Document.extractor_version == extractor_version
+    ).order_by(Document.id.desc()).first()
+
+def _copy_document_rows(db: Session, model, source_id: int, target_id: int) -> None:
+    """Copy a document's rows of one table to another document inside the database"""
+    table = model.__table__
+    columns = _insert_columns(table)
+    rows = select(*[
+        literal(target_id).label(name) if name == "document_id" else table.c[name]
+        for name in columns
+    ]).where(table.c.document_id == source_id).order_by(table.c.id)
+    db.execute(table.insert().from_select(columns, rows))
+
+def reuse_result(db: Session, existing: Document, file_path: str, file_size: int, file_mtime: float,
+                 file_ctime: float, target: Optional[Document] = None) -> Document:
+    """Record that file_path holds content already processed as `existing`; the caller commits.
+
+    If existing was made from the same path, its size, mtime and ctime are
+    refreshed, so the next run matches it on stat() alone instead of hashing
+    the file again. Otherwise the result is copied (inside the database) to
+    a document for file_path: target if given, e.g. an upload's placeholder
+    row, or a new row.
+    """
+    if target is None and existing.file_path == file_path:
+        existing.file_size = file_size
+        existing.file_mtime = file_mtime
+        existing.file_ctime = file_ctime
+        db.flush()
+        return existing
+    
+    if target is None:
+        target = Document()
+        db.add(target)
+    for column in ("processed_at", "strategy", "file_hash", "extractor_version"):
+        setattr(target, column, getattr(existing, column))
+    target.file_path = file_path
+    target.file_name = os.path.basename(file_path)
+    target.file_size = file_size
+    target.file_mtime = file_mtime
+    target.file_ctime = file_ctime
+    db.flush()
+    
+    # Ordered by id, as PageStyleSpans refer to StyleStatistics by their position
+    for model in (TextBlock, DocumentAnalysis, StyleStatistics, PageStyleSpans):
+        _copy_document_rows(db, model, existing.id, target.id)
+    return target
+
+def move_result(db: Session, source: Document, target: Document) -> Document:
+    """Hand a saved result over to target, e.g. an upload's placeholder row, and delete source; the caller commits.
+
+    The rows keep their ids and order, only their document_id changes.
+    """
+    for model in (TextBlock, DocumentAnalysis, StyleStatistics, PageStyleSpans):
+        db.execute(
+            update(model)
+            .where(model.document_id == source.id)
+            .values(document_id=target.id)
+            .execution_options(synchronize_session=False)
+        )
+    for column in Document.__table__.columns:
+        if not column.primary_key:
+            setattr(target, column.name, getattr(source, column.name))
+    db.delete(source)
+    db.flush()
+    return target
+
+def save_result(db: Session, document: Document, text_blocks: List[TextBlock],
+                document_analysis: Optional[DocumentAnalysis] = None,
+                style_stats: Optional[List[StyleStatistics]] = None,
+                style_spans: Optional[List[PageStyleSpans]] = None,
+                bulk: bool = True) -> Document:
+    """Persist one processed document; the caller commits or rolls back.
+
+    With bulk=False every row goes through db.add() and the ORM flush, which
+    is kept for comparison and for engines where the bulk path misbehaves.
+    """
+    # Save document first to get its ID
+    db.add(document)
+    db.flush()
+
+    if bulk:
+        bulk_insert_text_blocks(db, document.id, text_blocks)
+    else:
+        for block in text_blocks:
+            block.document_id = document.id
+            db.add(block)
+
+    if document_analysis is not None:
+        document_analysis.document_id = document.id
+        db.add(document_analysis)
+
+    if style_stats:
+        if bulk:
+            bulk_insert_style_statistics(db, document.id, style_stats)
+        else:
+            for stat in style_stats:
+                stat.document_id = document.id
+                db.add(stat)
+
+    if style_spans:
+        if bulk:
+            bulk_insert_page_style_spans(db, document.id, style_spans)
+        else:
+            for page in style_spans:
+                page.document_id = document.id
+                db.add(page)
+
+    return document
+
+def save_batches(db: Session, processor: "PDFProcessor", strategy_names: List[str], batch_pages: int,
+                 workers: int = 1, bulk: bool = True,
+                 progress: Optional[Callable[[int, int], None]] = None) -> List[Document]:
+    """Extract and persist a document one page batch per transaction; commits as it goes.
+
+    The Document rows are committed first, then every batch of text blocks
+    in its own transaction as soon as it is extracted, so memory stays
+    bounded by one batch and rows are visible right away. The documents
+    carry no extractor_version until the analysis rows are committed with
+    the last transaction, so find_unchanged_document()/find_document_by_hash()
+    never match a partial result. If anything fails, the rows written so
+    far are deleted again; a save killed outright (SIGKILL, OOM, a lost
+    connection) cannot do that, so every batch also stamps processed_at, and
+    sweep_partial_documents() removes rows whose stamp goes stale. progress
+    is called with (pages stored, page count) after each committed batch.
+    """
+    documents = [processor.new_document(name) for name in strategy_names]
+    extractor_version = documents[0].extractor_version if documents else None
+    for document in documents:
+        document.extractor_version = None
+    db.add_all(documents)
+    db.commit()
+    document_ids = [document.id for document in documents]
+    
+    batches = processor.iter_batches(batch_pages, workers, strategy_names=strategy_names)
+    # Which style spans are stored depends on the common styles of the whole
+    # document, so the pages' styles wait on disk rather than in memory
+    spools = [PageStylesSpool() for _ in strategy_names]
+    try:
+        analyzers = [None] * len(strategy_names)
+        for batch in batches:
+            for index, document_id in enumerate(document_ids):
+                if bulk:
+                    bulk_insert_text_blocks(db, document_id, batch.text_blocks[index])
+                else:
+                    for block in batch.text_blocks[index]:
+                        block.document_id = document_id
+                        db.add(block)
+                # Batches arrive in page order, so merging the deltas keeps the one-pass result
+                if analyzers[index] is None:
+                    analyzers[index] = batch.analyzers[index]
+                else:
+                    analyzers[index].merge(batch.analyzers[index])
+                spools[index].extend(batch.page_styles[index])
+            # Shows the save is still alive, see sweep_partial_documents()
+            db.query(Document).filter(Document.id.in_(document_ids)).update(
+                {Document.processed_at: datetime.now()}, synchronize_session=False
+            )
+            db.commit()
+            # Committed rows are no longer needed in the session
+            db.expunge_all()
+            if progress is not None:
+                progress(batch.stop, len(processor.doc))
+        
+        for index, (name, document_id) in enumerate(zip(strategy_names, document_ids)):
+            analysis = None
+            if analyzers[index] is not None:
+                analysis = processor.analysis_rows(name, analyzers[index], [])
+            if analysis is not None:
+                document_analysis, style_stats, _ = analysis
+                style_spans = processor.style_span_rows(document_analysis.analysis_data, spools[index])
+                document_analysis.document_id = document_id
+                db.add(document_analysis)
+                if bulk:
+                    bulk_insert_style_statistics(db, document_id, style_stats)
+                    bulk_insert_page_style_spans(db, document_id, style_spans)
+                else:
+                    for row in chain(style_stats, style_spans):
+                        row.document_id = document_id
+                        db.add(row)
+            db.query(Document).filter(Document.id == document_id).update(
+                {Document.extractor_version: extractor_version}, synchronize_session=False
+            )
+        db.commit()
+    except BaseException:
+        # Stop the extraction (and its process pool), then delete what was
+        # committed; a failing cleanup must not hide the original error
+        try:
+            batches.close()
+            db.rollback()
+            delete_documents(db, document_ids)
+            db.commit()
+        except Exception as e:
+            print(f"Warning: Could not delete partially saved documents {document_ids}: {e}")
+        raise
+    finally:
+        for spool in spools:
+            spool.close()
+    
+    return db.query(Document).filter(Document.id.in_(document_ids)).order_by(Document.id).all()
+
+def sweep_partial_documents(db: Session, stale_before: datetime) -> List[int]:
+    """Delete documents a batched save left behind without finishing; commits.
+
+    save_batches() leaves extractor_version empty until its last commit and
+    stamps processed_at with every batch, so a fingerprinted row without a
+    version whose stamp is older than stale_before belongs to a save that
+    died before it could clean up. Documents processed before fingerprints
+    were stored have no file_hash and are kept. Returns the deleted ids.
+    """
+    document_ids = db.execute(
+        select(Document.id).where(
+            Document.extractor_version.is_(None),
+            Document.file_hash.isnot(None),
+            Document.processed_at < stale_before
+        )
+    ).scalars().all()
+    delete_documents(db, document_ids)
+    db.commit()
+    return document_ids
+
+def delete_documents(db: Session, document_ids: List[int]) -> None:
+    """Delete documents and every row that belongs to them; the caller commits"""
+    if not document_ids:
+        return
+    for model in (TextBlock, PageStyleSpans, StyleStatistics, DocumentAnalysis):
+        db.execute(delete(model).where(model.document_id.in_(document_ids)))
+    db.execute(delete(Document).where(Document.id.in_(document_ids)))
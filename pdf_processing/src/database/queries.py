@@ -0,0 +1,93 @@
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+from src.database.models import Document, TextBlock, DocumentAnalysis, StyleStatistics, PageStyleSpans, ProcessingJob
+
+# Statements behind the web endpoints. They are shared with the query-plan
+# check in scripts/benchmark.py, which asserts each one stays an index scan.
+
+def documents_before(before_id: Optional[int], limit: int) -> Select:
+    """The next `limit` documents, newest first, with ids below `before_id` (keyset pagination)"""
+    statement = select(Document).order_by(Document.id.desc()).limit(limit)
+    if before_id is not None:
+        statement = statement.where(Document.id < before_id)
+    return statement
+
+def document_by_id(document_id: int) -> Select:
+    return select(Document).where(Document.id == document_id)
+
+def page_numbers_after(document_id: int, after_page: int, limit: int) -> Select:
+    """The next `limit` page numbers with text after `after_page`"""
+    return select(TextBlock.page_number)\
+        .where(TextBlock.document_id == document_id, TextBlock.page_number > after_page)\
+        .distinct()\
+        .order_by(TextBlock.page_number)\
+        .limit(limit)
+
+def blocks_for_pages(document_id: int, first_page: int, last_page: int) -> Select:
+    """Text blocks of a page range in reading order"""
+    return select(TextBlock)\
+        .where(
+            TextBlock.document_id == document_id,
+            TextBlock.page_number.between(first_page, last_page)
+        )\
+        .order_by(TextBlock.page_number, TextBlock.y0)
+
+def analysis_for_document(document_id: int) -> Select:
+    return select(DocumentAnalysis).where(DocumentAnalysis.document_id == document_id)
+
+def style_stats_for_document(document_id: int) -> Select:
+    return select(StyleStatistics)\
+        .where(StyleStatistics.document_id == document_id)\
+        .order_by(StyleStatistics.id)
+
+def style_spans_for_pages(document_id: int, first_page: int, last_page: int) -> Select:
+    """Stored style spans of a page range, by page"""
+    return select(PageStyleSpans)\
+        .where(
+            PageStyleSpans.document_id == document_id,
+            PageStyleSpans.page_number.between(first_page, last_page)
+        )\
+        .order_by(PageStyleSpans.page_number)
+
+def style_spans_for_document(document_id: int) -> Select:
+    """(page_number, rects) of every page with stored style spans"""
+    return select(PageStyleSpans.page_number, PageStyleSpans.rects)\
+        .where(PageStyleSpans.document_id == document_id)\
+        .order_by(PageStyleSpans.page_number)
+
+def style_span_pages_after(document_id: int, after_page: int) -> Select:
+    """The first page after `after_page` with stored style spans, if any"""
+    return select(PageStyleSpans.page_number)\
+        .where(PageStyleSpans.document_id == document_id, PageStyleSpans.page_number > after_page)\
+        .order_by(PageStyleSpans.page_number)\
+        .limit(1)
+
+def job_by_id(job_id: int) -> Select:
+    return select(ProcessingJob).where(ProcessingJob.id == job_id)
+
+def active_job(document_id: int, strategy: str, statuses) -> Select:
+    """A queued or running job for the same document and strategy, if any"""
+    return select(ProcessingJob)\
+        .where(
+            ProcessingJob.document_id == document_id,
+            ProcessingJob.strategy == strategy,
+            ProcessingJob.status.in_(statuses)
+        )\
+        .order_by(ProcessingJob.id.desc())\
+        .limit(1)
+
+# (name, statement) pairs for every endpoint query with a selective filter
+def endpoint_queries(document_id: int = 1):
+    return [
+        ("documents_before", documents_before(document_id, 50)),
+        ("document_by_id", document_by_id(document_id)),
+        ("page_numbers_after", page_numbers_after(document_id, 0, 5)),
+        ("blocks_for_pages", blocks_for_pages(document_id, 1, 5)),
+        ("analysis_for_document", analysis_for_document(document_id)),
+        ("style_stats_for_document", style_stats_for_document(document_id)),
+        ("style_spans_for_pages", style_spans_for_pages(document_id, 1, 5)),
+        ("style_spans_for_document", style_spans_for_document(document_id)),
+        ("style_span_pages_after", style_span_pages_after(document_id, 0)),
+        ("active_job", active_job(document_id, "dict", ("queued", "running"))),
+    ]
@@ -0,0 +1,154 @@
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+from src.config.settings import SEARCH_MAX_CANDIDATES
+
+# Full-text search over text_blocks.text_content. The index itself is
+# TEXT_BLOCK_SEARCH_DDL in models.py: a generated tsvector column with a GIN
+# index on PostgreSQL, an FTS5 table kept in sync by triggers on SQLite.
+#
+# Results are recency-capped: ranking costs one score per ranked block, so
+# only the newest SEARCH_MAX_CANDIDATES matches (highest text block ids, i.e.
+# the most recently processed documents) are ranked. For a common term the
+# hits are the best among recent blocks, not the best overall. Ranking every
+# match instead took 1.5 s for a word in two thirds of a 1M-block corpus
+# (FTS5 ORDER BY rank LIMIT 20), as it scores every match. A query with fewer
+# matches than the cap ranks all of them. When older matches were left out,
+# the truncated column says so, and /search says so in its response.
+
+# The candidates are fetched one past the cap, so the extra row tells whether
+# any were left out. For a common word PostgreSQL walks the primary key
+# backwards and stops there; a rare one has few matches to sort.
+_POSTGRES_SEARCH = """
+    WITH q AS (SELECT websearch_to_tsquery('simple', :query) AS query),
+    matches AS (
+        SELECT tb.id FROM text_blocks tb, q
+        WHERE tb.search_vector @@ q.query
+          {document_filter}
+        ORDER BY tb.id DESC
+        LIMIT :candidates + 1
+    ),
+    candidates AS (SELECT id FROM matches ORDER BY id DESC LIMIT :candidates)
+    SELECT tb.id, tb.document_id, d.file_name, tb.page_number,
+           tb.x0, tb.y0, tb.x1, tb.y1, tb.text_content,
+           ts_rank_cd(tb.search_vector, q.query) AS rank,
+           (SELECT count(*) FROM matches) > :candidates AS truncated
+    FROM candidates c
+    JOIN text_blocks tb ON tb.id = c.id
+    JOIN documents d ON d.id = tb.document_id,
+         q
+    ORDER BY rank DESC, tb.id
+    LIMIT :limit
+"""
+
+# Ranked by FTS5's rank column, bm25(), lower for better matches. The cutoff
+# is the newest match just past the cap: FTS5 walks a term's matches in rowid
+# order, so it is found without scoring anything, and the rowid bound is
+# handed to FTS5 so only the candidates are scored.
+_SQLITE_SEARCH = """
+    WITH cutoff AS (
+        SELECT (SELECT text_blocks_fts.rowid FROM text_blocks_fts
+                WHERE text_blocks_fts MATCH :query
+                  {document_filter}
+                ORDER BY text_blocks_fts.rowid DESC
+                LIMIT 1 OFFSET :candidates) AS id
+    )
+    SELECT tb.id, tb.document_id, d.file_name, tb.page_number,
+           tb.x0, tb.y0, tb.x1, tb.y1, tb.text_content,
+           -text_blocks_fts.rank AS rank,
+           cutoff.id IS NOT NULL AS truncated
+    FROM cutoff, text_blocks_fts
+    JOIN text_blocks tb ON tb.id = text_blocks_fts.rowid
+    JOIN documents d ON d.id = tb.document_id
+    WHERE text_blocks_fts MATCH :query
+      AND text_blocks_fts.rowid > coalesce(cutoff.id, 0)
+      {document_filter}
+    ORDER BY text_blocks_fts.rank, tb.id
+    LIMIT :limit
+"""
+
+_SEARCHES = {"postgresql": _POSTGRES_SEARCH, "sqlite": _SQLITE_SEARCH}
+
+# A document's blocks are saved together, so their ids span a narrow range;
+# on SQLite the range bounds the FTS5 scan, which cannot filter by document
+_DOCUMENT_FILTERS = {
+    "postgresql": "AND tb.document_id = :document_id",
+    "sqlite": """AND EXISTS (SELECT 1 FROM text_blocks f
+                            WHERE f.id = text_blocks_fts.rowid AND f.document_id = :document_id)
+                AND text_blocks_fts.rowid BETWEEN
+                    (SELECT min(id) FROM text_blocks WHERE document_id = :document_id) AND
+                    (SELECT max(id) FROM text_blocks WHERE document_id = :document_id)""",
+}
+
+def supports_search(dialect: str) -> bool:
+    """Whether full-text search is available on a database dialect"""
+    return dialect in _SEARCHES
+
+def _fts5_query(query: str) -> str:
+    """Quote every term so user input cannot use (or break) FTS5 query syntax"""
+    terms = query.split()
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def _search_statement(dialect: str, query: str, limit: int,
+                      document_id: Optional[int]) -> Optional[Tuple[TextClause, Dict[str, Any]]]:
+    """The dialect's search statement and parameters, or None for an empty query"""
+    if not supports_search(dialect):
+        raise ValueError(f"Full-text search is not supported on {dialect}")
+    
+    params = {"query": query, "limit": limit, "candidates": _candidates(limit)}
+    if dialect == "sqlite":
+        params["query"] = _fts5_query(query)
+        if not params["query"]:
+            return None
+    
+    document_filter = ""
+    if document_id is not None:
+        document_filter = _DOCUMENT_FILTERS[dialect]
+        params["document_id"] = document_id
+    
+    return text(_SEARCHES[dialect].format(document_filter=document_filter)), params
+
+def _hit(row) -> Dict[str, Any]:
+    return {
+        "text_block_id": row.id,
+        "document_id": row.document_id,
+        "file_name": row.file_name,
+        "page_number": row.page_number,
+        "bbox": {"x0": row.x0, "y0": row.y0, "x1": row.x1, "y1": row.y1},
+        "text_content": row.text_content,
+        "rank": float(row.rank)
+    }
+
+def _results(rows, candidates: int) -> Dict[str, Any]:
+    # Older matches are only left out when the cap was reached, so there are rows
+    return {
+        "results": [_hit(row) for row in rows],
+        "max_ranked_matches": candidates,
+        "truncated": bool(rows and rows[0].truncated)
+    }
+
+def _candidates(limit: int) -> int:
+    return max(limit, SEARCH_MAX_CANDIDATES)
+
+def search_text_blocks(db: Session, query: str, limit: int = 20,
+                       document_id: Optional[int] = None) -> Dict[str, Any]:
+    """Return the best-ranked text blocks among the newest matches of a free-text query
+
+    Only the newest "max_ranked_matches" matching blocks are ranked;
+    "truncated" is true when the query matched more and the older ones were
+    not considered.
+    """
+    search = _search_statement(db.get_bind().dialect.name, query, limit, document_id)
+    if search is None:
+        return _results([], _candidates(limit))
+    return _results(db.execute(*search).all(), _candidates(limit))
+
+async def search_text_blocks_async(db: AsyncSession, query: str, limit: int = 20,
+                                   document_id: Optional[int] = None) -> Dict[str, Any]:
+    """search_text_blocks() for an AsyncSession"""
+    search = _search_statement(db.get_bind().dialect.name, query, limit, document_id)
+    if search is None:
+        return _results([], _candidates(limit))
+    return _results((await db.execute(*search)).all(), _candidates(limit))
@@ -1,13 +1,19 @@
 import fitz
-from typing import List, Dict, Any, Tuple
+import numpy as np
+import shutil
+from typing import List, Dict, Any, Optional, Tuple
+from src.config.settings import HIGHLIGHT_CHUNK_PAGES
 from src.database.models import StyleStatistics
 from src.pdf_processing.extraction import TextExtractionStrategy
-from src.pdf_processing.models import TextSpan
+from src.pdf_processing.page_cache import PageLayoutCache
+from src.pdf_processing.span_table import SpanTable, unpack_style_rects
 from src.pdf_processing.text_analysis import TextAnalyzer
 
 class TextAnalysisStrategy(TextExtractionStrategy):
     """Strategy using detailed span-level analysis"""
     
+    uses_layout = True
+    
     def __init__(self):
         super().__init__()
         self.analyzer = TextAnalyzer()
@@ -24,62 +30,42 @@ class TextAnalysisStrategy(TextExtractionStrategy):
         
         return is_bold, is_italic, is_underlined
         
-    def extract_text(self, page: fitz.Page) -> List[Dict[str, Any]]:
-        spans = []
-        dict_page = page.get_text("dict")
-        
-        for block in dict_page["blocks"]:
-            if "lines" not in block:
-                continue
-                
-            for line in block["lines"]:
-                for span in line["spans"]:
-                    flags = span.get("flags", 0)
-                    is_bold, is_italic, is_underlined = self._get_font_flags(flags)
-                    
-                    text_span = TextSpan(
-                        text=span["text"],
-                        x0=span["bbox"][0],
-                        y0=span["bbox"][1],
-                        x1=span["bbox"][2],
-                        y1=span["bbox"][3],
-                        font_name=span["font"],
-                        font_size=span["size"],
-                        font_color=self._get_color_string(span.get("color")),
-                        is_bold=is_bold,
-                        is_italic=is_italic,
-                        is_underlined=is_underlined,
-                        page_number=page.number + 1
-                    )
-                    spans.append(text_span)
+    def extract_text(self, page: fitz.Page, layout: Optional[Dict[str, Any]] = None,
+                     textpage: Optional[fitz.TextPage] = None) -> List[Dict[str, Any]]:
+        blocks_data, _ = self.extract_page(page, layout)
+        return blocks_data
+    
+    def extract_page(self, page: fitz.Page, layout: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], SpanTable]:
+        """Extract block data and the page's spans, handed off once per page as a SpanTable"""
+        dict_page = layout if layout is not None else page.get_text("dict")
+        spans = SpanTable.from_layout(dict_page, page.number + 1, self._get_color_string)
         
-        # Convert spans to standard block format
+        # Convert spans to standard block format, one block per line
         blocks_data = []
-        lines = self.analyzer._group_into_lines(spans)
+        lines = spans.group_into_lines()
+        text_lengths = spans.text_lengths()
         
-        for line in lines:
-            main_span = max(line.spans, key=lambda s: len(s.text))
+        for line_index in range(len(lines)):
+            line_spans = lines.spans(line_index)
+            main_span = line_spans[np.argmax(text_lengths[line_spans])]
+            font_size = float(spans.size[main_span])
+            y0 = float(lines.y0[line_index])
             
             blocks_data.append({
-                "text_content": " ".join(span.text for span in line.spans),
+                "text_content": " ".join(spans.span_text(i) for i in line_spans.tolist()),
                 "bbox_coordinates": {
-                    "x0": line.x0,
-                    "y0": line.y0,
-                    "x1": line.x1,
-                    "y1": line.y1
+                    "x0": float(lines.x0[line_index]),
+                    "y0": y0,
+                    "x1": float(lines.x1[line_index]),
+                    "y1": float(lines.y1[line_index])
                 },
-                "font_size": main_span.font_size,
-                "font_name": main_span.font_name,
-                "font_color": main_span.font_color,
-                "block_type": self._determine_block_type(
-                    main_span.font_size,
-                    line.y0,
-                    page.rect.height
-                ),
-                "_spans": spans  # Pass spans for later analysis
+                "font_size": font_size,
+                "font_name": spans.fonts[spans.font_id[main_span]],
+                "font_color": spans.colors[spans.color_id[main_span]],
+                "block_type": self._determine_block_type(font_size, y0, page.rect.height)
             })
         
-        return blocks_data
+        return blocks_data, spans
 
     def _generate_highlight_colors(self, num_styles: int) -> List[tuple]:
         """Generate distinct highlight colors (bright, marker-like colors)"""
@@ -99,22 +85,98 @@ class TextAnalysisStrategy(TextExtractionStrategy):
         # If we need more colors than predefined, cycle through them
         return [highlight_colors[i % len(highlight_colors)] for i in range(num_styles)]
 
-    def create_highlighted_pdf(self, doc: fitz.Document, output_path: str, style_stats: List[StyleStatistics]) -> str:
-        """Create a new PDF with highlighted text styles"""
-        doc_out = fitz.open()
+    def _stat_key(self, style: StyleStatistics) -> tuple:
+        return (style.font_name, style.font_size, style.font_color, style.is_bold, style.is_italic)
+
+    def style_rects(self, dict_page: Dict[str, Any], style_values: Dict[tuple, Any]) -> List[Tuple[Any, tuple]]:
+        """(value, bbox) for every span whose style is a key of style_values, in page order"""
+        rects = []
+        for block in dict_page["blocks"]:
+            if "lines" not in block:
+                continue
+                
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    flags = span.get("flags", 0)
+                    is_bold, is_italic, _ = self._get_font_flags(flags)
+                    
+                    style_key = (
+                        span["font"],
+                        span["size"],
+                        self._get_color_string(span.get("color")),
+                        is_bold,
+                        is_italic
+                    )
+                    
+                    if style_key in style_values:
+                        rects.append((style_values[style_key], span["bbox"]))
+        return rects
+
+    def page_highlights(self, doc: fitz.Document, style_stats: List[StyleStatistics], start: int, stop: int,
+                        layout_cache: Optional[PageLayoutCache] = None) -> List[List[list]]:
+        """Highlight rectangles of pages [start, stop) as [x0, y0, x1, y1, style index] lists.
+
+        Coordinates are those of the unrotated page, relative to the top
+        left of its crop box; the style index points into style_stats.
+        """
+        style_indexes = {self._stat_key(style): index for index, style in enumerate(style_stats)}
+        
+        pages = []
+        for page_num in range(start, stop):
+            dict_page = layout_cache.get(page_num) if layout_cache else doc[page_num].get_text("dict")
+            pages.append([
+                [round(bbox[0], 2), round(bbox[1], 2), round(bbox[2], 2), round(bbox[3], 2), index]
+                for index, bbox in self.style_rects(dict_page, style_indexes)
+            ])
+        return pages
+
+    def _page_rects(self, doc: fitz.Document, page_num: int, style_stats: List[StyleStatistics],
+                    layout_cache: Optional[PageLayoutCache] = None,
+                    style_spans: Optional[Dict[int, bytes]] = None) -> Dict[tuple, List[tuple]]:
+        """Span rectangles of one page by highlight color.
+
+        style_spans maps page numbers to PageStyleSpans.rects stored at
+        processing time; without it the page's spans are matched against
+        style_stats, which needs the page layout.
+        """
         colors = self._generate_highlight_colors(len(style_stats))
-        style_colors = {}
+        rects_by_color = {}
+        if style_spans is not None:
+            data = style_spans.get(page_num + 1)
+            if data is None:
+                return rects_by_color
+            for x0, y0, x1, y1, style in unpack_style_rects(data).tolist():
+                rects_by_color.setdefault(colors[style], []).append((x0, y0, x1, y1))
+            return rects_by_color
         
-        # Create mapping of style characteristics to colors
-        for style, color in zip(style_stats, colors):
-            style_key = (
-                style.font_name,
-                style.font_size,
-                style.font_color,
-                style.is_bold,
-                style.is_italic
+        style_colors = {self._stat_key(style): color for style, color in zip(style_stats, colors)}
+        dict_page = layout_cache.get(page_num) if layout_cache else doc[page_num].get_text("dict")
+        for highlight_color, bbox in self.style_rects(dict_page, style_colors):
+            rects_by_color.setdefault(highlight_color, []).append(bbox)
+        return rects_by_color
+
+    def _highlight_page(self, page_out: fitz.Page, rects_by_color: Dict[tuple, List[tuple]]):
+        """Draw a translucent rectangle over every given span rectangle"""
+        if not rects_by_color:
+            return
+        # One path per color in a single shape adds one content stream to the
+        # page; page.draw_rect() per span would add (and re-check) one per span
+        shape = page_out.new_shape()
+        for highlight_color, rects in rects_by_color.items():
+            for rect in rects:
+                shape.draw_rect(fitz.Rect(rect))
+            shape.finish(
+                color=None,  # No border
+                fill=highlight_color,
+                fill_opacity=0.3
             )
-            style_colors[style_key] = color
+        shape.commit()
+
+    def create_highlighted_pdf(self, doc: fitz.Document, output_path: str, style_stats: List[StyleStatistics],
+                               layout_cache: Optional[PageLayoutCache] = None,
+                               style_spans: Optional[Dict[int, bytes]] = None) -> str:
+        """Create a new PDF with highlighted text styles, built in memory and saved at the end"""
+        doc_out = fitz.open()
         
         # Process each page
         for page_num in range(len(doc)):
@@ -124,38 +186,44 @@ class TextAnalysisStrategy(TextExtractionStrategy):
             # Copy original page content
             page_out.show_pdf_page(page.rect, doc, page_num)
             
-            # Get text spans
-            dict_page = page.get_text("dict")
-            
-            # Add highlights for each text span
-            for block in dict_page["blocks"]:
-                if "lines" not in block:
-                    continue
-                    
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        flags = span.get("flags", 0)
-                        is_bold, is_italic, _ = self._get_font_flags(flags)
-                        
-                        style_key = (
-                            span["font"],
-                            span["size"],
-                            self._get_color_string(span.get("color")),
-                            is_bold,
-                            is_italic
-                        )
-                        
-                        if style_key in style_colors:
-                            highlight_color = style_colors[style_key]
-                            rect = fitz.Rect(span["bbox"])
-                            page_out.draw_rect(
-                                rect,
-                                color=None,  # No border
-                                fill=highlight_color,
-                                fill_opacity=0.3
-                            )
+            self._highlight_page(page_out, self._page_rects(doc, page_num, style_stats, layout_cache, style_spans))
         
         # Save the highlighted PDF
         doc_out.save(output_path)
         doc_out.close()
-        return output_path 
\ No newline at end of file
+        return output_path
+
+    def write_highlighted_pdf(self, doc: fitz.Document, output_path: str, style_stats: List[StyleStatistics],
+                              layout_cache: Optional[PageLayoutCache] = None,
+                              style_spans: Optional[Dict[int, bytes]] = None,
+                              chunk_pages: int = HIGHLIGHT_CHUNK_PAGES) -> str:
+        """Highlight a copy of the PDF in place, appending the highlights chunk by chunk.
+
+        output_path first receives a byte copy of the source; the highlight
+        objects of every chunk_pages pages are then appended as one
+        incremental update. Bytes once written are never changed, so a
+        reader can stream the file while it is written, and only one chunk's
+        highlights are held in memory at a time. Files MuPDF cannot update
+        incrementally (e.g. repaired on open) are rendered with
+        create_highlighted_pdf instead.
+        """
+        if not doc.can_save_incrementally():
+            return self.create_highlighted_pdf(doc, output_path, style_stats, layout_cache, style_spans)
+        
+        shutil.copyfile(doc.name, output_path)
+        
+        # Saving incrementally more than once from the same handle rewrites
+        # the earlier update instead of appending after it, so every chunk
+        # is saved from a fresh handle
+        chunk_pages = max(1, chunk_pages)
+        for start in range(0, len(doc), chunk_pages):
+            doc_out = fitz.open(output_path)
+            try:
+                for page_num in range(start, min(start + chunk_pages, len(doc))):
+                    self._highlight_page(
+                        doc_out[page_num], self._page_rects(doc, page_num, style_stats, layout_cache, style_spans)
+                    )
+                doc_out.saveIncr()
+            finally:
+                doc_out.close()
+        return output_path
@@ -0,0 +1,98 @@
+import re
+from dataclasses import dataclass
+from typing import Callable, Match, Sequence, Tuple, Union
+
+@dataclass(frozen=True)
+class CleaningRule:
+    """One text substitution: every match of pattern is replaced.
+
+    replacement is a literal string or a function of the match. Patterns
+    must not contain capturing groups, since all rules are merged into one
+    regular expression; use (?:...) for grouping.
+    """
+    name: str
+    pattern: str
+    replacement: Union[str, Callable[[Match], str]]
+
+DEFAULT_RULES = (
+    # Dot leaders and OCR dot runs ("Inhalt ........ 5", "II..") to one dot
+    CleaningRule("dot_runs", r"\.{2,}", "."),
+    # Whitespace runs and tabs/newlines to one space; single spaces do not
+    # match at all, so ordinary text passes through without callbacks
+    CleaningRule("whitespace", r"\s{2,}|[^\S ]", " "),
+)
+
+# Doubled-glyph runs ("EEiinnlleeiittuunngg") come from fake-bold text drawn
+# twice at a small offset: the span has two glyphs per visible character, so
+# its advance per glyph is about half that of ordinary text (~0.5 em).
+DOUBLED_GLYPH_MAX_ADVANCE = 0.35  # em per glyph
+DOUBLED_GLYPH_MIN_LENGTH = 6  # three visible characters; shorter runs ("II..") are ambiguous
+
+class TextCleaner:
+    """Single-pass text cleanup built from a list of CleaningRules.
+
+    The rules are compiled once into one alternation, so each block is
+    scanned a single time however many rules there are. Rules never
+    overlap in the default set, so this equals applying them in order.
+    Doubled-glyph collapsing in span_text() is off unless requested, for
+    blocks that is_fake_bold_block() picked out.
+    """
+
+    def __init__(self, rules: Sequence[CleaningRule] = DEFAULT_RULES, collapse_doubled_glyphs: bool = False):
+        self.rules = tuple(rules)
+        self.collapse_doubled_glyphs = collapse_doubled_glyphs
+        for rule in self.rules:
+            if re.compile(rule.pattern).groups:
+                raise ValueError(f"Cleaning rule {rule.name!r} must not use capturing groups")
+        self._pattern = re.compile(
+            "|".join(f"(?P<{rule.name}>{rule.pattern})" for rule in self.rules)
+        ) if self.rules else None
+        self._replacements = {
+            rule.name: rule.replacement if callable(rule.replacement) else (lambda _, text=rule.replacement: text)
+            for rule in self.rules
+        }
+
+    def _replace(self, match: Match) -> str:
+        return self._replacements[match.lastgroup](match)
+
+    def clean(self, text: str) -> str:
+        """Apply all rules in one pass and strip surrounding whitespace"""
+        if self._pattern is not None:
+            text = self._pattern.sub(self._replace, text)
+        return text.strip()
+
+    def span_text(self, text: str, width: float, font_size: float) -> str:
+        """Text of one span or word, with doubled glyphs collapsed when its metrics show them.
+
+        Only runs where every character is repeated twice in a row *and*
+        the glyphs are packed at about half the normal advance are
+        collapsed, so ordinary double letters ("Stellung", "muss") survive.
+        """
+        if not self.collapse_doubled_glyphs or not is_doubled_glyph_run(text, width, font_size):
+            return text
+        return text[::2]
+
+def is_doubled_glyph_run(text: str, width: float, font_size: float) -> bool:
+    """Whether a span's text and geometry look like every glyph was drawn twice"""
+    length = len(text)
+    if length < DOUBLED_GLYPH_MIN_LENGTH or length % 2 or font_size <= 0:
+        return False
+    if width / length > DOUBLED_GLYPH_MAX_ADVANCE * font_size:
+        return False
+    return text[::2] == text[1::2]
+
+def is_fake_bold_block(spans: Sequence[Tuple[str, float, float]]) -> bool:
+    """Whether a block of (text, width, font size) spans or words was drawn as fake bold.
+
+    Every span long enough to judge must be a doubled-glyph run, and there
+    must be at least one; a single tight run ("aabbccdd") among ordinary
+    text does not qualify.
+    """
+    found = False
+    for text, width, font_size in spans:
+        if len(text) < DOUBLED_GLYPH_MIN_LENGTH:
+            continue
+        if not is_doubled_glyph_run(text, width, font_size):
+            return False
+        found = True
+    return found
@@ -1,16 +1,32 @@
 import fitz
-import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from abc import ABC, abstractmethod
+from src.pdf_processing.cleaning import TextCleaner, is_fake_bold_block
 from src.pdf_processing.models import TextSpan
 from src.pdf_processing.text_analysis import TextAnalyzer
 
 class TextExtractionStrategy(ABC):
     """Abstract base class for different text extraction strategies"""
     
+    # Whether extract_text consumes page.get_text("dict") output, i.e. whether
+    # callers should pass a cached layout in
+    uses_layout = False
+    
+    # Shared, precompiled cleanup applied to block text
+    cleaner = TextCleaner()
+    # The same, also collapsing doubled glyphs: only for blocks drawn as fake bold
+    fake_bold_cleaner = TextCleaner(collapse_doubled_glyphs=True)
+    
     @abstractmethod
-    def extract_text(self, page: fitz.Page) -> List[Dict[str, Any]]:
-        """Extract text blocks from a page and return list of block data"""
+    def extract_text(self, page: fitz.Page, layout: Optional[Dict[str, Any]] = None,
+                     textpage: Optional[fitz.TextPage] = None) -> List[Dict[str, Any]]:
+        """Extract text blocks from a page and return list of block data.
+
+        layout is an optional, read-only page.get_text("dict") result for the
+        page; strategies that use it must not modify it. textpage is an
+        optional TextPage of the page built with LAYOUT_FLAGS, which
+        strategies that parse the page themselves read instead.
+        """
         pass
     
     def _get_color_string(self, color) -> str:
@@ -29,32 +45,72 @@ class TextExtractionStrategy(ABC):
     
     def _clean_text(self, text: str) -> str:
         """Clean up text artifacts"""
-        text = re.sub(r'(.)\1', r'\1', text)
-        text = re.sub(r'\.{2,}', '.', text)
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'([IVX]+)\.+', r'\1.', text)
-        return text.strip()
+        return self.cleaner.clean(text)
+    
+    def _span_texts(self, spans: List[Tuple[str, float, float]]) -> List[str]:
+        """Texts of one block's (text, width, font size) spans, doubled glyphs collapsed if the block is fake bold"""
+        cleaner = self.fake_bold_cleaner if is_fake_bold_block(spans) else self.cleaner
+        return [cleaner.span_text(text, width, font_size) for text, width, font_size in spans]
+
+def sort_words(words: List[tuple], tolerance: float = 3) -> List[tuple]:
+    """Order word tuples line by line as page.get_text("words", sort=True) does.
+
+    Same algorithm as PyMuPDF's, on plain floats: building a fitz.Rect for
+    every word and line union made the sort most of the strategy's time.
+    """
+    if not words:
+        return words
+    words = sorted(words, key=lambda w: (w[3], w[0]))
+    sorted_words = []
+    line = [words[0]]  # words roughly on the same line
+    lx0, ly0, lx1, ly1 = words[0][:4]  # the line's rectangle
+    for word in words[1:]:
+        x0, y0, x1, y1 = word[:4]
+        if abs(y0 - ly0) <= tolerance or abs(y1 - ly1) <= tolerance:
+            line.append(word)
+            # Union as fitz.Rect.include_rect: empty rectangles don't count
+            if x0 >= x1 or y0 >= y1:
+                continue
+            if lx0 >= lx1 or ly0 >= ly1:
+                lx0, ly0, lx1, ly1 = x0, y0, x1, y1
+            else:
+                lx0, ly0, lx1, ly1 = min(lx0, x0), min(ly0, y0), max(lx1, x1), max(ly1, y1)
+        else:
+            line.sort(key=lambda w: w[0])  # left to right
+            sorted_words.extend(line)
+            line = [word]
+            lx0, ly0, lx1, ly1 = x0, y0, x1, y1
+    line.sort(key=lambda w: w[0])
+    sorted_words.extend(line)
+    return sorted_words
 
 class DictMethodStrategy(TextExtractionStrategy):
     """Strategy using the 'dict' method from PyMuPDF"""
     
-    def extract_text(self, page: fitz.Page) -> List[Dict[str, Any]]:
+    uses_layout = True
+    
+    def extract_text(self, page: fitz.Page, layout: Optional[Dict[str, Any]] = None,
+                     textpage: Optional[fitz.TextPage] = None) -> List[Dict[str, Any]]:
         blocks_data = []
-        dict_blocks = page.get_text("dict")["blocks"]
+        if layout is None:
+            layout = page.get_text("dict")
         page_height = page.rect.height
         
-        # Sort blocks by y-position to maintain layout order
-        dict_blocks.sort(key=lambda b: (b["bbox"][1], b["bbox"][0]))
+        # Sort blocks by y-position to maintain layout order (without
+        # reordering the possibly shared layout in place)
+        dict_blocks = sorted(layout["blocks"], key=lambda b: (b["bbox"][1], b["bbox"][0]))
         
         for block in dict_blocks:
             if "lines" not in block:
                 continue
             
-            # Extract text content from all lines in the block
-            text_content = " ".join(
-                span["text"] for line in block["lines"] 
+            # Extract text content from all lines in the block, collapsing
+            # doubled glyphs if the block's span metrics show fake bold
+            text_content = " ".join(self._span_texts([
+                (span["text"], span["bbox"][2] - span["bbox"][0], span["size"])
+                for line in block["lines"]
                 for span in line["spans"]
-            )
+            ]))
             
             # Skip empty blocks
             if not text_content.strip():
@@ -90,9 +146,11 @@ class DictMethodStrategy(TextExtractionStrategy):
 class BlocksMethodStrategy(TextExtractionStrategy):
     """Strategy using the 'blocks' method from PyMuPDF"""
     
-    def extract_text(self, page: fitz.Page) -> List[Dict[str, Any]]:
+    def extract_text(self, page: fitz.Page, layout: Optional[Dict[str, Any]] = None,
+                     textpage: Optional[fitz.TextPage] = None) -> List[Dict[str, Any]]:
         blocks_data = []
-        raw_blocks = page.get_text("blocks", sort=True)
+        # LAYOUT_FLAGS are the "blocks" defaults, so a shared textpage gives the same output
+        raw_blocks = page.get_text("blocks", sort=True, textpage=textpage)
         
         for block in raw_blocks:
             # block format: (x0, y0, x1, y1, "text", block_no, block_type)
@@ -120,9 +178,11 @@ class BlocksMethodStrategy(TextExtractionStrategy):
 class WordsMethodStrategy(TextExtractionStrategy):
     """Strategy using the 'words' method from PyMuPDF"""
     
-    def extract_text(self, page: fitz.Page) -> List[Dict[str, Any]]:
+    def extract_text(self, page: fitz.Page, layout: Optional[Dict[str, Any]] = None,
+                     textpage: Optional[fitz.TextPage] = None) -> List[Dict[str, Any]]:
         blocks_data = []
-        words = page.get_text("words", sort=True)
+        # LAYOUT_FLAGS are the "words" defaults, so a shared textpage gives the same output
+        words = sort_words(page.get_text("words", textpage=textpage))
         page_height = page.rect.height
         
         current_block = self._create_empty_block()
@@ -141,8 +201,8 @@ class WordsMethodStrategy(TextExtractionStrategy):
                     ))
                 current_block = self._create_empty_block()
             
-            # Update current block
-            current_block["text"].append(text)
+            # Update current block (word height stands in for the font size)
+            current_block["text"].append((text, x1 - x0, y1 - y0))
             current_block["x0"] = min(current_block["x0"], x0)
             current_block["y0"] = min(current_block["y0"], y0)
             current_block["x1"] = max(current_block["x1"], x1)
@@ -169,8 +229,8 @@ class WordsMethodStrategy(TextExtractionStrategy):
     
     def _create_block_data(self, block: Dict, page_height: float) -> Dict[str, Any]:
         """Create a standardized block data dictionary from accumulated words"""
-        # Clean up text content
-        text_content = self._clean_text(" ".join(block["text"]))
+        # Clean up text content; doubled glyphs only go if the whole block is fake bold
+        text_content = self._clean_text(" ".join(self._span_texts(block["text"])))
         
         return {
             "text_content": text_content,
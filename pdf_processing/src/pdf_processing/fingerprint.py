@@ -0,0 +1,36 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+HASH_CHUNK_SIZE = 1 << 20
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    sha256: str
+    size: int
+    mtime: float
+    ctime: float
+
+def compute_fingerprint(file_path: str) -> FileFingerprint:
+    """Hash a file's bytes in fixed-size chunks and record its size and mtime"""
+    stat = os.stat(file_path)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return FileFingerprint(sha256=digest.hexdigest(), size=stat.st_size, mtime=stat.st_mtime,
+                           ctime=stat.st_ctime)
+
+def stored_fingerprint(file_path: str, file_hash: Optional[str], file_size: Optional[int],
+                       file_mtime: Optional[float], file_ctime: Optional[float]) -> Optional[FileFingerprint]:
+    """Reuse a fingerprint recorded at processing time if size, mtime and ctime still match the file"""
+    if not file_hash:
+        return None
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    if (stat.st_size, stat.st_mtime, stat.st_ctime) != (file_size, file_mtime, file_ctime):
+        return None
+    return FileFingerprint(sha256=file_hash, size=file_size, mtime=file_mtime, ctime=file_ctime)
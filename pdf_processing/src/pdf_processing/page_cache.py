@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import fitz
+from src.config.settings import PAGE_CACHE_DIR, PAGE_CACHE_MAX_BYTES, PAGE_CACHE_MAX_PAGES
+
+# Strategies skip image blocks, so don't make MuPDF copy image bytes into the dict
+LAYOUT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Fraction of max_bytes a cache may write before checking the directory size again
+EVICT_CHECK_FRACTION = 16
+
+class PageLayoutCache:
+    """Per-document cache of page.get_text("dict") output.
+
+    Parsed pages are kept in an LRU bounded by max_pages. When a cache
+    directory and the file's content hash are known, pages are also written
+    to disk as JSON, one directory per file hash, so later runs (other
+    strategies, highlighting) skip MuPDF entirely. The directory is kept
+    under max_bytes by deleting the least recently used documents. Cached
+    layouts are shared between consumers and must be treated as read-only;
+    read back from disk, bboxes and origins are lists rather than tuples.
+    """
+    
+    def __init__(self, doc: fitz.Document, file_hash: Optional[str] = None,
+                 max_pages: int = PAGE_CACHE_MAX_PAGES, cache_dir: Optional[str] = PAGE_CACHE_DIR,
+                 max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self.doc = doc
+        self.file_hash = file_hash
+        self.max_pages = max_pages
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._pages: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._touched = False
+        self._written = None  # bytes stored since the last size check; None before the first
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, page_num: int, textpage: Optional[fitz.TextPage] = None) -> Dict[str, Any]:
+        """Return the layout dict for a zero-based page number.
+
+        textpage, a TextPage of that page built with LAYOUT_FLAGS, is used
+        instead of parsing the page again if the layout is not cached.
+        """
+        layout = self._pages.get(page_num)
+        if layout is not None:
+            self._pages.move_to_end(page_num)
+            self.hits += 1
+            return layout
+        
+        self.misses += 1
+        layout = self._load(page_num)
+        if layout is None:
+            # A textpage can only be read through the Page it was made from
+            page = textpage.parent if textpage is not None else self.doc[page_num]
+            layout = page.get_text("dict", flags=LAYOUT_FLAGS, textpage=textpage)
+            self._store(page_num, layout)
+        
+        self._pages[page_num] = layout
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return layout
+    
+    def _entry_dir(self) -> Optional[str]:
+        """This document's directory in the cache, or None without a cache directory or file hash"""
+        if not self.cache_dir or not self.file_hash:
+            return None
+        # MuPDF version and flags are part of the key since both change the output
+        return os.path.join(self.cache_dir, f"{self.file_hash}_{LAYOUT_FLAGS}_{fitz.VersionBind}")
+    
+    def _page_path(self, page_num: int) -> Optional[str]:
+        entry_dir = self._entry_dir()
+        if entry_dir is None:
+            return None
+        return os.path.join(entry_dir, f"{page_num}.json")
+    
+    def _load(self, page_num: int) -> Optional[Dict[str, Any]]:
+        path = self._page_path(page_num)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                layout = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable page cache entry {path}: {e}")
+            return None
+        if not isinstance(layout, dict) or not isinstance(layout.get("blocks"), list):
+            print(f"Warning: Ignoring malformed page cache entry {path}")
+            return None
+        
+        if not self._touched:
+            # Directory mtimes order documents for eviction; reads count as use
+            self._touched = True
+            try:
+                os.utime(os.path.dirname(path))
+            except OSError:
+                pass
+        return layout
+    
+    def _store(self, page_num: int, layout: Dict[str, Any]):
+        path = self._page_path(page_num)
+        if path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write under a temporary name so readers never see partial files
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(layout, f, separators=(',', ':'))
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write page cache entry {path}: {e}")
+            return
+        
+        # Adding a file updates the directory's mtime, so this document is
+        # now the most recently used; check the size on the first write and
+        # then after every max_bytes / EVICT_CHECK_FRACTION written
+        if self._written is not None:
+            self._written += size
+            if self._written < self.max_bytes / EVICT_CHECK_FRACTION:
+                return
+        self._written = 0
+        self._evict(keep=os.path.dirname(path))
+    
+    def _evict(self, keep: str):
+        """Delete least recently used documents until the cache directory fits in max_bytes"""
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            entry_dir = os.path.join(self.cache_dir, name)
+            try:
+                mtime = os.stat(entry_dir).st_mtime
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            entries.append((mtime, size, entry_dir))
+            total += size
+        
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry_dir == keep:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
@@ -1,52 +1,33 @@
 import fitz  # PyMuPDF
 import os
-import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Protocol
-from abc import ABC, abstractmethod
-from src.database.models import Document, TextBlock, DocumentAnalysis, StyleStatistics
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Protocol, Tuple
+from src.database.models import Document, TextBlock, DocumentAnalysis, StyleStatistics, PageStyleSpans
 from src.config.settings import PDF_FOLDER
-from src.pdf_processing.models import TextSpan
 from src.pdf_processing.text_analysis import TextAnalyzer
 from src.pdf_processing.extraction import DictMethodStrategy, BlocksMethodStrategy, WordsMethodStrategy
 from src.pdf_processing.analysis import TextAnalysisStrategy
+from src.pdf_processing.fingerprint import FileFingerprint, compute_fingerprint
+from src.pdf_processing.page_cache import LAYOUT_FLAGS, PageLayoutCache
+from src.pdf_processing.span_table import PageStyles
 
-class TextExtractionStrategy(ABC):
-    """Abstract base class for different text extraction strategies"""
-    
-    @abstractmethod
-    def extract_text(self, page: fitz.Page) -> List[Dict[str, Any]]:
-        """Extract text blocks from a page and return list of block data"""
-        pass
-    
-    def _get_color_string(self, color) -> str:
-        """Convert color value to hex string."""
-        if not color:
-            return "#000000"
-        return f"#{color:06x}" if isinstance(color, int) else str(color)
-    
-    def _determine_block_type(self, font_size: float, y_position: float, page_height: float) -> str:
-        """Determine block type based on font size and position"""
-        # Consider text in the bottom 15% of page as potential footnotes
-        if y_position > page_height * 0.85 and font_size <= 9:
-            return "footnote"
-        elif font_size >= 14:
-            return "headline"
-        return "body"
-    
-    def _clean_text(self, text: str) -> str:
-        """Clean up text artifacts"""
-        # Remove repeated characters (e.g., "EEiinnlleeiittuunngg" -> "Einleitung")
-        text = re.sub(r'(.)\1', r'\1', text)
-        
-        # Fix common OCR artifacts
-        text = re.sub(r'\.{2,}', '.', text)  # Multiple dots to single dot
-        text = re.sub(r'\s+', ' ', text)     # Multiple spaces to single space
-        
-        # Clean up Roman numerals (e.g., "II.." -> "II.")
-        text = re.sub(r'([IVX]+)\.+', r'\1.', text)
-        
-        return text.strip()
+# Bump whenever extraction output changes, so unchanged files get re-processed
+EXTRACTOR_VERSION = "3"
+
+# MuPDF keeps every object it parsed for as long as the document is open;
+# iter_batches() reopens the file after this many pages to release them
+REOPEN_AFTER_PAGES = 500
+
+@dataclass
+class PageBatch:
+    """Rows of pages [start, stop) from PDFProcessor.iter_batches(), one list entry per strategy"""
+    start: int
+    stop: int
+    text_blocks: List[List[TextBlock]]
+    analyzers: List[TextAnalyzer]
+    page_styles: List[List[PageStyles]]
 
 class PDFProcessor:
     """Main processor class that uses different extraction strategies"""
@@ -58,75 +39,317 @@ class PDFProcessor:
         "analysis": TextAnalysisStrategy(),
     }
     
-    def __init__(self, file_path: str, strategy_name: str = "dict"):
-        self.file_path = file_path
-        self.doc = fitz.open(file_path)
+    def __init__(self, file_path: str, strategy_name: str = "dict", fingerprint: Optional[FileFingerprint] = None):
         self.strategy = self.STRATEGIES.get(strategy_name)
         if not self.strategy:
             raise ValueError(f"Unknown strategy: {strategy_name}. "
                            f"Available strategies: {list(self.STRATEGIES.keys())}")
+        self.file_path = file_path
+        self.strategy_name = strategy_name
+        self.fingerprint = fingerprint
+        self.doc = fitz.open(file_path)
+        self.layout_cache = PageLayoutCache(self.doc, fingerprint.sha256 if fingerprint else None)
+        self._pages_since_open = 0
+    
+    @classmethod
+    def strategy_label(cls, strategy_name: str) -> str:
+        """Name stored in Document.strategy for a strategy key such as 'dict'"""
+        return cls.STRATEGIES[strategy_name].__class__.__name__.replace('Strategy', '').lower()
+    
+    def process_document(self, workers: int = 1,
+                         progress: Optional[Callable[[int, int], None]] = None) -> tuple[Document, List[TextBlock]]:
+        """Process a PDF document and return Document and TextBlock instances.
+
+        With workers > 1 the page range is split into contiguous shards that
+        are extracted in separate processes, each against its own fitz handle,
+        and merged back in page order. progress, if given, is called with
+        (pages done, page count) as extraction advances.
+        """
+        return self.process_strategies([self.strategy_name], workers, progress)[0]
+    
+    def process_strategies(self, strategy_names: List[str], workers: int = 1,
+                           progress: Optional[Callable[[int, int], None]] = None) -> List[tuple]:
+        """Process the document with several strategies in one pass over its pages.
+
+        Returns one process_document() result per strategy, in the given
+        order. Each page is parsed by MuPDF once and every strategy reads
+        that parse, so comparing strategies costs about one run.
+        """
+        self._prepare(strategy_names)
+        
+        if workers > 1 and len(self.doc) > 1:
+            shard_results = self._extract_sharded(workers, progress, strategy_names)
+        else:
+            shard_results = [self._extract_pages(0, len(self.doc), progress, strategy_names)]
+        
+        return [
+            self._build_result(strategy_name, [shard[index] for shard in shard_results])
+            for index, strategy_name in enumerate(strategy_names)
+        ]
+    
+    def _prepare(self, strategy_names: List[str]):
+        """Validate strategy names and fingerprint the file, which every Document row records"""
+        for strategy_name in strategy_names:
+            if strategy_name not in self.STRATEGIES:
+                raise ValueError(f"Unknown strategy: {strategy_name}. "
+                               f"Available strategies: {list(self.STRATEGIES.keys())}")
+        
+        if self.fingerprint is None:
+            self.fingerprint = compute_fingerprint(self.file_path)
+            self.layout_cache.file_hash = self.fingerprint.sha256
+    
+    def iter_batches(self, batch_pages: int, workers: int = 1,
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     strategy_names: Optional[List[str]] = None) -> Iterator[PageBatch]:
+        """Extract the document in page batches, yielding each batch's rows as soon as it is done.
+
+        Unlike process_strategies(), no TextBlock outlives its batch here:
+        the consumer stores a batch before the next one is extracted. The
+        analyzers of successive batches are deltas to merge in page order
+        and hand to analysis_rows() after the last batch. With workers > 1
+        each batch is split into shards for one process pool kept open for
+        the whole document, whose workers open the file once and reuse it.
+        """
+        strategy_names = strategy_names or [self.strategy_name]
+        self._prepare(strategy_names)
+        
+        page_count = len(self.doc)
+        executor = self._shard_pool(workers) if workers > 1 and page_count > 1 else None
+        try:
+            for start in range(0, page_count, batch_pages):
+                stop = min(start + batch_pages, page_count)
+                if executor is not None:
+                    shard_results = self._extract_shards(executor, self._shards(start, stop, workers), strategy_names)
+                else:
+                    shard_results = [self._extract_range(start, stop, strategy_names)]
+                
+                text_blocks, analyzers, page_styles = [], [], []
+                for index in range(len(strategy_names)):
+                    analyzer = TextAnalyzer()
+                    blocks, styles = [], []
+                    for shard_blocks, shard_analyzer, shard_page_styles in (shard[index] for shard in shard_results):
+                        blocks.extend(self._text_blocks(shard_blocks))
+                        analyzer.merge(shard_analyzer)
+                        styles.extend(shard_page_styles)
+                    text_blocks.append(blocks)
+                    analyzers.append(analyzer)
+                    page_styles.append(styles)
+                del shard_results
+                
+                if progress is not None:
+                    progress(stop, page_count)
+                yield PageBatch(start, stop, text_blocks, analyzers, page_styles)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    
+    def _extract_range(self, start: int, stop: int, strategy_names: List[str]) -> List[Tuple[List[Tuple[int, Dict[str, Any]]], TextAnalyzer, List[PageStyles]]]:
+        """_extract_pages() for one batch, first reopening the file once enough pages were read through this handle"""
+        if self._pages_since_open >= REOPEN_AFTER_PAGES:
+            self._reopen()
+        self._pages_since_open += stop - start
+        return self._extract_pages(start, stop, strategy_names=strategy_names)
+    
+    def _reopen(self):
+        """Swap the fitz handle for a fresh one, dropping the objects MuPDF has parsed so far"""
+        self.doc.close()
+        self.doc = fitz.open(self.file_path)
+        self.layout_cache.doc = self.doc
+        self._pages_since_open = 0
     
-    def process_document(self) -> tuple[Document, List[TextBlock]]:
-        """Process a PDF document and return Document and TextBlock instances."""
-        document = Document(
+    def new_document(self, strategy_name: str) -> Document:
+        """The Document row for this file processed with the given strategy"""
+        self._prepare([strategy_name])
+        return Document(
             id=None,
             file_path=self.file_path,
             processed_at=datetime.now(),
             file_name=os.path.basename(self.file_path),
-            strategy=self.strategy.__class__.__name__.replace('Strategy', '').lower()
+            strategy=self.strategy_label(strategy_name),
+            file_hash=self.fingerprint.sha256,
+            file_size=self.fingerprint.size,
+            file_mtime=self.fingerprint.mtime,
+            file_ctime=self.fingerprint.ctime,
+            extractor_version=EXTRACTOR_VERSION
         )
+    
+    def _text_blocks(self, blocks: List[Tuple[int, Dict[str, Any]]]) -> List[TextBlock]:
+        """TextBlock instances for extracted (page_number, block_data) pairs"""
+        text_blocks = []
+        for page_number, block_data in blocks:
+            bbox = block_data["bbox_coordinates"]
+            text_blocks.append(TextBlock(
+                id=None,
+                document_id=None,
+                page_number=page_number,
+                x0=bbox["x0"],
+                y0=bbox["y0"],
+                x1=bbox["x1"],
+                y1=bbox["y1"],
+                **block_data
+            ))
+        return text_blocks
+    
+    def _build_result(self, strategy_name: str,
+                      shard_results: List[Tuple[List[Tuple[int, Dict[str, Any]]], TextAnalyzer, List[PageStyles]]]) -> tuple:
+        """Turn one strategy's extracted shards into its Document and rows"""
+        document = self.new_document(strategy_name)
         
         text_blocks = []
-        all_spans = []  # For analysis strategy
+        analyzer = TextAnalyzer()  # For analysis strategy
+        page_styles = []
+        for shard_blocks, shard_analyzer, shard_page_styles in shard_results:
+            text_blocks.extend(self._text_blocks(shard_blocks))
+            # Shards arrive in page order, so merging keeps the serial result
+            analyzer.merge(shard_analyzer)
+            page_styles.extend(shard_page_styles)
         
-        for page_num in range(len(self.doc)):
-            page = self.doc[page_num]
-            blocks_data = self.strategy.extract_text(page)
-            
-            for block_data in blocks_data:
-                # Extract spans if present (for analysis strategy)
-                if isinstance(self.strategy, TextAnalysisStrategy):
-                    if '_spans' in block_data:
-                        all_spans.extend(block_data.pop('_spans'))
-                
-                text_block = TextBlock(
-                    id=None,
-                    document_id=None,
-                    page_number=page_num + 1,
-                    **block_data
-                )
-                text_blocks.append(text_block)
+        analysis = self.analysis_rows(strategy_name, analyzer, page_styles)
+        if analysis is not None:
+            return (document, text_blocks) + analysis
+        return document, text_blocks
+    
+    def analysis_rows(self, strategy_name: str, analyzer: TextAnalyzer,
+                      page_styles: List[PageStyles]) -> Optional[Tuple[DocumentAnalysis, List[StyleStatistics], List[PageStyleSpans]]]:
+        """(document_analysis, style_stats, style_spans) for the whole document, or None for non-analysis strategies"""
+        if not isinstance(self.STRATEGIES[strategy_name], TextAnalysisStrategy) or not analyzer.style_stats:
+            return None
         
         # Generate analysis after processing all pages
-        if isinstance(self.strategy, TextAnalysisStrategy) and all_spans:
-            analysis_data = self.strategy.analyzer.analyze_spans(all_spans)
-            document_analysis = DocumentAnalysis(
+        analysis_data = analyzer.report()
+        document_analysis = DocumentAnalysis(
+            document_id=None,
+            analysis_data=analysis_data
+        )
+        
+        style_stats = []
+        for style in analysis_data['common_styles']:
+            stat = StyleStatistics(
                 document_id=None,
-                analysis_data=analysis_data
+                font_name=style['font_name'],
+                font_size=style['font_size'],
+                font_color=style['font_color'],
+                is_bold=style['is_bold'],
+                is_italic=style['is_italic'],
+                is_underlined=style['is_underlined'],
+                occurrence_count=style['count'],
+                examples=style.get('examples', []),
+                page_distribution=style.get('page_distribution', []),
+                y_range=style.get('y_range', {'min': 0, 'max': 0}),
+                x_range=style.get('x_range', {'min': 0, 'max': 0})
             )
-            
-            style_stats = []
-            for style in analysis_data['common_styles']:
-                stat = StyleStatistics(
+            style_stats.append(stat)
+        
+        return document_analysis, style_stats, list(self.style_span_rows(analysis_data, page_styles))
+    
+    def style_span_rows(self, analysis_data: Dict[str, Any], page_styles: Iterable[PageStyles]) -> Iterator[PageStyleSpans]:
+        """Per-page rows locating the spans of each reported style, for highlighting without re-extraction"""
+        style_indexes = {
+            (style['font_name'], style['font_size'], style['font_color'],
+             style['is_bold'], style['is_italic'], style['is_underlined']): index
+            for index, style in enumerate(analysis_data['common_styles'])
+        }
+        for page in page_styles:
+            span_count, rects = page.pack(style_indexes)
+            if span_count:
+                yield PageStyleSpans(
                     document_id=None,
-                    font_name=style['font_name'],
-                    font_size=style['font_size'],
-                    font_color=style['font_color'],
-                    is_bold=style['is_bold'],
-                    is_italic=style['is_italic'],
-                    is_underlined=style['is_underlined'],
-                    occurrence_count=style['count'],
-                    examples=style.get('examples', []),
-                    page_distribution=style.get('page_distribution', []),
-                    y_range=style.get('y_range', {'min': 0, 'max': 0}),
-                    x_range=style.get('x_range', {'min': 0, 'max': 0})
+                    page_number=page.page_number,
+                    span_count=span_count,
+                    rects=rects
                 )
-                style_stats.append(stat)
+    
+    def _extract_pages(self, start: int, stop: int,
+                       progress: Optional[Callable[[int, int], None]] = None,
+                       strategy_names: Optional[List[str]] = None) -> List[Tuple[List[Tuple[int, Dict[str, Any]]], TextAnalyzer, List[PageStyles]]]:
+        """Extract block data for pages [start, stop) as (page_number, block_data) pairs, per strategy.
+
+        Returns one (blocks, analyzer, page_styles) result per strategy in
+        strategy_names (default: this processor's strategy). For the
+        analysis strategy, spans are folded into the TextAnalyzer page by
+        page and then dropped; only their bboxes and style keys are kept,
+        as one PageStyles per page.
+        """
+        strategies = [self.STRATEGIES[name] for name in strategy_names or [self.strategy_name]]
+        results = [([], TextAnalyzer(), []) for _ in strategies]
+        uses_layout = any(strategy.uses_layout for strategy in strategies)
+        # Strategies that don't read the layout parse the page themselves;
+        # when there are several strategies they all share one parse instead
+        share_textpage = len(strategies) > 1 and not all(strategy.uses_layout for strategy in strategies)
+        
+        for page_num in range(start, stop):
+            page = self.doc[page_num]
+            textpage = page.get_textpage(flags=LAYOUT_FLAGS) if share_textpage else None
+            layout = self.layout_cache.get(page_num, textpage) if uses_layout else None
+            for strategy, (blocks, analyzer, page_styles) in zip(strategies, results):
+                if isinstance(strategy, TextAnalysisStrategy):
+                    # Spans come back once per page as a SpanTable, separate from the block data
+                    blocks_data, page_spans = strategy.extract_page(page, layout)
+                    style_keys, span_style = analyzer.add_table(page_spans)
+                    page_styles.append(PageStyles(page_num + 1, page_spans, style_keys, span_style))
+                else:
+                    blocks_data = strategy.extract_text(page, layout if strategy.uses_layout else None, textpage)
+                
+                for block_data in blocks_data:
+                    blocks.append((page_num + 1, block_data))
             
-            return document, text_blocks, document_analysis, style_stats
+            if progress is not None:
+                progress(page_num + 1, stop)
         
-        return document, text_blocks
+        return results
+    
+    def _shards(self, start: int, stop: int, workers: int) -> List[Tuple[int, int]]:
+        """Split pages [start, stop) into at most `workers` contiguous ranges"""
+        shard_size = -(-(stop - start) // workers)  # ceiling division
+        return [
+            (shard_start, min(shard_start + shard_size, stop))
+            for shard_start in range(start, stop, shard_size)
+        ]
+    
+    def _extract_shards(self, executor: ProcessPoolExecutor, shards: List[Tuple[int, int]], strategy_names: List[str],
+                        progress: Optional[Callable[[int, int], None]] = None) -> List[List[Tuple[List[Tuple[int, Dict[str, Any]]], TextAnalyzer, List[PageStyles]]]]:
+        """Extract page-range shards on the executor, returned in page order"""
+        results = []
+        # map() yields in submission order, so shards come back in page order
+        for (_, stop), result in zip(shards, executor.map(
+            _extract_shard,
+            [strategy_names] * len(shards),
+            [start for start, _ in shards],
+            [stop for _, stop in shards],
+        )):
+            results.append(result)
+            if progress is not None:
+                progress(stop, len(self.doc))
+        return results
+    
+    def _extract_sharded(self, workers: int,
+                         progress: Optional[Callable[[int, int], None]] = None,
+                         strategy_names: Optional[List[str]] = None) -> List[List[Tuple[List[Tuple[int, Dict[str, Any]]], TextAnalyzer, List[PageStyles]]]]:
+        """Extract the document in page-range shards across a process pool"""
+        shards = self._shards(0, len(self.doc), workers)
+        with self._shard_pool(len(shards)) as executor:
+            return self._extract_shards(executor, shards, strategy_names or [self.strategy_name], progress)
+    
+    def _shard_pool(self, workers: int) -> ProcessPoolExecutor:
+        """A process pool whose workers each open this file once, for all the shards they extract"""
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_shard_worker,
+            initargs=(self.file_path, self.strategy_name, self.fingerprint)
+        )
     
     def __del__(self):
         if hasattr(self, 'doc'):
-            self.doc.close()
\ No newline at end of file
+            self.doc.close()
+
+# The document of a shard worker process, opened once by _init_shard_worker()
+_shard_processor: Optional[PDFProcessor] = None
+
+def _init_shard_worker(file_path: str, strategy_name: str, fingerprint: FileFingerprint):
+    """Process pool initializer: open the file for every shard this worker will extract"""
+    global _shard_processor
+    _shard_processor = PDFProcessor(file_path, strategy_name, fingerprint=fingerprint)
+
+def _extract_shard(strategy_names: List[str], start: int, stop: int):
+    """Process pool entry point: extract one page range with the worker's own fitz handle"""
+    return _shard_processor._extract_range(start, stop, strategy_names)
@@ -0,0 +1,330 @@
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from src.pdf_processing.models import TextSpan
+
+# Bits of SpanTable.flags
+BOLD = 1
+ITALIC = 2
+UNDERLINED = 4
+
+# One stored highlight rectangle: a span's bbox and the index of its style
+# among the document's StyleStatistics (ordered by id)
+STYLE_RECT_DTYPE = np.dtype([('x0', '<f4'), ('y0', '<f4'), ('x1', '<f4'), ('y1', '<f4'), ('style', 'u1')])
+
+# PageStylesSpool records: a page header, then its spans with the
+# document-wide id of their style key
+_SPOOL_PAGE_DTYPE = np.dtype([('page_number', '<i8'), ('count', '<i8')])
+_SPOOL_SPAN_DTYPE = np.dtype([('x0', '<f4'), ('y0', '<f4'), ('x1', '<f4'), ('y1', '<f4'), ('style', '<u4')])
+
+class LineGroups:
+    """Spans of a SpanTable grouped into lines.
+
+    order lists span indices line by line (sorted by y0, then x0); line i
+    covers order[starts[i]:starts[i + 1]]. x0/y0/x1/y1 are the line bboxes.
+    """
+    __slots__ = ('order', 'starts', 'x0', 'y0', 'x1', 'y1')
+
+    def __init__(self, order: np.ndarray, starts: np.ndarray,
+                 x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray):
+        self.order = order
+        self.starts = starts
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def spans(self, line: int) -> np.ndarray:
+        """Span indices of one line, left to right"""
+        stop = self.starts[line + 1] if line + 1 < len(self.starts) else len(self.order)
+        return self.order[self.starts[line]:stop]
+
+class SpanTable:
+    """Columnar store for the spans of one or more pages.
+
+    Coordinates, sizes, pages and style flags are parallel NumPy arrays;
+    font names and colours are interned into small lists and referenced by
+    id, and all span texts share one string addressed by offsets. A page
+    of spans costs a handful of arrays instead of one object per span.
+    """
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'size', 'page', 'flags',
+                 'font_id', 'color_id', 'fonts', 'colors', 'text', 'offsets')
+
+    def __init__(self, x0, y0, x1, y1, size, page, flags, font_id, color_id,
+                 fonts: List[str], colors: List[str], text: str, offsets):
+        self.x0 = np.asarray(x0, dtype=np.float64)
+        self.y0 = np.asarray(y0, dtype=np.float64)
+        self.x1 = np.asarray(x1, dtype=np.float64)
+        self.y1 = np.asarray(y1, dtype=np.float64)
+        self.size = np.asarray(size, dtype=np.float64)
+        self.page = np.asarray(page, dtype=np.int32)
+        self.flags = np.asarray(flags, dtype=np.uint8)
+        self.font_id = np.asarray(font_id, dtype=np.int32)
+        self.color_id = np.asarray(color_id, dtype=np.int32)
+        self.fonts = fonts
+        self.colors = colors
+        self.text = text
+        # Span i's text is text[offsets[i]:offsets[i + 1]]
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def empty(cls) -> 'SpanTable':
+        return cls([], [], [], [], [], [], [], [], [], [], [], "", [0])
+
+    @classmethod
+    def from_layout(cls, layout: Dict[str, Any], page_number: int,
+                    color_string: Callable[[Any], str]) -> 'SpanTable':
+        """Build a table from a page.get_text("dict") result"""
+        x0, y0, x1, y1, size, flags, font_id, color_id = [], [], [], [], [], [], [], []
+        fonts, font_ids, colors, color_ids = [], {}, [], {}
+        raw_color_ids = {}  # PyMuPDF colour value -> id of its colour string
+        texts = []
+        for block in layout["blocks"]:
+            if "lines" not in block:
+                continue
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    bbox = span["bbox"]
+                    x0.append(bbox[0])
+                    y0.append(bbox[1])
+                    x1.append(bbox[2])
+                    y1.append(bbox[3])
+                    size.append(span["size"])
+                    flags.append(font_flag_bits(span.get("flags", 0)))
+                    font_id.append(_intern(span["font"], fonts, font_ids))
+                    color = span.get("color")
+                    color_index = raw_color_ids.get(color)
+                    if color_index is None:
+                        color_index = raw_color_ids[color] = _intern(color_string(color), colors, color_ids)
+                    color_id.append(color_index)
+                    texts.append(span["text"])
+        page = np.full(len(texts), page_number, dtype=np.int32)
+        return cls(x0, y0, x1, y1, size, page, flags, font_id, color_id,
+                   fonts, colors, "".join(texts), _offsets(texts))
+
+    @classmethod
+    def from_spans(cls, spans: Iterable[TextSpan]) -> 'SpanTable':
+        """Build a table from TextSpan objects"""
+        spans = list(spans)
+        fonts, font_ids, colors, color_ids = [], {}, [], {}
+        font_id = [_intern(span.font_name, fonts, font_ids) for span in spans]
+        color_id = [_intern(span.font_color, colors, color_ids) for span in spans]
+        texts = [span.text for span in spans]
+        return cls(
+            [s.x0 for s in spans], [s.y0 for s in spans], [s.x1 for s in spans], [s.y1 for s in spans],
+            [s.font_size for s in spans], [s.page_number for s in spans],
+            [BOLD * bool(s.is_bold) | ITALIC * bool(s.is_italic) | UNDERLINED * bool(s.is_underlined)
+             for s in spans],
+            font_id, color_id, fonts, colors, "".join(texts), _offsets(texts)
+        )
+
+    @classmethod
+    def concat(cls, tables: List['SpanTable']) -> 'SpanTable':
+        """Join tables (e.g. pages) into one, re-interning fonts and colours"""
+        tables = [table for table in tables if len(table)]
+        if not tables:
+            return cls.empty()
+        fonts, font_ids, colors, color_ids = [], {}, [], {}
+        font_maps, color_maps = [], []
+        for table in tables:
+            font_maps.append(np.array([_intern(font, fonts, font_ids) for font in table.fonts], dtype=np.int32))
+            color_maps.append(np.array([_intern(color, colors, color_ids) for color in table.colors], dtype=np.int32))
+        bases = np.cumsum([0] + [len(table.text) for table in tables[:-1]])
+        offsets = np.concatenate(
+            [table.offsets[:-1] + base for table, base in zip(tables, bases)] + [[bases[-1] + len(tables[-1].text)]]
+        )
+        return cls(
+            np.concatenate([t.x0 for t in tables]), np.concatenate([t.y0 for t in tables]),
+            np.concatenate([t.x1 for t in tables]), np.concatenate([t.y1 for t in tables]),
+            np.concatenate([t.size for t in tables]), np.concatenate([t.page for t in tables]),
+            np.concatenate([t.flags for t in tables]),
+            np.concatenate([m[t.font_id] for t, m in zip(tables, font_maps)]),
+            np.concatenate([m[t.color_id] for t, m in zip(tables, color_maps)]),
+            fonts, colors, "".join(t.text for t in tables), offsets
+        )
+
+    def __len__(self) -> int:
+        return len(self.x0)
+
+    def span_text(self, index: int) -> str:
+        return self.text[self.offsets[index]:self.offsets[index + 1]]
+
+    def text_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def span(self, index: int) -> TextSpan:
+        """One span as a TextSpan object"""
+        flags = int(self.flags[index])
+        return TextSpan(
+            text=self.span_text(index),
+            x0=float(self.x0[index]),
+            y0=float(self.y0[index]),
+            x1=float(self.x1[index]),
+            y1=float(self.y1[index]),
+            font_name=self.fonts[self.font_id[index]],
+            font_size=float(self.size[index]),
+            font_color=self.colors[self.color_id[index]],
+            is_bold=bool(flags & BOLD),
+            is_italic=bool(flags & ITALIC),
+            is_underlined=bool(flags & UNDERLINED),
+            page_number=int(self.page[index])
+        )
+
+    def to_spans(self) -> List[TextSpan]:
+        return [self.span(i) for i in range(len(self))]
+
+    def group_into_lines(self, y_tolerance: float = 3) -> LineGroups:
+        """Group spans into lines the way TextAnalyzer._group_into_lines does"""
+        return group_lines(self.x0, self.y0, self.x1, self.y1, y_tolerance)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the table"""
+        arrays = sum(getattr(self, name).nbytes for name in
+                     ('x0', 'y0', 'x1', 'y1', 'size', 'page', 'flags', 'font_id', 'color_id', 'offsets'))
+        return arrays + len(self.text.encode('utf-8')) + sum(len(s) for s in self.fonts + self.colors)
+
+class PageStyles:
+    """Bboxes and style keys of one page's spans, kept until the document's common styles are known"""
+    __slots__ = ('page_number', 'x0', 'y0', 'x1', 'y1', 'style', 'style_keys')
+
+    def __init__(self, page_number: int, table: SpanTable, style_keys: List[tuple], style: np.ndarray):
+        self.page_number = page_number
+        self.x0 = table.x0.astype(np.float32)
+        self.y0 = table.y0.astype(np.float32)
+        self.x1 = table.x1.astype(np.float32)
+        self.y1 = table.y1.astype(np.float32)
+        self.style = style
+        self.style_keys = style_keys
+
+    @classmethod
+    def from_columns(cls, page_number: int, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray,
+                     style: np.ndarray, style_keys: List[tuple]) -> "PageStyles":
+        page = cls.__new__(cls)
+        page.page_number = page_number
+        page.x0, page.y0, page.x1, page.y1 = x0, y0, x1, y1
+        page.style = style
+        page.style_keys = style_keys
+        return page
+
+    def pack(self, style_indexes: Dict[tuple, int]) -> Tuple[int, bytes]:
+        """(count, packed STYLE_RECT_DTYPE records) of the spans whose style key is in style_indexes"""
+        lookup = np.array([style_indexes.get(key, -1) for key in self.style_keys], dtype=np.int16)
+        span_style = lookup[self.style]
+        keep = np.flatnonzero(span_style >= 0)
+        return len(keep), pack_style_rects(
+            self.x0[keep], self.y0[keep], self.x1[keep], self.y1[keep], span_style[keep]
+        )
+
+class PageStylesSpool:
+    """PageStyles of a whole document, kept in a temporary file.
+
+    Which spans are stored depends on the document's common styles, known
+    only after its last page; spooling the pages until then keeps memory
+    bounded when a document is processed in batches.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._style_ids: Dict[tuple, int] = {}
+
+    def extend(self, pages: Iterable[PageStyles]) -> None:
+        self._file.seek(0, 2)
+        for page in pages:
+            ids = np.array([self._style_ids.setdefault(key, len(self._style_ids)) for key in page.style_keys],
+                           dtype=np.uint32)
+            spans = np.empty(len(page.style), dtype=_SPOOL_SPAN_DTYPE)
+            spans['x0'], spans['y0'], spans['x1'], spans['y1'] = page.x0, page.y0, page.x1, page.y1
+            spans['style'] = ids[page.style]
+            self._file.write(np.array([(page.page_number, len(spans))], dtype=_SPOOL_PAGE_DTYPE).tobytes())
+            self._file.write(spans.tobytes())
+
+    def __iter__(self) -> Iterator[PageStyles]:
+        """The spooled pages in the order they were added; style_keys are shared by all of them"""
+        style_keys = list(self._style_ids)
+        self._file.seek(0)
+        while True:
+            header = self._file.read(_SPOOL_PAGE_DTYPE.itemsize)
+            if not header:
+                break
+            page_number, count = np.frombuffer(header, dtype=_SPOOL_PAGE_DTYPE)[0].tolist()
+            spans = np.frombuffer(self._file.read(count * _SPOOL_SPAN_DTYPE.itemsize), dtype=_SPOOL_SPAN_DTYPE)
+            yield PageStyles.from_columns(page_number, spans['x0'], spans['y0'], spans['x1'], spans['y1'],
+                                          spans['style'], style_keys)
+
+    def close(self) -> None:
+        self._file.close()
+
+def group_lines(x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray,
+                y_tolerance: float = 3) -> LineGroups:
+    """Sort boxes by (y0, x0) and cut them into lines.
+
+    A box joins the current line while its y0 is within y_tolerance of the
+    y0 of the line's first box. Since that anchor moves with every line,
+    the cuts are found by jumping from anchor to anchor with a binary
+    search rather than by thresholding neighbouring differences, which
+    would let a slowly drifting baseline chain into one long line.
+    """
+    order = np.lexsort((x0, y0))
+    y_sorted = y0[order]
+    count = len(order)
+    if not count:
+        empty = np.empty(0)
+        return LineGroups(order, np.empty(0, dtype=np.intp), empty, empty, empty, empty)
+
+    # First box past each box's tolerance window, as a candidate for the next cut
+    ends = np.searchsorted(y_sorted, y_sorted + y_tolerance, side='right').tolist()
+    ys = y_sorted.tolist()
+    starts = []
+    start = 0
+    while start < count:
+        starts.append(start)
+        anchor = ys[start]
+        end = max(ends[start], start + 1)
+        # y + tol can round differently from y - anchor <= tol; settle the
+        # cut with the exact comparison of the sequential grouping
+        while end < count and ys[end] - anchor <= y_tolerance:
+            end += 1
+        while end > start + 1 and ys[end - 1] - anchor > y_tolerance:
+            end -= 1
+        start = end
+    starts = np.array(starts, dtype=np.intp)
+
+    return LineGroups(
+        order, starts,
+        np.minimum.reduceat(x0[order], starts),
+        np.minimum.reduceat(y_sorted, starts),
+        np.maximum.reduceat(x1[order], starts),
+        np.maximum.reduceat(y1[order], starts)
+    )
+
+def pack_style_rects(x0, y0, x1, y1, style) -> bytes:
+    """Pack parallel bbox/style columns into STYLE_RECT_DTYPE records"""
+    rects = np.empty(len(style), dtype=STYLE_RECT_DTYPE)
+    rects['x0'], rects['y0'], rects['x1'], rects['y1'] = x0, y0, x1, y1
+    rects['style'] = style
+    return rects.tobytes()
+
+def unpack_style_rects(data: bytes) -> np.ndarray:
+    """Records packed by pack_style_rects, as a read-only structured array"""
+    return np.frombuffer(data, dtype=STYLE_RECT_DTYPE)
+
+def font_flag_bits(flags: Optional[int]) -> int:
+    """SpanTable flag bits from PyMuPDF span flags"""
+    if not flags:
+        return 0
+    return (BOLD if flags & 2**4 else 0) | (ITALIC if flags & 2**1 else 0) | (UNDERLINED if flags & 2**2 else 0)
+
+def _offsets(texts: List[str]) -> np.ndarray:
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in texts], out=offsets[1:])
+    return offsets
+
+def _intern(value: str, values: List[str], ids: Dict[str, int]) -> int:
+    index = ids.get(value)
+    if index is None:
+        index = ids[value] = len(values)
+        values.append(value)
+    return index
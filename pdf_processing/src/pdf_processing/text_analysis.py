@@ -1,29 +1,130 @@
-from collections import defaultdict
-from typing import List, Dict, Any
-from statistics import mean, stdev
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 from src.pdf_processing.models import TextSpan, TextLine
+from src.pdf_processing.span_table import BOLD, ITALIC, UNDERLINED, LineGroups, SpanTable, group_lines
 
-class TextAnalyzer:
+class RunningStats:
+    """Running count/min/max/mean/variance (Welford) that can be merged"""
+    __slots__ = ('count', 'min', 'max', 'mean', 'm2')
+    
+    def __init__(self):
+        self.count = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.mean = 0.0
+        self.m2 = 0.0
+    
+    def add(self, value: float):
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+    
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Combine with another partial result (Chan et al. parallel update)"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.min, self.max = other.count, other.min, other.max
+            self.mean, self.m2 = other.mean, other.m2
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+    
+    @classmethod
+    def from_summary(cls, count: int, minimum: float, maximum: float, mean: float, m2: float) -> 'RunningStats':
+        """Stats of a batch whose aggregates were computed elsewhere (e.g. vectorized)"""
+        stats = cls()
+        stats.count, stats.min, stats.max, stats.mean, stats.m2 = count, minimum, maximum, mean, m2
+        return stats
+    
+    def stdev(self) -> float:
+        """Sample standard deviation, matching statistics.stdev"""
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+def _grouped_stats(values: np.ndarray, starts, counts) -> List[tuple]:
+    """(count, min, max, mean, m2) of each contiguous group of values"""
+    starts = np.asarray(starts, dtype=np.intp)
+    counts = np.asarray(counts, dtype=np.int64)
+    if not len(values):
+        return [(0, float('inf'), float('-inf'), 0.0, 0.0) for _ in counts]
+    means = np.add.reduceat(values, starts) / counts
+    deviations = values - np.repeat(means, counts)
+    m2 = np.add.reduceat(deviations * deviations, starts)
+    return list(zip(
+        counts.tolist(),
+        np.minimum.reduceat(values, starts).tolist(),
+        np.maximum.reduceat(values, starts).tolist(),
+        means.tolist(),
+        m2.tolist()
+    ))
+
+class StyleAccumulator:
+    """Bounded per-style aggregates: counts, first examples, page bitmap and coordinate ranges"""
+    __slots__ = ('count', 'examples', 'pages', 'y', 'x')
+    
     def __init__(self):
-        self.style_stats = defaultdict(lambda: {
-            'count': 0,
-            'examples': [],
-            'page_occurrences': set(),
-            'y_coords': [],
-            'x_coords': []
-        })
-        self.line_width_stats = []
-        self.margin_stats = []
+        self.count = 0
+        self.examples = []
+        self.pages = 0  # bit n set <=> style occurs on page n
+        self.y = RunningStats()
+        self.x = RunningStats()
+    
+    def merge(self, other: 'StyleAccumulator', max_examples: int) -> 'StyleAccumulator':
+        self.count += other.count
+        self.examples.extend(other.examples[:max_examples - len(self.examples)])
+        self.pages |= other.pages
+        self.y.merge(other.y)
+        self.x.merge(other.x)
+        return self
+    
+    def page_numbers(self) -> List[int]:
+        bits = bin(self.pages)[:1:-1]  # least significant bit first
+        return [page for page, bit in enumerate(bits) if bit == '1']
+
+class TextAnalyzer:
+    """Collects style and layout statistics from text spans.
+
+    Spans can be fed incrementally (e.g. page by page) with add_spans(); only
+    running aggregates are kept, so memory does not grow with document length.
+    Partial analyzers built over different page ranges can be combined with
+    merge() before calling report().
+    """
+    
+    def __init__(self, max_examples: int = 3):
+        self.max_examples = max_examples
+        self.style_stats: Dict[tuple, StyleAccumulator] = {}
+        self.line_width_stats = RunningStats()
+        self.margin_stats = RunningStats()
+    
+    def reset(self):
+        """Discard all collected statistics"""
+        self.style_stats = {}
+        self.line_width_stats = RunningStats()
+        self.margin_stats = RunningStats()
         
     def analyze_spans(self, spans: List[TextSpan]) -> Dict[str, Any]:
         """Analyze text spans and collect statistics"""
         # Reset statistics for new analysis
-        self.style_stats.clear()
-        self.line_width_stats.clear()
-        self.margin_stats.clear()
-        
+        self.reset()
+        self.add_spans(spans)
+        return self.report()
+    
+    def add_spans(self, spans: List[TextSpan], lines: Optional[List[TextLine]] = None):
+        """Fold a batch of spans (typically one page) into the running statistics"""
         # Group spans by approximate y-coordinate
-        lines = self._group_into_lines(spans)
+        if lines is None:
+            lines = self._group_into_lines(spans)
         
         # Collect style statistics
         for span in spans:
@@ -38,21 +139,23 @@ class TextAnalyzer:
                 )
                 
                 # Update statistics
-                stats = self.style_stats[style_key]
-                stats['count'] += 1
+                stats = self.style_stats.get(style_key)
+                if stats is None:
+                    stats = self.style_stats[style_key] = StyleAccumulator()
+                stats.count += 1
                 
                 # Store example text (limit to 100 chars)
                 if len(span.text.strip()) > 3:  # Only store meaningful examples
-                    if len(stats['examples']) < 3:  # Store up to 3 examples
-                        stats['examples'].append(span.text[:100])
+                    if len(stats.examples) < self.max_examples:
+                        stats.examples.append(span.text[:100])
                 
-                # Store coordinates
-                stats['y_coords'].append(span.y0)
-                stats['x_coords'].append(span.x0)
+                # Track coordinates
+                stats.y.add(span.y0)
+                stats.x.add(span.x0)
                 
                 # Store page number if available
                 if hasattr(span, 'page_number'):
-                    stats['page_occurrences'].add(span.page_number)
+                    stats.pages |= 1 << span.page_number
                 
             except (ValueError, TypeError) as e:
                 print(f"Warning: Skipping span due to invalid data: {e}")
@@ -63,61 +166,133 @@ class TextAnalyzer:
             try:
                 width = float(line.x1 - line.x0)
                 margin = float(line.x0)
-                self.line_width_stats.append(width)
-                self.margin_stats.append(margin)
+                self.line_width_stats.add(width)
+                self.margin_stats.add(margin)
             except (ValueError, TypeError) as e:
                 print(f"Warning: Skipping line metrics due to invalid data: {e}")
                 continue
+    
+    def add_table(self, table: SpanTable, lines: Optional[LineGroups] = None) -> Tuple[List[tuple], np.ndarray]:
+        """Fold a SpanTable into the running statistics, vectorized per style.
+
+        Gives the same statistics as add_spans() over the same spans, up to
+        floating-point rounding of the coordinate means and deviations.
+        Returns the table's style keys and, per span, the index of its key.
+        """
+        if not len(table):
+            return [], np.empty(0, dtype=np.intp)
+        if lines is None:
+            lines = table.group_into_lines()
+        
+        # One integer code per distinct style key; font sizes are compared
+        # exactly, as the tuple keys of add_spans() do
+        sizes, size_id = np.unique(table.size, return_inverse=True)
+        code = ((table.font_id.astype(np.int64) * len(table.colors) + table.color_id)
+                * len(sizes) + size_id) * 8 + table.flags
+        # Styles in order of first occurrence, so ties in report() keep the order of add_spans()
+        _, first, inverse, counts = np.unique(code, return_index=True, return_inverse=True, return_counts=True)
+        by_first = np.argsort(first)
+        
+        # Span indices grouped by style, in span order within each style
+        order = np.argsort(inverse, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        
+        y_stats = _grouped_stats(table.y0[order], starts, counts)
+        x_stats = _grouped_stats(table.x0[order], starts, counts)
+        
+        page_bits = np.unique(inverse.astype(np.int64) << 32 | table.page)
+        pages = {}
+        for value in page_bits.tolist():
+            group = value >> 32
+            pages[group] = pages.get(group, 0) | 1 << (value & 0xFFFFFFFF)
+        
+        style_keys = [None] * len(counts)
+        for group in by_first.tolist():
+            span = first[group]
+            flags = int(table.flags[span])
+            style_key = (
+                table.fonts[table.font_id[span]],
+                float(table.size[span]),
+                table.colors[table.color_id[span]],
+                bool(flags & BOLD),
+                bool(flags & ITALIC),
+                bool(flags & UNDERLINED)
+            )
+            style_keys[group] = style_key
+            stats = self.style_stats.get(style_key)
+            if stats is None:
+                stats = self.style_stats[style_key] = StyleAccumulator()
+            stats.count += int(counts[group])
+            stats.pages |= pages[group]
+            stats.y.merge(RunningStats.from_summary(*y_stats[group]))
+            stats.x.merge(RunningStats.from_summary(*x_stats[group]))
+            
+            # Only styles still short of examples look at their texts
+            if len(stats.examples) < self.max_examples:
+                for index in order[starts[group]:starts[group] + counts[group]].tolist():
+                    text = table.span_text(index)
+                    if len(text.strip()) > 3:
+                        stats.examples.append(text[:100])
+                        if len(stats.examples) >= self.max_examples:
+                            break
         
+        widths = lines.x1 - lines.x0
+        self.line_width_stats.merge(RunningStats.from_summary(*_grouped_stats(widths, [0], [len(widths)])[0]))
+        self.margin_stats.merge(RunningStats.from_summary(*_grouped_stats(lines.x0, [0], [len(lines.x0)])[0]))
+        return style_keys, inverse.reshape(-1)
+    
+    def merge(self, other: 'TextAnalyzer') -> 'TextAnalyzer':
+        """Fold another analyzer's statistics into this one.
+
+        Merging partial analyzers in page order gives the same report as
+        feeding all spans to a single analyzer.
+        """
+        for style_key, other_stats in other.style_stats.items():
+            stats = self.style_stats.get(style_key)
+            if stats is None:
+                stats = self.style_stats[style_key] = StyleAccumulator()
+            stats.merge(other_stats, self.max_examples)
+        self.line_width_stats.merge(other.line_width_stats)
+        self.margin_stats.merge(other.margin_stats)
+        return self
+    
+    def report(self) -> Dict[str, Any]:
+        """Generate the analysis report from the statistics collected so far"""
         return self._generate_analysis_report()
     
     def _group_into_lines(self, spans: List[TextSpan], y_tolerance: float = 3) -> List[TextLine]:
         """Group spans into lines based on y-coordinates"""
-        # Sort spans by y0 coordinate
-        sorted_spans = sorted(spans, key=lambda s: (s.y0, s.x0))
-        lines = []
-        current_line = []
-        current_y = None
-        
-        for span in sorted_spans:
-            if current_y is None:
-                current_y = span.y0
-                
-            if abs(span.y0 - current_y) <= y_tolerance:
-                current_line.append(span)
-            else:
-                if current_line:
-                    lines.append(self._create_line(current_line))
-                current_line = [span]
-                current_y = span.y0
-                
-        if current_line:
-            lines.append(self._create_line(current_line))
-            
-        return lines
-    
-    def _create_line(self, spans: List[TextSpan]) -> TextLine:
-        """Create a TextLine from a list of spans"""
-        return TextLine(
-            spans=spans,
-            y0=min(s.y0 for s in spans),
-            y1=max(s.y1 for s in spans),
-            x0=min(s.x0 for s in spans),
-            x1=max(s.x1 for s in spans)
+        if not spans:
+            return []
+        groups = group_lines(
+            np.array([s.x0 for s in spans], dtype=np.float64),
+            np.array([s.y0 for s in spans], dtype=np.float64),
+            np.array([s.x1 for s in spans], dtype=np.float64),
+            np.array([s.y1 for s in spans], dtype=np.float64),
+            y_tolerance
         )
+        sorted_spans = [spans[i] for i in groups.order.tolist()]
+        bounds = groups.starts.tolist() + [len(spans)]
+        return [
+            TextLine(spans=sorted_spans[start:stop], y0=y0, y1=y1, x0=x0, x1=x1)
+            for start, stop, x0, y0, x1, y1 in zip(
+                bounds, bounds[1:], groups.x0.tolist(), groups.y0.tolist(),
+                groups.x1.tolist(), groups.y1.tolist()
+            )
+        ]
     
     def _generate_analysis_report(self) -> Dict[str, Any]:
         """Generate statistical report from collected data"""
         try:
             # Calculate common line widths
-            avg_width = mean(self.line_width_stats) if self.line_width_stats else 0.0
-            width_std = stdev(self.line_width_stats) if len(self.line_width_stats) > 1 else 0.0
-            avg_margin = mean(self.margin_stats) if self.margin_stats else 0.0
+            avg_width = self.line_width_stats.mean
+            width_std = self.line_width_stats.stdev()
+            avg_margin = self.margin_stats.mean
             
             # Sort style statistics
             sorted_styles = sorted(
                 self.style_stats.items(),
-                key=lambda x: x[1]['count'],
+                key=lambda x: x[1].count,
                 reverse=True
             )
             
@@ -132,16 +307,16 @@ class TextAnalyzer:
                         "is_bold": bool(style[3]),
                         "is_italic": bool(style[4]),
                         "is_underlined": bool(style[5]),
-                        "count": int(stats['count']),
-                        "examples": stats['examples'],
-                        "page_distribution": sorted(stats['page_occurrences']),
+                        "count": int(stats.count),
+                        "examples": stats.examples,
+                        "page_distribution": stats.page_numbers(),
                         "y_range": {
-                            "min": min(stats['y_coords']),
-                            "max": max(stats['y_coords'])
+                            "min": stats.y.min,
+                            "max": stats.y.max
                         },
                         "x_range": {
-                            "min": min(stats['x_coords']),
-                            "max": max(stats['x_coords'])
+                            "min": stats.x.min,
+                            "max": stats.x.max
                         }
                     }
                     common_styles.append(style_dict)
@@ -1,24 +1,60 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi import FastAPI, Request, Depends, HTTPException, Query, File, UploadFile
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import update
+import asyncio
 import os
+from datetime import datetime
+from typing import Optional
 from fastapi.responses import Response
 from starlette.responses import StreamingResponse
 import mimetypes
 
-from src.database.connection import get_db
-from src.database.models import Document, TextBlock, DocumentAnalysis, StyleStatistics
-from src.config.settings import PDF_FOLDER, BASE_DIR
+from src.database import queries
+from src.database.connection import get_async_db, async_engine
+from src.database.pool import pool_metrics
+from src.database.search import search_text_blocks_async, supports_search
+from src.database.jobs import ACTIVE_STATUSES, JOB_QUEUED, PENDING_STRATEGY, job_status
+from src.database.models import Document, ProcessingJob
+from src.config.settings import (
+    BASE_DIR, PDF_FOLDER, HIGHLIGHT_CACHE_DIR, HIGHLIGHT_CACHE_MAX_BYTES,
+    UPLOAD_MAX_BYTES, JOB_MAX_ATTEMPTS,
+    RENDER_POOL_WORKERS, RENDER_POOL_MAX_PENDING, RENDER_TIMEOUT_SECONDS, RENDER_STREAM_TIMEOUT_SECONDS,
+    RENDER_STREAM_IDLE_SECONDS
+)
 from src.pdf_processing.processor import PDFProcessor
+from src.pdf_processing.span_table import unpack_style_rects
+from src.web.highlight_cache import HighlightedPDFCache
+from src.web.ranges import file_response, tail_file
+from src.web.uploads import save_upload
+from src.web.render_pool import (
+    RenderAbandoned, RenderPool, RenderPoolFull, RenderTimeout, highlight_overlay, render_highlighted_pdf, style_rows
+)
 
 app = FastAPI()
 
-# Mount static files
+# Documents listed per page of /
+DOCUMENT_LIST_PAGE_SIZE = 50
+
+# Pages of text blocks returned per /api/documents/{id}/pages request
+PAGE_WINDOW_DEFAULT = 5
+PAGE_WINDOW_MAX = 50
+SEARCH_LIMIT_MAX = 100
+
+# Mount static files; pdf.js is an ES module, which browsers only run when
+# served as JavaScript
+mimetypes.add_type("text/javascript", ".mjs")
 app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "src", "web", "static")), name="static")
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "src", "web", "templates"))
+highlight_cache = HighlightedPDFCache(HIGHLIGHT_CACHE_DIR, HIGHLIGHT_CACHE_MAX_BYTES)
+render_pool = RenderPool(RENDER_POOL_WORKERS, RENDER_POOL_MAX_PENDING, RENDER_TIMEOUT_SECONDS)
+
+@app.on_event("shutdown")
+def shutdown_render_pool():
+    render_pool.shutdown()
 
 # Create a template filter to generate highlight colors
 def highlight_color(index: int) -> str:
@@ -41,47 +77,200 @@ def highlight_color(index: int) -> str:
 templates.env.filters["highlight_color"] = highlight_color
 
 @app.get("/")
-async def list_documents(request: Request, db: Session = Depends(get_db)):
-    documents = db.query(Document).all()
+async def list_documents(
+    request: Request,
+    before: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Newest documents first, DOCUMENT_LIST_PAGE_SIZE at a time below the `before` id"""
+    documents = (await db.execute(
+        queries.documents_before(before, DOCUMENT_LIST_PAGE_SIZE)
+    )).scalars().all()
+    next_before = documents[-1].id if len(documents) == DOCUMENT_LIST_PAGE_SIZE else None
     return templates.TemplateResponse(
         "document_list.html",
-        {"request": request, "documents": documents}
+        {"request": request, "documents": documents, "before": before, "next_before": next_before,
+         "pending_strategy": PENDING_STRATEGY}
     )
 
 @app.get("/view/{document_id}")
-async def view_document(request: Request, document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def view_document(request: Request, document_id: int, db: AsyncSession = Depends(get_async_db)):
+    document = (await db.execute(queries.document_by_id(document_id))).scalars().first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-        
-    text_blocks = db.query(TextBlock)\
-        .filter(TextBlock.document_id == document_id)\
-        .order_by(
-            TextBlock.page_number,
-            text("(bbox_coordinates->>'y0')::float")
-        )\
-        .all()
-    
-    # Group blocks by page
-    pages = {}
-    for block in text_blocks:
-        if block.page_number not in pages:
-            pages[block.page_number] = []
-        pages[block.page_number].append(block)
+    if document.strategy == PENDING_STRATEGY:
+        raise HTTPException(status_code=409,
+                            detail=f"Document {document_id} has not been processed yet; "
+                                   f"POST /documents/{document_id}/process to queue it")
     
+    # Text blocks are fetched page window by page window from
+    # /api/documents/{id}/pages as the text pane scrolls
     return templates.TemplateResponse(
         "viewer.html",
         {
             "request": request,
             "document": document,
-            "pages": pages,
-            "pdf_path": f"/pdf/{document_id}"
+            "pdf_path": f"/pdf/{document_id}",
+            "page_window": PAGE_WINDOW_DEFAULT
         }
     )
 
-@app.get("/pdf/{document_id}")
-async def get_pdf(document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+@app.get("/api/documents/{document_id}/pages")
+async def get_document_pages(
+    document_id: int,
+    after_page: int = Query(0, ge=0),
+    limit: int = Query(PAGE_WINDOW_DEFAULT, ge=1, le=PAGE_WINDOW_MAX),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Text blocks for the next `limit` pages after `after_page` (keyset pagination)"""
+    document = (await db.execute(queries.document_by_id(document_id))).scalars().first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    page_numbers = (await db.execute(
+        queries.page_numbers_after(document_id, after_page, limit)
+    )).scalars().all()
+    if not page_numbers:
+        return {"pages": [], "next_after_page": None}
+    
+    text_blocks = (await db.execute(
+        queries.blocks_for_pages(document_id, page_numbers[0], page_numbers[-1])
+    )).scalars().all()
+    
+    # Group blocks by page
+    pages = {page_number: [] for page_number in page_numbers}
+    for block in text_blocks:
+        pages[block.page_number].append({
+            "id": block.id,
+            "text_content": block.text_content,
+            "bbox": {"x0": block.x0, "y0": block.y0, "x1": block.x1, "y1": block.y1},
+            "font_size": block.font_size,
+            "font_color": block.font_color,
+            "block_type": block.block_type
+        })
+    
+    return {
+        "pages": [
+            {"page_number": page_number, "blocks": blocks}
+            for page_number, blocks in pages.items()
+        ],
+        "next_after_page": page_numbers[-1] if len(page_numbers) == limit else None
+    }
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    document_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=SEARCH_LIMIT_MAX),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ranked text block hits with document, page and bbox for highlighting
+
+    Results are recency-capped: only the newest `max_ranked_matches` matching
+    text blocks (the most recently processed documents) are ranked. When a
+    query matches more, `truncated` is true, `notice` says so, and the hits
+    are the best among recent blocks rather than the best overall; narrow
+    the query or pass `document_id` to reach older ones.
+    """
+    dialect = db.get_bind().dialect.name
+    if not supports_search(dialect):
+        raise HTTPException(status_code=501, detail=f"Full-text search is not supported on {dialect}")
+    found = await search_text_blocks_async(db, q, limit=limit, document_id=document_id)
+    notice = None
+    if found["truncated"]:
+        notice = (f"Only the newest {found['max_ranked_matches']} matching text blocks were ranked; "
+                  "older matches were not considered. Narrow the query or pass document_id to reach them.")
+    return {"query": q, **found, "notice": notice}
+
+@app.post("/documents/upload", status_code=201)
+async def upload_document(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    """Store an uploaded PDF in PDF_FOLDER; processing is requested separately
+
+    The document row is a placeholder with strategy PENDING_STRATEGY, listed
+    as pending and not viewable until processed. It is not deleted: the
+    first job that processes the upload fills in this same row (see
+    _claim_upload() in scripts/job_worker.py), so its id stays valid. An
+    upload that is never processed stays listed as pending.
+    """
+    path = await save_upload(file, PDF_FOLDER, UPLOAD_MAX_BYTES)
+    # processed_at is required; until a job fills the row in it is the upload time
+    document = Document(
+        file_path=path,
+        processed_at=datetime.now(),
+        file_name=os.path.basename(path),
+        strategy=PENDING_STRATEGY
+    )
+    db.add(document)
+    await db.commit()
+    return {
+        "document_id": document.id,
+        "file_name": document.file_name,
+        "process_url": f"/documents/{document.id}/process"
+    }
+
+@app.post("/documents/{document_id}/process", status_code=202)
+async def process_document(
+    document_id: int,
+    strategy: str = Query("dict"),
+    force: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue a processing job; a job already queued or running for the same strategy is reused"""
+    if strategy not in PDFProcessor.STRATEGIES:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown strategy: {strategy}. "
+                                   f"Available strategies: {list(PDFProcessor.STRATEGIES.keys())}")
+    document = (await db.execute(queries.document_by_id(document_id))).scalars().first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    job = (await db.execute(queries.active_job(document_id, strategy, ACTIVE_STATUSES))).scalars().first()
+    if job is None:
+        job = ProcessingJob(
+            document_id=document_id,
+            strategy=strategy,
+            force=force,
+            status=JOB_QUEUED,
+            attempts=0,
+            max_attempts=JOB_MAX_ATTEMPTS,
+            progress=0.0
+        )
+        db.add(job)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request queued the job first (ux_processing_jobs_active)
+            await db.rollback()
+            job = (await db.execute(queries.active_job(document_id, strategy, ACTIVE_STATUSES))).scalars().first()
+            if job is None:
+                raise HTTPException(status_code=409, detail="Job changed concurrently, please retry")
+    
+    if force and not job.force:
+        # Only a job that has not started yet can still be told to reprocess
+        forced = await db.execute(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == job.id, ProcessingJob.status == JOB_QUEUED)
+            .values(force=True)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if forced.rowcount != 1:
+            raise HTTPException(status_code=409,
+                                detail=f"Job {job.id} is already running without force; retry once it has finished")
+        await db.refresh(job)
+    return JSONResponse(job_status(job), status_code=202, headers={"Location": f"/jobs/{job.id}"})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Status and progress of a processing job"""
+    job = (await db.execute(queries.job_by_id(job_id))).scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+@app.api_route("/pdf/{document_id}", methods=["GET", "HEAD"])
+async def get_pdf(request: Request, document_id: int, db: AsyncSession = Depends(get_async_db)):
+    document = (await db.execute(queries.document_by_id(document_id))).scalars().first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
         
@@ -91,35 +280,25 @@ async def get_pdf(document_id: int, db: Session = Depends(get_db)):
             detail="PDF file not found on disk"
         )
 
-    def iterfile():
-        with open(document.file_path, 'rb') as f:
-            yield from f
-
     # Use a simple filename without special characters
     safe_filename = f"document_{document_id}.pdf"
 
-    return StreamingResponse(
-        iterfile(),
+    return file_response(
+        request,
+        document.file_path,
         media_type="application/pdf",
-        headers={
-            'Content-Disposition': f'inline; filename="{safe_filename}"',
-            'Accept-Ranges': 'bytes'
-        }
+        headers={'Content-Disposition': f'inline; filename="{safe_filename}"'}
     )
 
 @app.get("/analysis/{document_id}")
-async def view_analysis(request: Request, document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def view_analysis(request: Request, document_id: int, db: AsyncSession = Depends(get_async_db)):
+    document = (await db.execute(queries.document_by_id(document_id))).scalars().first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    analysis = db.query(DocumentAnalysis)\
-        .filter(DocumentAnalysis.document_id == document_id)\
-        .first()
+    analysis = (await db.execute(queries.analysis_for_document(document_id))).scalars().first()
     
-    style_stats = db.query(StyleStatistics)\
-        .filter(StyleStatistics.document_id == document_id)\
-        .all()
+    style_stats = (await db.execute(queries.style_stats_for_document(document_id))).scalars().all()
     
     return templates.TemplateResponse(
         "analysis.html",
@@ -131,55 +310,190 @@ async def view_analysis(request: Request, document_id: int, db: Session = Depend
         }
     )
 
-@app.get("/analysis/{document_id}/highlighted-pdf")
-async def get_highlighted_pdf(document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+@app.api_route("/analysis/{document_id}/highlighted-pdf", methods=["GET", "HEAD"])
+async def get_highlighted_pdf(request: Request, document_id: int, db: AsyncSession = Depends(get_async_db)):
+    document = (await db.execute(queries.document_by_id(document_id))).scalars().first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    style_stats = db.query(StyleStatistics)\
-        .filter(StyleStatistics.document_id == document_id)\
-        .all()
+    style_stats = (await db.execute(queries.style_stats_for_document(document_id))).scalars().all()
     
-    # Create processor with analysis strategy
-    processor = PDFProcessor(document.file_path, "analysis")
+    cache_key = highlight_cache.cache_key(document, style_stats)
+    output_path = highlight_cache.get(document_id, cache_key)
     
-    # Generate highlighted PDF
-    output_path = os.path.join(
-        PDF_FOLDER,
-        f"highlighted_{document_id}.pdf"
-    )
+    headers = {"Content-Disposition": f'inline; filename="highlighted_{document_id}.pdf"'}
     
-    try:
-        processor.strategy.create_highlighted_pdf(processor.doc, output_path, style_stats)
+    if output_path is None and request.method == "HEAD":
+        # Rendering is only started for a request that will read the file
+        return Response(status_code=202, headers=headers)
+    
+    if output_path is None:
+        # Spans stored at processing time spare the worker the page layouts;
+        # documents processed before they were stored have none
+        style_spans = dict((await db.execute(queries.style_spans_for_document(document_id))).all()) or None
+        
+        # Render in the worker pool into a temporary file, then publish it
+        tmp_path = highlight_cache.reserve()
+        try:
+            future = render_pool.submit(
+                render_highlighted_pdf,
+                document.file_path, document.file_hash, document.file_size, document.file_mtime, document.file_ctime,
+                style_rows(style_stats), tmp_path, style_spans
+            )
+        except RenderPoolFull:
+            highlight_cache.discard(tmp_path)
+            raise HTTPException(status_code=503, detail="Too many PDFs being rendered, try again shortly",
+                                headers={"Retry-After": "5"})
         
-        return StreamingResponse(
-            open(output_path, "rb"),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'inline; filename="highlighted_{document_id}.pdf"'
-            }
+        if "range" not in request.headers:
+            # Send the file while the worker is still appending pages to it
+            return StreamingResponse(
+                _stream_rendering(document_id, cache_key, future, tmp_path),
+                media_type="application/pdf",
+                headers=headers
+            )
+        
+        try:
+            await render_pool.wait(
+                future,
+                is_abandoned=request.is_disconnected,
+                cleanup=lambda: highlight_cache.discard(tmp_path)
+            )
+        except RenderTimeout:
+            highlight_cache.discard(tmp_path)
+            raise HTTPException(status_code=504, detail="Rendering the highlighted PDF timed out")
+        except RenderAbandoned:
+            # Nobody is left to read the response
+            highlight_cache.discard(tmp_path)
+            return Response(status_code=499)
+        except BaseException:
+            highlight_cache.discard(tmp_path)
+            raise
+        output_path = highlight_cache.publish(document_id, cache_key, tmp_path)
+    
+    return file_response(request, output_path, media_type="application/pdf", headers=headers)
+
+async def _stream_rendering(document_id: int, cache_key: str, future, tmp_path: str):
+    """Stream a highlighted PDF as it is rendered, then publish it to the cache.
+
+    The status line is sent before rendering ends, so a failed or timed-out
+    rendering can only cut the response short: the chunked body is never
+    terminated and the client sees an incomplete transfer rather than an
+    error status. To make that rare, streams wait RENDER_STREAM_TIMEOUT_SECONDS
+    instead of the pool's timeout, which is sized for requests that wait
+    for the whole file. A stream idle for RENDER_STREAM_IDLE_SECONDS (no new
+    bytes, or a client that took that long to read a chunk) is given up
+    sooner: removing the temporary file makes a chunked rendering fail at
+    its next chunk, which frees its slot in the pool.
+    """
+    writer = asyncio.ensure_future(render_pool.wait(
+        future,
+        timeout=RENDER_STREAM_TIMEOUT_SECONDS or float("inf"),
+        cleanup=lambda: highlight_cache.discard(tmp_path)
+    ))
+    try:
+        async for chunk in tail_file(tmp_path, writer, idle_timeout=RENDER_STREAM_IDLE_SECONDS or None):
+            yield chunk
+    except BaseException:
+        # Client gone or rendering failed; a running job is cleaned up when it ends
+        writer.cancel()
+        highlight_cache.discard(tmp_path)
+        raise
+    highlight_cache.publish(document_id, cache_key, tmp_path)
+
+@app.get("/analysis/{document_id}/highlights")
+async def get_highlights(
+    request: Request,
+    document_id: int,
+    after_page: int = Query(0, ge=0),
+    limit: int = Query(PAGE_WINDOW_DEFAULT, ge=1, le=PAGE_WINDOW_MAX),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Style highlight rectangles of pages after_page + 1 to after_page + limit, for drawing over the original PDF.
+
+    Each rect is [x0, y0, x1, y1, style], in PyMuPDF coordinates of the
+    unrotated page (origin at the top left of the crop box); style indexes
+    the returned styles list. Pages without highlights are left out.
+    """
+    document = (await db.execute(queries.document_by_id(document_id))).scalars().first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    style_stats = (await db.execute(queries.style_stats_for_document(document_id))).scalars().all()
+    styles = [
+        {"id": stat.id, "color": highlight_color(index)}
+        for index, stat in enumerate(style_stats)
+    ]
+    last_page = after_page + limit
+    
+    first_stored = (await db.execute(queries.style_span_pages_after(document_id, 0))).scalar()
+    if first_stored is not None or not style_stats:
+        # Stored at processing time: a plain read
+        rows = (await db.execute(queries.style_spans_for_pages(document_id, after_page + 1, last_page))).scalars().all()
+        more = (await db.execute(queries.style_span_pages_after(document_id, last_page))).scalar()
+        return {
+            "styles": styles,
+            "pages": [
+                {"page_number": row.page_number, "rects": _overlay_rects(row.rects)}
+                for row in rows
+            ],
+            "next_after_page": last_page if more is not None else None
+        }
+    
+    # Processed before style spans were stored: match spans in the page layouts
+    try:
+        overlay = await render_pool.run(
+            highlight_overlay,
+            document.file_path, document.file_hash, document.file_size, document.file_mtime, document.file_ctime,
+            style_rows(style_stats), after_page, last_page,
+            is_abandoned=request.is_disconnected
         )
-    finally:
-        # Clean up
-        if os.path.exists(output_path):
-            os.remove(output_path)
+    except RenderPoolFull:
+        raise HTTPException(status_code=503, detail="Too many PDFs being rendered, try again shortly",
+                            headers={"Retry-After": "5"})
+    except RenderTimeout:
+        raise HTTPException(status_code=504, detail="Computing highlights timed out")
+    except RenderAbandoned:
+        return Response(status_code=499)
+    
+    return {
+        "styles": styles,
+        "pages": overlay["pages"],
+        "next_after_page": last_page if last_page < overlay["page_count"] else None
+    }
+
+def _overlay_rects(data: bytes) -> list:
+    """Stored PageStyleSpans.rects as [x0, y0, x1, y1, style] lists"""
+    rects = unpack_style_rects(data)
+    return [
+        [round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2), style]
+        for x0, y0, x1, y1, style in rects.tolist()
+    ]
+
+@app.get("/metrics/render-pool")
+async def render_pool_metrics():
+    """Queue depth and counters of the PDF rendering worker pool"""
+    return render_pool.metrics()
+
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Connection pool occupancy and checkout wait times of the web engine"""
+    return pool_metrics(async_engine.sync_engine)
 
 @app.get("/analysis/{document_id}/view-highlighted")
-async def view_highlighted_pdf(request: Request, document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def view_highlighted_pdf(request: Request, document_id: int, db: AsyncSession = Depends(get_async_db)):
+    document = (await db.execute(queries.document_by_id(document_id))).scalars().first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    style_stats = db.query(StyleStatistics)\
-        .filter(StyleStatistics.document_id == document_id)\
-        .all()
+    style_stats = (await db.execute(queries.style_stats_for_document(document_id))).scalars().all()
     
     return templates.TemplateResponse(
         "pdf_analysis_view.html",
         {
             "request": request,
             "document": document,
-            "style_stats": style_stats
+            "style_stats": style_stats,
+            "page_window": PAGE_WINDOW_DEFAULT
         }
     ) 
\ No newline at end of file
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Callable, List, Optional
+from src.database.models import Document, StyleStatistics
+
+# Bump when the rendered output changes, so older cached files are not served
+RENDER_VERSION = 3
+
+class HighlightedPDFCache:
+    """Size-bounded on-disk cache of rendered highlighted PDFs.
+
+    Entries are keyed by document id and a hash of everything that affects
+    the rendering (the style statistics in display order and the source
+    file's size/mtime). Files are written atomically and evicted least
+    recently used first once the directory exceeds max_bytes.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def cache_key(document: Document, style_stats: List[StyleStatistics]) -> str:
+        """Hash of the inputs that determine the highlighted output"""
+        try:
+            stat = os.stat(document.file_path)
+            source = [stat.st_size, stat.st_mtime]
+        except OSError:
+            source = None
+        payload = {
+            "version": RENDER_VERSION,
+            "source": source,
+            "styles": [
+                [s.font_name, s.font_size, s.font_color, bool(s.is_bold), bool(s.is_italic)]
+                for s in style_stats
+            ],
+        }
+        encoded = json.dumps(payload, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:16]
+    
+    def path_for(self, document_id: int, key: str) -> str:
+        return os.path.join(self.directory, f"highlighted_{document_id}_{key}.pdf")
+    
+    def get(self, document_id: int, key: str) -> Optional[str]:
+        """Return the cached file path, marking it as recently used, or None"""
+        path = self.path_for(document_id, key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+    
+    def reserve(self) -> str:
+        """Create an empty temporary file in the cache directory to render into"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        return tmp_path
+    
+    def publish(self, document_id: int, key: str, tmp_path: str) -> str:
+        """Atomically move a finished rendering into place and return its path"""
+        path = self.path_for(document_id, key)
+        os.replace(tmp_path, path)
+        self._remove_stale(document_id, keep=path)
+        self._evict(keep=path)
+        return path
+    
+    def discard(self, tmp_path: str):
+        """Remove a temporary file whose rendering failed or was abandoned"""
+        self._remove(tmp_path)
+    
+    def put(self, document_id: int, key: str, render: Callable[[str], object]) -> str:
+        """Render into a temporary file, atomically publish it and return its path"""
+        tmp_path = self.reserve()
+        try:
+            render(tmp_path)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+        return self.publish(document_id, key, tmp_path)
+    
+    def _remove_stale(self, document_id: int, keep: str):
+        """Drop renderings of this document made for older style statistics"""
+        prefix = f"highlighted_{document_id}_"
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(prefix) and name.endswith(".pdf") and path != keep:
+                self._remove(path)
+    
+    def _evict(self, keep: str):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pdf"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total -= size
+    
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
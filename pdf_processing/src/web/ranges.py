@@ -0,0 +1,211 @@
+import asyncio
+import os
+import secrets
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import aiofiles
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.responses import StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+
+# How often tail_file looks for new bytes while the writer is still busy
+TAIL_POLL_SECONDS = 0.05
+
+# More ranges than this (after merging) are answered with the whole file
+MAX_RANGES = 64
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def parse_range_header(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a 'bytes=' Range header into sorted, merged (start, end) pairs, end inclusive.
+
+    Returns None when the header is malformed (the Range is then ignored, as
+    RFC 9110 allows) and raises RangeNotSatisfiable when no range overlaps
+    the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else max(start, size - 1)
+                if start > end:
+                    return None
+            else:
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length == 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # Merge overlapping and adjacent ranges
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def iter_file_range(path: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield bytes [start, end] of a file in fixed-size chunks"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+async def tail_file(path: str, writer: "asyncio.Future", chunk_size: int = CHUNK_SIZE,
+                    poll_seconds: float = TAIL_POLL_SECONDS,
+                    idle_timeout: Optional[float] = None) -> AsyncIterator[bytes]:
+    """Yield a file's bytes while writer appends to it, until writer is done.
+
+    The file must only ever grow at its end. Raises writer's exception,
+    if any, after the bytes read so far have been yielded. With
+    idle_timeout, raises TimeoutError while writer is busy once the file
+    has not grown, or the consumer has not taken a chunk, for that long.
+    """
+    async with aiofiles.open(path, "rb") as f:
+        last_growth = time.monotonic()
+        while True:
+            chunk = await f.read(chunk_size)
+            if chunk:
+                yielded = time.monotonic()
+                yield chunk
+                # Resumed only once the consumer has taken the chunk
+                last_growth = time.monotonic()
+                if idle_timeout is not None and not writer.done() and last_growth - yielded >= idle_timeout:
+                    raise TimeoutError(f"The reader of {path} took no data for {idle_timeout} seconds")
+            elif writer.done():
+                writer.result()
+                # Bytes appended between the last read and completion
+                while chunk := await f.read(chunk_size):
+                    yield chunk
+                return
+            elif idle_timeout is not None and time.monotonic() - last_growth >= idle_timeout:
+                raise TimeoutError(f"{path} has not grown for {idle_timeout} seconds")
+            else:
+                await asyncio.wait({writer}, timeout=poll_seconds)
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+def _if_range_matches(request: Request, etag: str, last_modified: str) -> bool:
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    return if_range.strip() in (etag, last_modified)
+
+def file_response(request: Request, path: str, media_type: str,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a file with ETag/Last-Modified validation and single/multi-range support"""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    base_headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        **(headers or {}),
+    }
+    send_body = request.method != "HEAD"
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers={"ETag": etag, "Last-Modified": last_modified})
+
+    ranges = None
+    range_header = request.headers.get("range")
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            ranges = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**base_headers, "Content-Range": f"bytes */{size}"})
+        if ranges is not None and len(ranges) > MAX_RANGES:
+            ranges = None
+
+    if not ranges:
+        return StreamingResponse(
+            iter_file_range(path, 0, size - 1) if send_body and size else iter(()),
+            media_type=media_type,
+            headers={**base_headers, "Content-Length": str(size)},
+        )
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        return StreamingResponse(
+            iter_file_range(path, start, end) if send_body else iter(()),
+            status_code=206,
+            media_type=media_type,
+            headers={
+                **base_headers,
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+            },
+        )
+
+    boundary = secrets.token_hex(16)
+    part_headers = [
+        (
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode("latin-1")
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    content_length = sum(
+        len(header) + (end - start + 1) for header, (start, end) in zip(part_headers, ranges)
+    ) + 2 * (len(ranges) - 1) + len(closing)
+
+    def iter_parts() -> Iterator[bytes]:
+        for i, (header, (start, end)) in enumerate(zip(part_headers, ranges)):
+            yield (b"\r\n" if i else b"") + header
+            yield from iter_file_range(path, start, end)
+        yield closing
+
+    return StreamingResponse(
+        iter_parts() if send_body else iter(()),
+        status_code=206,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers={**base_headers, "Content-Length": str(content_length)},
+    )
@@ -0,0 +1,249 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from src.database.models import StyleStatistics
+from src.pdf_processing.fingerprint import stored_fingerprint
+from src.pdf_processing.processor import PDFProcessor
+
+# How often a waiting request checks whether its client is still there
+ABANDON_POLL_SECONDS = 0.5
+
+# In worker processes: the pool's shared count of jobs being executed
+_running_jobs = None
+
+def _init_worker(running_jobs):
+    global _running_jobs
+    _running_jobs = running_jobs
+
+def _run_counted(fn: Callable, *args) -> Any:
+    """Run fn(*args), counted in the pool's running jobs while it executes"""
+    with _running_jobs.get_lock():
+        _running_jobs.value += 1
+    try:
+        return fn(*args)
+    finally:
+        with _running_jobs.get_lock():
+            _running_jobs.value -= 1
+
+class RenderPoolFull(Exception):
+    """Raised when a job is submitted while max_pending jobs are already in flight"""
+    pass
+
+class RenderTimeout(Exception):
+    """Raised when a job does not finish within its timeout"""
+    pass
+
+class RenderAbandoned(Exception):
+    """Raised when the waiting client went away before the job finished"""
+    pass
+
+def style_rows(style_stats: List[StyleStatistics]) -> List[Dict[str, Any]]:
+    """Plain, picklable copies of the style fields the renderer needs"""
+    return [
+        {
+            "font_name": s.font_name,
+            "font_size": s.font_size,
+            "font_color": s.font_color,
+            "is_bold": s.is_bold,
+            "is_italic": s.is_italic
+        }
+        for s in style_stats
+    ]
+
+def render_highlighted_pdf(file_path: str, file_hash: Optional[str], file_size: Optional[int],
+                           file_mtime: Optional[float], file_ctime: Optional[float],
+                           styles: List[Dict[str, Any]], output_path: str,
+                           style_spans: Optional[Dict[int, bytes]] = None) -> str:
+    """Render a highlighted PDF in a worker process; output_path only ever grows, so it can be streamed.
+
+    style_spans are the document's stored PageStyleSpans.rects by page
+    number; without them spans are matched against the page layouts.
+    """
+    # The stored fingerprint lets the processor reuse page layouts cached
+    # on disk at processing time
+    fingerprint = stored_fingerprint(file_path, file_hash, file_size, file_mtime, file_ctime)
+    processor = PDFProcessor(file_path, "analysis", fingerprint=fingerprint)
+    style_stats = [StyleStatistics(**row) for row in styles]
+    return processor.strategy.write_highlighted_pdf(
+        processor.doc, output_path, style_stats, processor.layout_cache, style_spans
+    )
+
+def highlight_overlay(file_path: str, file_hash: Optional[str], file_size: Optional[int],
+                      file_mtime: Optional[float], file_ctime: Optional[float], styles: List[Dict[str, Any]],
+                      start: int, stop: int) -> Dict[str, Any]:
+    """Highlight rectangles of pages [start, stop) (zero-based) from the page layouts, in a worker process.
+
+    For documents processed before style spans were stored; pages without
+    highlights are left out.
+    """
+    fingerprint = stored_fingerprint(file_path, file_hash, file_size, file_mtime, file_ctime)
+    processor = PDFProcessor(file_path, "analysis", fingerprint=fingerprint)
+    page_count = len(processor.doc)
+    style_stats = [StyleStatistics(**row) for row in styles]
+    stop = min(stop, page_count)
+    rects = processor.strategy.page_highlights(
+        processor.doc, style_stats, start, stop, processor.layout_cache
+    ) if start < stop else []
+    return {
+        "page_count": page_count,
+        "pages": [
+            {"page_number": start + offset + 1, "rects": page_rects}
+            for offset, page_rects in enumerate(rects) if page_rects
+        ]
+    }
+
+class RenderPool:
+    """Bounded process pool for CPU-heavy PyMuPDF work submitted from async endpoints.
+
+    At most max_pending jobs (queued plus running) are accepted; further
+    submissions fail fast with RenderPoolFull so callers can shed load.
+    Waiting for a job is bounded by a timeout and stops early when the
+    client disconnects. Jobs that have not started yet are then cancelled;
+    a job already running in a worker cannot be interrupted, so it still
+    counts against max_pending until it finishes and its cleanup runs.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, timeout: float):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._running_jobs = None  # shared with the current executor's workers
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "abandoned": 0,
+            "cancelled": 0
+        }
+        self._job_seconds = 0.0  # submit to completion, summed over completed jobs
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Workers are started on first use. The server process has threads and
+        # open database connections, so workers are spawned, not forked.
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            # A new counter per executor: a worker that died mid-job leaves
+            # the old one counting a job that will never end
+            self._running_jobs = context.Value("i", 0)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._running_jobs,)
+            )
+        return self._executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Start fn(*args) in a worker process, or raise RenderPoolFull"""
+        with self._lock:
+            if len(self._inflight) >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise RenderPoolFull()
+            try:
+                future = self._get_executor().submit(_run_counted, fn, *args)
+            except BrokenProcessPool:
+                # A worker died; release what is left of the broken pool and
+                # start over with a fresh one
+                broken, self._executor = self._executor, None
+                broken.shutdown(wait=False, cancel_futures=True)
+                future = self._get_executor().submit(_run_counted, fn, *args)
+            self._inflight.add(future)
+            self._counters["submitted"] += 1
+
+        started = time.perf_counter()
+
+        def on_done(done: Future):
+            with self._lock:
+                self._inflight.discard(done)
+                if done.cancelled():
+                    self._counters["cancelled"] += 1
+                elif done.exception() is not None:
+                    self._counters["failed"] += 1
+                else:
+                    self._counters["completed"] += 1
+                    self._job_seconds += time.perf_counter() - started
+
+        future.add_done_callback(on_done)
+        return future
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None,
+                  is_abandoned: Optional[Callable[[], Awaitable[bool]]] = None,
+                  cleanup: Optional[Callable[[], None]] = None) -> Any:
+        """Run fn(*args) in a worker process and wait for its result"""
+        return await self.wait(self.submit(fn, *args), timeout=timeout, is_abandoned=is_abandoned, cleanup=cleanup)
+
+    async def wait(self, future: Future, timeout: Optional[float] = None,
+                   is_abandoned: Optional[Callable[[], Awaitable[bool]]] = None,
+                   cleanup: Optional[Callable[[], None]] = None) -> Any:
+        """Wait for a submitted job's result.
+
+        cleanup is called once the job has ended if the caller stopped
+        waiting for it (timeout, disconnect or cancellation), e.g. to delete
+        partial output the job may still be writing.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        waiter = asyncio.wrap_future(future)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._count("timed_out")
+                    raise RenderTimeout()
+                done, _ = await asyncio.wait({waiter}, timeout=min(remaining, ABANDON_POLL_SECONDS))
+                if done:
+                    return waiter.result()
+                if is_abandoned is not None and await is_abandoned():
+                    self._count("abandoned")
+                    raise RenderAbandoned()
+        except BaseException:
+            if not future.done():
+                # Drops the job if it is still queued; a running job ends on its own
+                future.cancel()
+                if cleanup is not None:
+                    future.add_done_callback(lambda _: cleanup())
+            raise
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current queue depth and lifetime counters.
+
+        running counts the jobs executing in a worker right now, as the
+        workers report it; Future.running() would also count the jobs the
+        executor has only handed to its call queue. queued is the rest of
+        in_flight, including jobs that have just finished in a worker but
+        whose result has not reached this process yet.
+        """
+        with self._lock:
+            running = self._running_jobs.value if self._running_jobs is not None else 0
+            completed = self._counters["completed"]
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "timeout_seconds": self.timeout,
+                "in_flight": len(self._inflight),
+                "running": running,
+                "queued": max(0, len(self._inflight) - running),
+                **self._counters,
+                "average_job_seconds": self._job_seconds / completed if completed else None
+            }
+
+    def shutdown(self):
+        """Stop the workers, dropping jobs that have not started"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._running_jobs = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -7,4 +7,243 @@ function syncScroll(source) {
     } else {
         pdfViewer.scrollTop = (pdfViewer.scrollHeight * textViewer.scrollTop) / textViewer.scrollHeight;
     }
-} 
\ No newline at end of file
+} 
+
+// Lazily load the text pane page window by page window as it scrolls
+function initTextPane(container) {
+    const pagesUrl = container.dataset.pagesUrl;
+    const pageWindow = container.dataset.pageWindow;
+    const sentinel = container.querySelector('.load-sentinel');
+    let afterPage = 0;
+    let loading = false;
+    let done = false;
+
+    function renderPage(page) {
+        const pageEl = document.createElement('div');
+        pageEl.className = 'page';
+        pageEl.dataset.page = page.page_number;
+
+        const header = document.createElement('div');
+        header.className = 'page-header';
+        header.textContent = `Page ${page.page_number}`;
+        pageEl.appendChild(header);
+
+        for (const block of page.blocks) {
+            const row = document.createElement('div');
+            row.className = 'content-row';
+
+            const textEl = document.createElement('div');
+            textEl.className = `text-block ${block.block_type}`;
+            textEl.style.fontSize = `${block.font_size}px`;
+            textEl.style.color = block.font_color;
+            textEl.textContent = block.text_content;
+
+            const indicator = document.createElement('div');
+            indicator.className = `category-indicator ${block.block_type}`;
+            indicator.textContent = block.block_type;
+
+            row.append(textEl, indicator);
+            pageEl.appendChild(row);
+        }
+        return pageEl;
+    }
+
+    function sentinelNearView() {
+        const containerRect = container.getBoundingClientRect();
+        return sentinel.getBoundingClientRect().top < containerRect.bottom + container.clientHeight;
+    }
+
+    async function loadMore() {
+        if (loading || done) return;
+        loading = true;
+        try {
+            const response = await fetch(`${pagesUrl}?after_page=${afterPage}&limit=${pageWindow}`);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+
+            const fragment = document.createDocumentFragment();
+            for (const page of data.pages) {
+                fragment.appendChild(renderPage(page));
+            }
+            container.insertBefore(fragment, sentinel);
+
+            if (data.next_after_page === null) {
+                done = true;
+                sentinel.remove();
+            } else {
+                afterPage = data.next_after_page;
+            }
+        } catch (error) {
+            sentinel.textContent = `Failed to load text: ${error.message}`;
+            done = true;
+        } finally {
+            loading = false;
+        }
+        // Keep filling while the sentinel is still close to the visible area
+        if (!done && sentinelNearView()) loadMore();
+    }
+
+    const observer = new IntersectionObserver(
+        entries => { if (entries.some(entry => entry.isIntersecting)) loadMore(); },
+        { root: container, rootMargin: '0px 0px 100% 0px' }
+    );
+    observer.observe(sentinel);
+}
+
+// Show the server-rendered highlighted PDF in the browser's own viewer,
+// for when pdf.js is unavailable
+function embedHighlightedPdf(container) {
+    const embed = document.createElement('embed');
+    embed.src = container.dataset.fallbackUrl;
+    embed.type = 'application/pdf';
+    embed.width = '100%';
+    embed.height = '100%';
+    embed.style.border = 'none';
+    container.replaceChildren(embed);
+}
+
+// Render the original PDF with pdf.js and draw style highlights over it.
+// Pages are rendered as they scroll into view; their highlight rectangles
+// are fetched page window by page window from /analysis/{id}/highlights.
+async function initHighlightView(container) {
+    const highlightsUrl = container.dataset.highlightsUrl;
+    const pageWindow = Number(container.dataset.pageWindow);
+    const sentinel = container.querySelector('.load-sentinel');
+    const hiddenStyles = new Set();
+    const windows = new Map();  // window start page -> Promise of highlights response
+
+    let pdf;
+    try {
+        // Ranges are served, so pdf.js only fetches what visible pages need.
+        // PDFs are uploaded by anyone: never compile their fonts with eval.
+        pdf = await pdfjsLib.getDocument({
+            url: container.dataset.pdfUrl,
+            disableAutoFetch: true,
+            isEvalSupported: false
+        }).promise;
+    } catch (error) {
+        sentinel.textContent = `Failed to load PDF: ${error.message}`;
+        return;
+    }
+    sentinel.remove();
+
+    const firstPage = await pdf.getPage(1);
+    const scale = (container.clientWidth - 40) / firstPage.getViewport({ scale: 1 }).width;
+
+    function highlightsFor(pageNumber) {
+        const afterPage = Math.floor((pageNumber - 1) / pageWindow) * pageWindow;
+        if (!windows.has(afterPage)) {
+            const request = fetch(`${highlightsUrl}?after_page=${afterPage}&limit=${pageWindow}`)
+                .then(response => {
+                    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                    return response.json();
+                });
+            // Let a failed window be requested again
+            request.catch(() => windows.delete(afterPage));
+            windows.set(afterPage, request);
+        }
+        return windows.get(afterPage);
+    }
+
+    function drawHighlights(layer, page, viewport, data) {
+        const pageData = data.pages.find(p => p.page_number === page.pageNumber);
+        if (!pageData) return;
+        // Rects are in unrotated page coordinates from the crop box's top left;
+        // flip them into PDF user space and let the viewport rotate and scale
+        const [viewX0, , , viewY1] = page.view;
+        const fragment = document.createDocumentFragment();
+        for (const [x0, y0, x1, y1, style] of pageData.rects) {
+            const [ax, ay, bx, by] = viewport.convertToViewportRectangle(
+                [viewX0 + x0, viewY1 - y1, viewX0 + x1, viewY1 - y0]
+            );
+            const rect = document.createElement('div');
+            rect.className = 'highlight-rect';
+            rect.dataset.style = style;
+            rect.hidden = hiddenStyles.has(String(style));
+            rect.style.left = `${Math.min(ax, bx)}px`;
+            rect.style.top = `${Math.min(ay, by)}px`;
+            rect.style.width = `${Math.abs(bx - ax)}px`;
+            rect.style.height = `${Math.abs(by - ay)}px`;
+            rect.style.backgroundColor = data.styles[style].color;
+            fragment.appendChild(rect);
+        }
+        layer.appendChild(fragment);
+    }
+
+    async function renderPage(pageEl) {
+        const page = await pdf.getPage(Number(pageEl.dataset.page));
+        const viewport = page.getViewport({ scale });
+        const canvas = document.createElement('canvas');
+        const ratio = window.devicePixelRatio || 1;
+        canvas.width = Math.floor(viewport.width * ratio);
+        canvas.height = Math.floor(viewport.height * ratio);
+        canvas.style.width = `${viewport.width}px`;
+        canvas.style.height = `${viewport.height}px`;
+        pageEl.style.width = canvas.style.width;
+        pageEl.style.height = canvas.style.height;
+
+        const layer = document.createElement('div');
+        layer.className = 'highlight-layer';
+        pageEl.append(canvas, layer);
+
+        await page.render({
+            canvasContext: canvas.getContext('2d'),
+            viewport,
+            transform: ratio === 1 ? null : [ratio, 0, 0, ratio, 0, 0]
+        }).promise;
+        try {
+            drawHighlights(layer, page, viewport, await highlightsFor(page.pageNumber));
+        } catch (error) {
+            layer.title = `Failed to load highlights: ${error.message}`;
+        }
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        for (const entry of entries) {
+            if (!entry.isIntersecting) continue;
+            observer.unobserve(entry.target);
+            renderPage(entry.target);
+        }
+    }, { root: container, rootMargin: '100% 0px' });
+
+    // Placeholders sized like the first page until each page is rendered
+    const placeholder = firstPage.getViewport({ scale });
+    for (let pageNumber = 1; pageNumber <= pdf.numPages; pageNumber++) {
+        const pageEl = document.createElement('div');
+        pageEl.className = 'pdf-page';
+        pageEl.dataset.page = pageNumber;
+        pageEl.style.width = `${placeholder.width}px`;
+        pageEl.style.height = `${placeholder.height}px`;
+        container.appendChild(pageEl);
+        observer.observe(pageEl);
+    }
+
+    // Clicking a legend entry shows or hides that style's highlights
+    for (const item of document.querySelectorAll('.legend-item[data-style]')) {
+        item.addEventListener('click', () => {
+            const style = item.dataset.style;
+            const hide = !hiddenStyles.has(style);
+            if (hide) hiddenStyles.add(style); else hiddenStyles.delete(style);
+            item.classList.toggle('legend-hidden', hide);
+            for (const rect of container.querySelectorAll(`.highlight-rect[data-style="${style}"]`)) {
+                rect.hidden = hide;
+            }
+        });
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const textViewer = document.getElementById('text-viewer');
+    if (textViewer && textViewer.dataset.pagesUrl) {
+        initTextPane(textViewer);
+    }
+    const highlightViewer = document.getElementById('highlight-viewer');
+    if (highlightViewer && highlightViewer.dataset.highlightsUrl) {
+        // The pdf.js module sets window.pdfjsLib unless it failed to load
+        if (window.pdfjsLib) {
+            initHighlightView(highlightViewer);
+        } else {
+            embedHighlightedPdf(highlightViewer);
+        }
+    }
+});
@@ -0,0 +1,55 @@
+import os
+import re
+import uuid
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+
+CHUNK_SIZE = 1024 * 1024
+
+def safe_file_name(name: str) -> str:
+    """Reduce a client-supplied file name to a plain, non-empty '*.pdf' base name"""
+    base = os.path.basename((name or "").replace("\\", "/"))
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.splitext(base)[0]).strip("._") or "upload"
+    return f"{stem[:100]}.pdf"
+
+async def save_upload(upload: UploadFile, folder: str, max_bytes: int) -> str:
+    """Stream an uploaded PDF into folder and return its path.
+
+    The file is written under a temporary name and only linked into place
+    once it is complete, starts with a PDF header and is within max_bytes.
+    An existing file with the same name is never overwritten; the upload
+    gets a suffixed name instead.
+    """
+    os.makedirs(folder, exist_ok=True)
+    name = safe_file_name(upload.filename)
+    tmp_path = os.path.join(folder, f".upload-{uuid.uuid4().hex}.tmp")
+    try:
+        size = 0
+        async with aiofiles.open(tmp_path, "wb") as f:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0 and not chunk.startswith(b"%PDF-"):
+                    raise HTTPException(status_code=415, detail="Only PDF files can be uploaded")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+                await f.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+
+        # link() fails if the name is taken, so a concurrent upload of the
+        # same name cannot slip in between a check and the move
+        path = os.path.join(folder, name)
+        stem, ext = os.path.splitext(name)
+        while True:
+            try:
+                await aiofiles.os.link(tmp_path, path)
+                return path
+            except FileExistsError:
+                path = os.path.join(folder, f"{stem}_{uuid.uuid4().hex[:8]}{ext}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
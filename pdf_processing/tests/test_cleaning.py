@@ -0,0 +1,85 @@
+import pytest
+from src.pdf_processing.cleaning import (
+    DEFAULT_RULES, CleaningRule, TextCleaner, is_doubled_glyph_run, is_fake_bold_block
+)
+from src.pdf_processing.extraction import DictMethodStrategy
+
+FONT_SIZE = 10.0
+# Ordinary text advances about half an em per glyph, fake bold about a quarter
+NORMAL_ADVANCE = 0.5 * FONT_SIZE
+DOUBLED_ADVANCE = 0.25 * FONT_SIZE
+
+def _span(text, advance=NORMAL_ADVANCE):
+    return text, len(text) * advance, FONT_SIZE
+
+@pytest.mark.parametrize("text, expected", [
+    ("Inhalt ........ 5", "Inhalt . 5"),
+    ("II.. Abschnitt", "II. Abschnitt"),
+    ("Ende.", "Ende."),
+    ("  zwei   Leerzeichen\n\tund Umbruch  ", "zwei Leerzeichen und Umbruch"),
+    ("Zeile\neins", "Zeile eins"),
+    ("", ""),
+])
+def test_clean_collapses_dot_runs_and_whitespace(text, expected):
+    assert TextCleaner().clean(text) == expected
+
+@pytest.mark.parametrize("text", ["Stellung", "muss", "Mitte", "Sollwert", "Kassette", "Wasserrohr"])
+def test_clean_keeps_genuine_double_letters(text):
+    assert TextCleaner().clean(text) == text
+    assert TextCleaner(collapse_doubled_glyphs=True).clean(text) == text
+
+def test_rules_apply_in_one_pass_like_in_order():
+    text = "a .. b\t\tc ... d"
+    expected = text
+    for rule in DEFAULT_RULES:
+        expected = TextCleaner([rule]).clean(expected)
+    assert TextCleaner().clean(text) == expected == "a . b c . d"
+
+def test_custom_rules_and_callable_replacements():
+    cleaner = TextCleaner([CleaningRule("digits", r"\d+", lambda match: f"<{len(match.group())}>")])
+    assert cleaner.clean(" Seite 123 von 45 ") == "Seite <3> von <2>"
+    assert TextCleaner([]).clean("  a..  b ") == "a..  b"
+
+def test_capturing_groups_are_rejected():
+    with pytest.raises(ValueError):
+        TextCleaner([CleaningRule("group", r"(a)+", "a")])
+
+@pytest.mark.parametrize("text, advance, expected", [
+    ("EEiinnlleeiittuunngg", DOUBLED_ADVANCE, True),
+    # Too loose for two glyphs per character
+    ("EEiinnlleeiittuunngg", NORMAL_ADVANCE, False),
+    # Not every character doubled
+    ("Stellung", DOUBLED_ADVANCE, False),
+    # Too short to tell apart from "II" or "..."
+    ("IIaa", DOUBLED_ADVANCE, False),
+    # Odd length
+    ("aabbc", DOUBLED_ADVANCE, False),
+])
+def test_is_doubled_glyph_run(text, advance, expected):
+    assert is_doubled_glyph_run(*_span(text, advance)) is expected
+
+def test_is_doubled_glyph_run_ignores_zero_font_size():
+    assert not is_doubled_glyph_run("EEiinnlleeiittuunngg", 0.0, 0.0)
+
+def test_is_fake_bold_block():
+    assert is_fake_bold_block([_span("EEiinnlleeiittuunngg", DOUBLED_ADVANCE), _span("11..")])
+    # One tight run among ordinary text is not enough
+    assert not is_fake_bold_block([_span("aabbccdd", DOUBLED_ADVANCE), _span("Stellung")])
+    # Nothing long enough to judge
+    assert not is_fake_bold_block([_span("II"), _span("..")])
+    assert not is_fake_bold_block([])
+
+def test_span_text_collapses_only_when_enabled():
+    text, width, font_size = _span("EEiinnlleeiittuunngg", DOUBLED_ADVANCE)
+    assert TextCleaner().span_text(text, width, font_size) == text
+    assert TextCleaner(collapse_doubled_glyphs=True).span_text(text, width, font_size) == "Einleitung"
+    # Enabled, but normal spacing shows the letters are really there twice
+    assert TextCleaner(collapse_doubled_glyphs=True).span_text(*_span("aabbccdd")) == "aabbccdd"
+
+def test_strategies_collapse_doubled_glyphs_only_in_fake_bold_blocks():
+    strategy = DictMethodStrategy()
+    fake_bold = [_span("KKaappiitteell", DOUBLED_ADVANCE), _span("EEiinnss", DOUBLED_ADVANCE)]
+    assert strategy._span_texts(fake_bold) == ["Kapitel", "Eins"]
+
+    mixed = [_span("aabbccdd", DOUBLED_ADVANCE), _span("Stellung"), _span("muss")]
+    assert strategy._span_texts(mixed) == ["aabbccdd", "Stellung", "muss"]
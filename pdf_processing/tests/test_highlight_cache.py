@@ -0,0 +1,155 @@
+import asyncio
+import os
+import fitz
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.database.models import Base, Document, StyleStatistics
+from src.database.persistence import save_result
+from src.pdf_processing.processor import PDFProcessor
+from src.web.highlight_cache import HighlightedPDFCache
+from src.web.render_pool import RenderPool, render_highlighted_pdf, style_rows
+
+def _write_pdf(path):
+    doc = fitz.open()
+    for page_number in range(3):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Kapitel {page_number}", fontsize=16, fontname="hebo")
+        page.insert_text((72, 110), f"Text auf Seite {page_number}", fontsize=10)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def _style(font_name, font_size=10.0):
+    return StyleStatistics(font_name=font_name, font_size=font_size, font_color="#000000",
+                           is_bold=False, is_italic=False)
+
+def _drawings(content):
+    with fitz.open("pdf", content) as doc:
+        return [page.get_drawings() for page in doc]
+
+def _write(content):
+    return lambda path: open(path, "wb").write(content)
+
+def test_cache_key_follows_styles_and_source(tmp_path):
+    document = Document(file_path=_write_pdf(tmp_path / "a.pdf"))
+    styles = [_style("Helvetica"), _style("Helvetica-Bold", 16.0)]
+    key = HighlightedPDFCache.cache_key(document, styles)
+    assert HighlightedPDFCache.cache_key(document, [_style("Helvetica"), _style("Helvetica-Bold", 16.0)]) == key
+    # Colors are assigned in display order
+    assert HighlightedPDFCache.cache_key(document, styles[::-1]) != key
+    assert HighlightedPDFCache.cache_key(document, styles[:1]) != key
+    os.utime(document.file_path, (1, 1))
+    assert HighlightedPDFCache.cache_key(document, styles) != key
+
+def test_published_files_replace_older_renderings(tmp_path):
+    cache = HighlightedPDFCache(str(tmp_path / "cache"), 10 ** 6)
+    assert cache.get(1, "old") is None
+    cache.put(1, "old", _write(b"old"))
+    cache.put(2, "other", _write(b"other"))
+    path = cache.put(1, "new", _write(b"new"))
+    assert cache.get(1, "new") == path
+    assert cache.get(1, "old") is None
+    with open(cache.get(2, "other"), "rb") as f:
+        assert f.read() == b"other"
+
+def test_failed_rendering_leaves_nothing_behind(tmp_path):
+    cache = HighlightedPDFCache(str(tmp_path / "cache"), 10 ** 6)
+
+    def fail(path):
+        _write(b"half")(path)
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        cache.put(1, "key", fail)
+    assert os.listdir(cache.directory) == []
+
+def test_least_recently_used_renderings_are_evicted(tmp_path):
+    cache = HighlightedPDFCache(str(tmp_path / "cache"), 250)
+    for document_id in range(1, 4):
+        path = cache.put(document_id, "key", _write(b"x" * 100))
+        os.utime(path, (document_id, document_id))
+    # Two entries fit; the third evicted the oldest
+    assert [os.path.exists(cache.path_for(document_id, "key")) for document_id in range(1, 4)] == [False, True, True]
+    # Reading an entry makes it the most recently used
+    cache.get(2, "key")
+    cache.put(4, "key", _write(b"x" * 100))
+    assert [os.path.exists(cache.path_for(document_id, "key")) for document_id in range(2, 5)] == [True, False, True]
+
+@pytest.fixture
+def processed_db(tmp_path):
+    path = _write_pdf(tmp_path / "doc.pdf")
+    engine = create_engine(f"sqlite:///{tmp_path / 'highlights.db'}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    document, text_blocks, analysis, style_stats, style_spans = PDFProcessor(path, "analysis").process_document()
+    save_result(db, document, text_blocks, analysis, style_stats, style_spans)
+    db.commit()
+    yield db, document.id
+    db.close()
+    engine.dispose()
+
+def test_endpoint_serves_the_rendering_from_the_cache(processed_db, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database import queries
+    from src.database.connection import get_async_db
+    from src.web import app as web_app
+
+    db, document_id = processed_db
+    document = db.get(Document, document_id)
+    style_stats = db.execute(queries.style_stats_for_document(document_id)).scalars().all()
+    # What every request rendered before the cache
+    expected = render_highlighted_pdf(
+        document.file_path, document.file_hash, document.file_size, document.file_mtime, document.file_ctime,
+        style_rows(style_stats), str(tmp_path / "expected.pdf")
+    )
+    with open(expected, "rb") as f:
+        expected_highlights = _drawings(f.read())
+    assert all(expected_highlights)
+
+    cache = HighlightedPDFCache(str(tmp_path / "cache"), 10 ** 7)
+    pool = RenderPool(max_workers=1, max_pending=4, timeout=60)
+    monkeypatch.setattr(web_app, "highlight_cache", cache)
+    monkeypatch.setattr(web_app, "render_pool", pool)
+    async_engine = create_async_engine(db.get_bind().url.set(drivername="sqlite+aiosqlite"))
+    AsyncSession = async_sessionmaker(async_engine)
+
+    async def test_db():
+        async with AsyncSession() as session:
+            yield session
+
+    url = f"/analysis/{document_id}/highlighted-pdf"
+    web_app.app.dependency_overrides[get_async_db] = test_db
+    try:
+        client = TestClient(web_app.app)
+        # HEAD never starts a rendering
+        pending = client.head(url)
+        assert pending.status_code == 202
+        assert pool.metrics()["submitted"] == 0
+        rendered = client.get(url)
+        assert rendered.status_code == 200
+        assert _drawings(rendered.content) == expected_highlights
+        cached_path = cache.get(document_id, cache.cache_key(document, style_stats))
+        assert cached_path is not None
+
+        submitted = pool.metrics()["submitted"]
+        cached = client.get(url)
+        assert cached.content == rendered.content
+        head = client.head(url)
+        assert head.status_code == 200
+        assert head.headers["content-length"] == str(len(rendered.content))
+        assert pool.metrics()["submitted"] == submitted
+
+        # A changed source file renders again and replaces the old file
+        os.utime(document.file_path, (1, 1))
+        rerendered = client.get(url)
+        assert rerendered.status_code == 200
+        assert pool.metrics()["submitted"] == submitted + 1
+        assert _drawings(rerendered.content) == expected_highlights
+        assert not os.path.exists(cached_path)
+        assert len(os.listdir(cache.directory)) == 1
+    finally:
+        del web_app.app.dependency_overrides[get_async_db]
+        asyncio.run(async_engine.dispose())
+        pool.shutdown()
@@ -0,0 +1,236 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+import fitz
+import pytest
+from src.config.settings import HIGHLIGHT_CHUNK_PAGES
+from src.pdf_processing.processor import PDFProcessor
+from src.pdf_processing.span_table import unpack_style_rects
+from src.web.highlight_cache import HighlightedPDFCache
+
+PAGES = HIGHLIGHT_CHUNK_PAGES + 7
+
+@pytest.fixture(scope="module")
+def processed(tmp_path_factory):
+    """A PDF of more than one highlight chunk, with the analysis strategy's result"""
+    path = str(tmp_path_factory.mktemp("pdf") / "long.pdf")
+    doc = fitz.open()
+    for page_number in range(PAGES):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Kapitel {page_number}", fontsize=16, fontname="hebo")
+        page.insert_text((72, 110), f"Text auf Seite {page_number}", fontsize=10)
+        if page_number % 4 == 0:
+            page.insert_text((72, 780), f"Fußnote {page_number}", fontsize=8, fontname="heit")
+    doc.save(path)
+    doc.close()
+    processor = PDFProcessor(path, "analysis")
+    _, _, _, style_stats, style_spans = processor.process_document()
+    return processor, style_stats, {page.page_number: page.rects for page in style_spans}
+
+def _highlights(path):
+    """Per page, the translucent rectangles drawn over the text, with their fill color"""
+    with fitz.open(path) as doc:
+        assert not doc.is_repaired
+        return [
+            sorted(
+                (tuple(round(value, 1) for value in drawing["rect"]), tuple(round(c, 3) for c in drawing["fill"]))
+                for drawing in page.get_drawings() if drawing.get("fill_opacity") == pytest.approx(0.3, abs=0.01)
+            )
+            for page in doc
+        ]
+
+@pytest.mark.parametrize("stored_spans", [False, True])
+def test_chunked_writer_matches_in_memory_rendering(processed, tmp_path, stored_spans):
+    processor, style_stats, style_spans = processed
+    style_spans = style_spans if stored_spans else None
+    expected = processor.strategy.create_highlighted_pdf(
+        processor.doc, str(tmp_path / "memory.pdf"), style_stats, processor.layout_cache, style_spans
+    )
+    written = processor.strategy.write_highlighted_pdf(
+        processor.doc, str(tmp_path / "chunked.pdf"), style_stats, processor.layout_cache, style_spans
+    )
+    highlights = _highlights(written)
+    assert len(highlights) == PAGES
+    assert all(highlights)
+    assert highlights == _highlights(expected)
+
+    # The source bytes stay in front, followed by one update per chunk
+    with open(processor.file_path, "rb") as f:
+        source = f.read()
+    with open(written, "rb") as f:
+        output = f.read()
+    assert output.startswith(source)
+    assert output.count(b"%%EOF") == source.count(b"%%EOF") + 2
+
+def _render_in_thread(path, parts, error=None, seconds=0.0):
+    """Append parts to path like a render worker, then fail or finish after seconds"""
+    future = Future()
+    # Running, like a job a worker has picked up: it can no longer be cancelled
+    future.set_running_or_notify_cancel()
+
+    def write():
+        for part in parts:
+            with open(path, "ab") as f:
+                f.write(part)
+        time.sleep(seconds)
+        if error is None:
+            future.set_result(path)
+        else:
+            future.set_exception(error)
+    threading.Thread(target=write).start()
+    return future
+
+async def _consume(stream, received):
+    async for chunk in stream:
+        received.append(chunk)
+
+@pytest.fixture
+def web_app(tmp_path, monkeypatch):
+    from src.web import app as web_app
+    monkeypatch.setattr(web_app, "highlight_cache", HighlightedPDFCache(str(tmp_path / "cache"), 10 ** 7))
+    return web_app
+
+def test_failed_rendering_ends_stream_and_removes_temp_file(web_app):
+    cache = web_app.highlight_cache
+    tmp_path = cache.reserve()
+    future = _render_in_thread(tmp_path, [b"%PDF-1.7 ", b"x" * 1000], RuntimeError("render failed"))
+    received = []
+    with pytest.raises(RuntimeError, match="render failed"):
+        asyncio.run(_consume(web_app._stream_rendering(1, "key", future, tmp_path), received))
+    assert b"".join(received) == b"%PDF-1.7 " + b"x" * 1000
+    assert not os.path.exists(tmp_path)
+    assert os.listdir(cache.directory) == []
+
+def test_finished_rendering_is_streamed_and_published(web_app):
+    cache = web_app.highlight_cache
+    tmp_path = cache.reserve()
+    future = _render_in_thread(tmp_path, [b"%PDF-1.7 ", b"y" * 1000])
+    received = []
+    asyncio.run(_consume(web_app._stream_rendering(1, "key", future, tmp_path), received))
+    assert b"".join(received) == b"%PDF-1.7 " + b"y" * 1000
+    assert not os.path.exists(tmp_path)
+    assert cache.get(1, "key") == cache.path_for(1, "key")
+
+def test_stream_outlives_the_pool_timeout(web_app, monkeypatch):
+    # Streams wait RENDER_STREAM_TIMEOUT_SECONDS, not the blocking path's timeout
+    monkeypatch.setattr(web_app.render_pool, "timeout", 0.05)
+    cache = web_app.highlight_cache
+    tmp_path = cache.reserve()
+    future = _render_in_thread(tmp_path, [b"%PDF-1.7 ", b"z" * 1000], seconds=0.3)
+    received = []
+    asyncio.run(_consume(web_app._stream_rendering(1, "key", future, tmp_path), received))
+    assert b"".join(received) == b"%PDF-1.7 " + b"z" * 1000
+    assert cache.get(1, "key") == cache.path_for(1, "key")
+
+def test_timed_out_stream_is_cut_short_and_not_published(web_app, monkeypatch):
+    from src.web.render_pool import RenderTimeout
+    monkeypatch.setattr(web_app, "RENDER_STREAM_TIMEOUT_SECONDS", 0.1)
+    cache = web_app.highlight_cache
+    tmp_path = cache.reserve()
+    future = _render_in_thread(tmp_path, [b"%PDF-1.7 ", b"t" * 1000], seconds=0.5)
+    received = []
+    # The exception aborts the response, so the client sees an incomplete transfer
+    with pytest.raises(RenderTimeout):
+        asyncio.run(_consume(web_app._stream_rendering(1, "key", future, tmp_path), received))
+    assert b"".join(received) == b"%PDF-1.7 " + b"t" * 1000
+    future.result(timeout=5)
+    assert cache.get(1, "key") is None
+    assert os.listdir(cache.directory) == []
+
+def test_stalled_stream_is_given_up_and_not_published(web_app, monkeypatch):
+    monkeypatch.setattr(web_app, "RENDER_STREAM_IDLE_SECONDS", 0.1)
+    cache = web_app.highlight_cache
+    tmp_path = cache.reserve()
+    # Nothing is appended after the first bytes until well past the idle timeout
+    future = _render_in_thread(tmp_path, [b"%PDF-1.7 ", b"s" * 1000], seconds=0.5)
+    received = []
+    with pytest.raises(TimeoutError):
+        asyncio.run(_consume(web_app._stream_rendering(1, "key", future, tmp_path), received))
+    assert b"".join(received) == b"%PDF-1.7 " + b"s" * 1000
+    # Removed right away, so a chunked rendering stops at its next chunk
+    assert not os.path.exists(tmp_path)
+    future.result(timeout=5)
+    assert cache.get(1, "key") is None
+    assert os.listdir(cache.directory) == []
+
+def _stored_rects(data):
+    return [[round(x0, 2), round(y0, 2), round(x1, 2), round(y1, 2), style]
+            for x0, y0, x1, y1, style in unpack_style_rects(data).tolist()]
+
+def _assert_same_rects(found, expected):
+    # Stored boxes are float32, so the last rounded digit may differ
+    assert len(found) == len(expected)
+    for rect, expected_rect in zip(found, expected):
+        assert rect[4] == expected_rect[4]
+        assert rect[:4] == pytest.approx(expected_rect[:4], abs=0.011)
+
+def test_stored_spans_match_the_page_layouts(processed):
+    processor, style_stats, style_spans = processed
+    layout_rects = processor.strategy.page_highlights(processor.doc, style_stats, 0, PAGES, processor.layout_cache)
+    assert sorted(style_spans) == [page_number for page_number, rects in enumerate(layout_rects, 1) if rects]
+    for page_number, rects in style_spans.items():
+        _assert_same_rects(_stored_rects(rects), layout_rects[page_number - 1])
+
+def test_highlights_endpoint_reads_stored_spans_like_the_layout_path(processed, tmp_path, web_app, monkeypatch):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine, delete
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.database.connection import get_async_db
+    from src.database.models import Base, PageStyleSpans
+    from src.database.persistence import save_result
+    from src.web.render_pool import RenderPool
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'highlights.db'}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    document, text_blocks, analysis, style_stats, style_spans = PDFProcessor(processed[0].file_path, "analysis")\
+        .process_document()
+    save_result(db, document, text_blocks, analysis, style_stats, style_spans)
+    db.commit()
+
+    pool = RenderPool(max_workers=1, max_pending=4, timeout=60)
+    monkeypatch.setattr(web_app, "render_pool", pool)
+    async_engine = create_async_engine(engine.url.set(drivername="sqlite+aiosqlite"))
+    AsyncSession = async_sessionmaker(async_engine)
+
+    async def test_db():
+        async with AsyncSession() as session:
+            yield session
+
+    def windows(client):
+        bodies, after_page = [], 0
+        while after_page is not None:
+            body = client.get(f"/analysis/{document.id}/highlights", params={"after_page": after_page, "limit": 5}).json()
+            bodies.append(body)
+            after_page = body["next_after_page"]
+        return bodies
+
+    web_app.app.dependency_overrides[get_async_db] = test_db
+    try:
+        client = TestClient(web_app.app)
+        stored = windows(client)
+        assert pool.metrics()["submitted"] == 0
+        # A document processed before spans were stored
+        db.execute(delete(PageStyleSpans).where(PageStyleSpans.document_id == document.id))
+        db.commit()
+        matched = windows(client)
+        assert pool.metrics()["submitted"] == len(matched)
+    finally:
+        del web_app.app.dependency_overrides[get_async_db]
+        asyncio.run(async_engine.dispose())
+        pool.shutdown()
+        db.close()
+        engine.dispose()
+
+    assert len(stored) == len(matched) == -(-PAGES // 5)
+    for stored_window, matched_window in zip(stored, matched):
+        assert stored_window["styles"] == matched_window["styles"]
+        assert stored_window["next_after_page"] == matched_window["next_after_page"]
+        assert [page["page_number"] for page in stored_window["pages"]] == \
+            [page["page_number"] for page in matched_window["pages"]]
+        for stored_page, matched_page in zip(stored_window["pages"], matched_window["pages"]):
+            _assert_same_rects(stored_page["rects"], matched_page["rects"])
+    assert any(window["pages"] for window in stored)
@@ -0,0 +1,351 @@
+import asyncio
+import aiofiles.os
+import io
+import os
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+import fitz
+import scripts.job_worker as job_worker
+from scripts.job_worker import _adopt_upload, _claim_upload, run_job
+from src.database.jobs import (
+    JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, PENDING_STRATEGY,
+    claim_job, complete_job, fail_job, send_heartbeat
+)
+from src.database.models import Base, Document, ProcessingJob, StyleStatistics, TextBlock
+from src.pdf_processing.processor import PDFProcessor
+from src.web.uploads import save_upload
+
+LEASE = 60
+
+@pytest.fixture
+def engine(tmp_path):
+    # A database file, so several sessions can see each other's commits
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine)
+
+def _document(db, strategy="dict", name="a.pdf"):
+    document = Document(file_path=f"/pdfs/{name}", processed_at=datetime.now(), file_name=name, strategy=strategy)
+    db.add(document)
+    db.flush()
+    return document
+
+def _job(db, document, strategy="dict", **values):
+    job = ProcessingJob(document_id=document.id, strategy=strategy, status=JOB_QUEUED,
+                        attempts=0, max_attempts=3, progress=0.0, **values)
+    db.add(job)
+    db.commit()
+    return job
+
+def test_claim_job_takes_oldest_due_job(Session):
+    db = Session()
+    document = _document(db)
+    later = _job(db, document, run_after=datetime.utcnow() + timedelta(hours=1))
+    first = _job(db, _document(db, name="b.pdf"))
+    second = _job(db, _document(db, name="c.pdf"))
+
+    job = claim_job(db, "w1", LEASE)
+    assert job.id == first.id
+    assert (job.status, job.worker, job.attempts) == (JOB_RUNNING, "w1", 1)
+    assert job.heartbeat_at is not None
+    assert claim_job(db, "w2", LEASE).id == second.id
+    # Not due yet
+    assert claim_job(db, "w3", LEASE) is None
+    db.refresh(later)
+    assert later.status == JOB_QUEUED
+    db.close()
+
+def test_claim_job_loses_race_to_concurrent_claim(Session):
+    db, other = Session(), Session()
+    job_id = _job(db, _document(db)).id
+    raced = []
+
+    @event.listens_for(db, "do_orm_execute")
+    def claim_first(state):
+        # Another worker claims the job between our SELECT and UPDATE
+        if state.is_update and not raced:
+            raced.append(claim_job(other, "w2", LEASE))
+
+    assert claim_job(db, "w1", LEASE) is None
+    assert raced[0].id == job_id
+    job = db.get(ProcessingJob, job_id)
+    assert (job.worker, job.attempts) == ("w2", 1)
+    db.close()
+    other.close()
+
+def test_fail_job_backs_off_then_gives_up(Session):
+    db = Session()
+    job_id = _job(db, _document(db)).id
+    delays = []
+    for attempt in (1, 2):
+        job = claim_job(db, "w1", LEASE)
+        assert job.attempts == attempt
+        before = datetime.utcnow()
+        assert fail_job(db, job, "w1", "boom", retry_base_seconds=10)
+        db.refresh(job)
+        assert (job.status, job.error) == (JOB_QUEUED, "boom")
+        delays.append((job.run_after - before).total_seconds())
+        # Due at once for the next attempt
+        job.run_after = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+    assert 9 <= delays[0] <= 11
+    assert 19 <= delays[1] <= 21
+
+    job = claim_job(db, "w1", LEASE)
+    assert job.attempts == 3
+    assert fail_job(db, job, "w1", "final", retry_base_seconds=10)
+    db.refresh(job)
+    assert (job.status, job.error) == (JOB_FAILED, "final")
+    assert job.finished_at is not None
+    assert claim_job(db, "w1", LEASE) is None
+    assert db.get(ProcessingJob, job_id).status == JOB_FAILED
+    db.close()
+
+def test_expired_lease_is_taken_over(Session):
+    db = Session()
+    document = _document(db)
+    job = _job(db, document)
+    job = claim_job(db, "w1", LEASE)
+    assert send_heartbeat(db, job.id, "w1")
+    # A live lease is not claimable
+    assert claim_job(db, "w2", LEASE) is None
+
+    job.heartbeat_at = datetime.utcnow() - timedelta(seconds=LEASE + 1)
+    db.commit()
+    taken = claim_job(db, "w2", LEASE)
+    assert (taken.id, taken.worker, taken.attempts) == (job.id, "w2", 2)
+    assert not send_heartbeat(db, job.id, "w1")
+
+    # The stale worker's result is rejected and changes nothing
+    assert not complete_job(db, job, "w1", document.id)
+    db.rollback()
+    assert not fail_job(db, job, "w1", "late", retry_base_seconds=10)
+    db.refresh(taken)
+    assert (taken.status, taken.worker, taken.error) == (JOB_RUNNING, "w2", None)
+
+    assert complete_job(db, taken, "w2", document.id)
+    db.commit()
+    db.refresh(taken)
+    assert (taken.status, taken.progress, taken.result_document_id) == (JOB_SUCCEEDED, 1.0, document.id)
+    assert taken.finished_at is not None
+    db.close()
+
+def test_one_active_job_per_document_and_strategy(Session):
+    db = Session()
+    document = _document(db)
+    job = _job(db, document)
+    with pytest.raises(IntegrityError):
+        _job(db, document)
+    db.rollback()
+    # Other strategies and finished jobs do not count
+    _job(db, document, strategy="blocks")
+    claimed = claim_job(db, "w1", LEASE)
+    assert complete_job(db, claimed, "w1", document.id)
+    db.commit()
+    assert _job(db, document).id != job.id
+    db.close()
+
+def test_claim_upload_only_once(Session):
+    db, other = Session(), Session()
+    upload = _document(db, strategy=PENDING_STRATEGY)
+    db.commit()
+    assert _claim_upload(db, upload.id, "dict")
+    db.commit()
+    assert not _claim_upload(other, upload.id, "blocks")
+    other.rollback()
+    db.refresh(upload)
+    assert upload.strategy == "dict"
+    db.close()
+    other.close()
+
+def test_adopt_upload_fills_placeholder(Session):
+    db = Session()
+    upload = _document(db, strategy=PENDING_STRATEGY, name="upload.pdf")
+    upload_id = upload.id
+    processed = Document(file_path="/pdfs/upload.pdf", processed_at=datetime(2026, 1, 2), file_name="upload.pdf",
+                         strategy="dict", file_hash="abc", file_size=10)
+    blocks = [TextBlock(page_number=1, text_content="a")]
+    adopted, adopted_blocks = _adopt_upload(upload, (processed, blocks))
+    assert adopted is upload and adopted_blocks is blocks
+    assert (adopted.id, adopted.strategy, adopted.file_hash, adopted.file_size) == (upload_id, "dict", "abc", 10)
+    assert adopted.processed_at == datetime(2026, 1, 2)
+    db.close()
+
+def _queued_upload(Session, tmp_path, pages=5):
+    """A PDF uploaded but not processed yet, with a forced analysis job claimed by worker "w" """
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Kapitel {page_number}", fontsize=16, fontname="hebo")
+        page.insert_text((72, 110), f"Text auf Seite {page_number}", fontsize=10)
+    path = str(tmp_path / "upload.pdf")
+    doc.save(path)
+    doc.close()
+    db = Session()
+    upload = Document(file_path=path, processed_at=datetime.now(), file_name="upload.pdf", strategy=PENDING_STRATEGY)
+    db.add(upload)
+    db.flush()
+    _job(db, upload, strategy="analysis", force=True)
+    job = claim_job(db, "w", LEASE)
+    return db, upload.id, job
+
+@pytest.mark.parametrize("batch_pages", [0, 2])
+def test_run_job_fills_the_upload_placeholder(Session, tmp_path, monkeypatch, batch_pages):
+    monkeypatch.setattr(job_worker, "IngestSessionLocal", Session)
+    db, upload_id, job = _queued_upload(Session, tmp_path)
+    run_job(db, job, "w", batch_pages=batch_pages)
+    db.close()
+
+    db = Session()
+    [document] = db.query(Document).all()
+    assert document.id == upload_id and document.strategy == PDFProcessor.strategy_label("analysis")
+    job = db.get(ProcessingJob, job.id)
+    assert (job.status, job.result_document_id) == (JOB_SUCCEEDED, upload_id)
+    # Batched or not, the same rows as processing the file directly
+    _, blocks, _, style_stats, _ = PDFProcessor(document.file_path, "analysis").process_document()
+    stored = db.query(TextBlock).filter_by(document_id=upload_id).order_by(TextBlock.id).all()
+    assert [(b.page_number, b.text_content) for b in stored] == [(b.page_number, b.text_content) for b in blocks]
+    assert db.query(StyleStatistics).filter_by(document_id=upload_id).count() == len(style_stats)
+    db.close()
+
+def test_run_job_stops_saving_batches_once_taken_over(Session, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_worker, "IngestSessionLocal", Session)
+    db, upload_id, job = _queued_upload(Session, tmp_path)
+    other = Session()
+    other.get(ProcessingJob, job.id).worker = "other"
+    other.commit()
+    other.close()
+    with pytest.raises(RuntimeError, match="taken over"):
+        run_job(db, job, "w", batch_pages=2)
+    db.close()
+
+    db = Session()
+    [document] = db.query(Document).all()
+    assert (document.id, document.strategy) == (upload_id, PENDING_STRATEGY)
+    assert db.query(TextBlock).count() == 0
+    db.close()
+
+def test_run_job_deletes_batches_when_completion_is_lost(Session, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_worker, "IngestSessionLocal", Session)
+    monkeypatch.setattr(job_worker, "complete_job", lambda *args: False)
+    db, upload_id, job = _queued_upload(Session, tmp_path)
+    run_job(db, job, "w", batch_pages=2)
+    db.close()
+
+    db = Session()
+    [document] = db.query(Document).all()
+    assert (document.id, document.strategy) == (upload_id, PENDING_STRATEGY)
+    assert db.query(TextBlock).count() == 0
+    db.close()
+
+def _save(data, folder, name="report.pdf", max_bytes=1000):
+    upload = UploadFile(file=io.BytesIO(data), filename=name)
+    return asyncio.run(save_upload(upload, str(folder), max_bytes))
+
+def _leftovers(folder):
+    return [name for name in os.listdir(folder) if name.startswith(".upload-")]
+
+def test_save_upload_renames_instead_of_overwriting(tmp_path):
+    first = _save(b"%PDF-1.7 first", tmp_path)
+    second = _save(b"%PDF-1.7 second", tmp_path)
+    assert os.path.basename(first) == "report.pdf"
+    assert second != first and os.path.basename(second).startswith("report_")
+    with open(first, "rb") as f:
+        assert f.read() == b"%PDF-1.7 first"
+    assert _save(b"%PDF-1.7", tmp_path, name="../../etc/passwd").startswith(str(tmp_path))
+    assert _leftovers(tmp_path) == []
+
+def test_save_upload_never_replaces_a_file_created_concurrently(tmp_path, monkeypatch):
+    link = aiofiles.os.link
+
+    async def link_after_other_upload(src, dst):
+        # Another upload of the same name lands just before this one
+        if not os.path.exists(tmp_path / "report.pdf"):
+            (tmp_path / "report.pdf").write_bytes(b"%PDF-1.7 other")
+        return await link(src, dst)
+
+    monkeypatch.setattr(aiofiles.os, "link", link_after_other_upload)
+    path = _save(b"%PDF-1.7 mine", tmp_path)
+    assert os.path.basename(path).startswith("report_")
+    assert (tmp_path / "report.pdf").read_bytes() == b"%PDF-1.7 other"
+    with open(path, "rb") as f:
+        assert f.read() == b"%PDF-1.7 mine"
+    assert _leftovers(tmp_path) == []
+
+def test_concurrent_uploads_of_one_name_all_keep_their_bytes(tmp_path):
+    async def upload_all():
+        return await asyncio.gather(*[
+            save_upload(UploadFile(file=io.BytesIO(b"%%PDF-1.7 %d" % i), filename="report.pdf"), str(tmp_path), 1000)
+            for i in range(20)
+        ])
+
+    paths = asyncio.run(upload_all())
+    assert len(set(paths)) == 20
+    for i, path in enumerate(paths):
+        with open(path, "rb") as f:
+            assert f.read() == b"%%PDF-1.7 %d" % i
+    assert _leftovers(tmp_path) == []
+
+@pytest.mark.parametrize("data, status", [
+    (b"GIF89a not a pdf", 415),
+    (b"%PDF-" + b"x" * 1000, 413),
+    (b"", 400),
+])
+def test_save_upload_rejects(tmp_path, data, status):
+    with pytest.raises(HTTPException) as error:
+        _save(data, tmp_path)
+    assert error.value.status_code == status
+    assert os.listdir(tmp_path) == []
+
+@pytest.fixture
+def client(engine, Session):
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database.connection import get_async_db
+    from src.web.app import app
+
+    async_engine = create_async_engine(engine.url.set(drivername="sqlite+aiosqlite"))
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def test_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = test_db
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        del app.dependency_overrides[get_async_db]
+        asyncio.run(async_engine.dispose())
+
+def test_process_endpoint_reuses_and_forces_active_job(client, Session):
+    db = Session()
+    document_id = _document(db).id
+    db.commit()
+    url = f"/documents/{document_id}/process"
+
+    queued = client.post(url).json()
+    assert client.post(url).json()["id"] == queued["id"]
+    # force applies to the job that has not started yet
+    forced = client.post(url, params={"force": "true"})
+    assert forced.status_code == 202
+    assert forced.json()["id"] == queued["id"]
+    assert db.get(ProcessingJob, queued["id"]).force
+
+    # A running job cannot be forced any more
+    running = client.post(url, params={"strategy": "blocks"}).json()
+    db.query(ProcessingJob).filter_by(id=running["id"]).update({"status": JOB_RUNNING})
+    db.commit()
+    assert client.post(url, params={"strategy": "blocks", "force": "true"}).status_code == 409
+    assert db.query(ProcessingJob).filter_by(document_id=document_id).count() == 2
+    db.close()
@@ -0,0 +1,69 @@
+import random
+import numpy as np
+import pytest
+from src.pdf_processing.span_table import group_lines
+
+def _sequential_lines(boxes, y_tolerance=3):
+    """Reference: the sort-and-walk grouping group_lines replaced, as lists of box indices"""
+    lines, current, anchor = [], [], None
+    for index in sorted(range(len(boxes)), key=lambda i: (boxes[i][1], boxes[i][0])):
+        y0 = boxes[index][1]
+        if anchor is None or abs(y0 - anchor) <= y_tolerance:
+            if anchor is None:
+                anchor = y0
+            current.append(index)
+        else:
+            lines.append(current)
+            current, anchor = [index], y0
+    if current:
+        lines.append(current)
+    return lines
+
+def _grouped(boxes, y_tolerance=3):
+    x0, y0, x1, y1 = (np.array(column, dtype=np.float64) for column in zip(*boxes))
+    groups = group_lines(x0, y0, x1, y1, y_tolerance)
+    bounds = groups.starts.tolist() + [len(boxes)]
+    lines = [groups.order[start:stop].tolist() for start, stop in zip(bounds, bounds[1:])]
+    return groups, lines
+
+def _random_page(rng, lines=40, spans_per_line=4, jitter=1.0):
+    boxes = []
+    for line in range(lines):
+        baseline = 60 + line * 12 + rng.uniform(-jitter, jitter)
+        for part in range(spans_per_line):
+            y0 = baseline + rng.uniform(-jitter, jitter)
+            x0 = 50 + part * 120 + rng.uniform(0, 10)
+            boxes.append((x0, y0, x0 + 100, y0 + 10))
+    rng.shuffle(boxes)
+    return boxes
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_sequential_grouping(seed):
+    rng = random.Random(seed)
+    boxes = _random_page(rng, jitter=rng.choice([0.5, 1.0, 2.0, 4.0]))
+    groups, lines = _grouped(boxes)
+    assert lines == _sequential_lines(boxes)
+    for i, line in enumerate(lines):
+        assert groups.x0[i] == min(boxes[j][0] for j in line)
+        assert groups.y0[i] == min(boxes[j][1] for j in line)
+        assert groups.x1[i] == max(boxes[j][2] for j in line)
+        assert groups.y1[i] == max(boxes[j][3] for j in line)
+
+def test_drifting_baseline_does_not_chain():
+    # Each box is within tolerance of the previous one, but not of the line's first box
+    boxes = [(0, y, 10, y + 5) for y in (0.0, 2.0, 4.0, 6.0, 8.0, 10.0)]
+    assert _grouped(boxes)[1] == _sequential_lines(boxes) == [[0, 1], [2, 3], [4, 5]]
+
+def test_tolerance_boundary_is_inclusive():
+    boxes = [(0, 0.1, 10, 5), (20, 3.1, 30, 8), (40, 3.1000001, 50, 8)]
+    assert _grouped(boxes)[1] == _sequential_lines(boxes) == [[0, 1], [2]]
+
+def test_same_line_keeps_sort_order():
+    # Like the sequential version, members stay in (y0, x0) order
+    boxes = [(300, 10, 350, 20), (100, 11, 150, 21), (200, 10.5, 250, 20.5), (50, 10, 90, 20)]
+    assert _grouped(boxes)[1] == _sequential_lines(boxes) == [[3, 0, 2, 1]]
+
+def test_empty():
+    empty = np.empty(0)
+    groups = group_lines(empty, empty, empty, empty)
+    assert len(groups.order) == 0 and len(groups.starts) == 0
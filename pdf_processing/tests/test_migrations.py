@@ -0,0 +1,63 @@
+import importlib.util
+import json
+import os
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+pytest.importorskip("alembic")
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+VERSIONS = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions")
+
+def _migration(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(VERSIONS, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _run(connection, step):
+    with Operations.context(MigrationContext.configure(connection)):
+        step()
+
+@pytest.fixture
+def connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    with engine.begin() as connection:
+        # text_blocks as the previous revision left it
+        connection.execute(text("""
+            CREATE TABLE text_blocks (
+                id INTEGER PRIMARY KEY, document_id INTEGER NOT NULL, page_number INTEGER NOT NULL,
+                text_content TEXT NOT NULL, bbox_coordinates JSON NOT NULL
+            )
+        """))
+        yield connection
+    engine.dispose()
+
+def test_bbox_columns_are_backfilled_from_the_json(connection):
+    bboxes = [{"x0": 72.0, "y0": 700.5, "x1": 300.25, "y1": 712.0}, {"x0": 10, "y0": 20, "x1": 30, "y1": 40}]
+    for block_id, bbox in enumerate(bboxes, 1):
+        connection.execute(text(
+            "INSERT INTO text_blocks (id, document_id, page_number, text_content, bbox_coordinates) "
+            "VALUES (:id, 1, 1, 'Text', :bbox)"
+        ), {"id": block_id, "bbox": json.dumps(bbox)})
+
+    migration = _migration("b4418702c4c1_add_text_block_bbox_columns")
+    _run(connection, migration.upgrade)
+    rows = connection.execute(text("SELECT x0, y0, x1, y1 FROM text_blocks ORDER BY id")).all()
+    assert [dict(row._mapping) for row in rows] == bboxes
+    assert "ix_text_blocks_document_page_y0" in {index["name"] for index in inspect(connection).get_indexes("text_blocks")}
+    plan = connection.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM text_blocks WHERE document_id = 1 AND page_number = 1 ORDER BY y0"
+    )).all()
+    assert not any("TEMP B-TREE" in row[-1] for row in plan)
+
+    # Blocks written after the upgrade may carry only the typed columns
+    connection.execute(text(
+        "INSERT INTO text_blocks (id, document_id, page_number, text_content, x0, y0, x1, y1) "
+        "VALUES (3, 1, 2, 'Neu', 1.5, 2.5, 3.5, 4.5)"
+    ))
+    _run(connection, migration.downgrade)
+    stored = connection.execute(text("SELECT bbox_coordinates FROM text_blocks ORDER BY id")).scalars().all()
+    assert [json.loads(bbox) for bbox in stored] == bboxes + [{"x0": 1.5, "y0": 2.5, "x1": 3.5, "y1": 4.5}]
+    assert "y0" not in {column["name"] for column in inspect(connection).get_columns("text_blocks")}
@@ -0,0 +1,101 @@
+import json
+import os
+import fitz
+from src.pdf_processing.fingerprint import compute_fingerprint
+from src.pdf_processing.page_cache import LAYOUT_FLAGS, PageLayoutCache
+from src.pdf_processing.processor import PDFProcessor
+
+def _write_pdf(path, word="Alpha", pages=4):
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{word} Kapitel {page_number}", fontsize=16, fontname="hebo")
+        page.insert_text((72, 110), f"{word} Text auf Seite {page_number}", fontsize=10)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def _as_json(layout):
+    # On disk, tuples come back as lists
+    return json.loads(json.dumps(layout))
+
+def test_memory_cache_returns_the_parsed_page_until_evicted(tmp_path):
+    doc = fitz.open(_write_pdf(tmp_path / "a.pdf"))
+    cache = PageLayoutCache(doc, max_pages=2, cache_dir=None)
+    first = cache.get(0)
+    assert first == doc[0].get_text("dict", flags=LAYOUT_FLAGS)
+    assert cache.get(0) is first
+    cache.get(1)
+    cache.get(2)
+    # Page 0 was the least recently used of three
+    assert cache.get(0) is not first
+    assert (cache.hits, cache.misses) == (1, 4)
+
+def test_disk_cache_is_read_without_mupdf(tmp_path, monkeypatch):
+    path = _write_pdf(tmp_path / "a.pdf")
+    file_hash = compute_fingerprint(path).sha256
+    cache_dir = str(tmp_path / "cache")
+    doc = fitz.open(path)
+    parsed = [PageLayoutCache(doc, file_hash, cache_dir=cache_dir).get(page_num) for page_num in range(len(doc))]
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("page parsed again")
+
+    monkeypatch.setattr(fitz.Page, "get_text", no_parsing)
+    cached = PageLayoutCache(fitz.open(path), file_hash, cache_dir=cache_dir)
+    assert [cached.get(page_num) for page_num in range(len(doc))] == [_as_json(layout) for layout in parsed]
+
+def test_processing_from_the_disk_cache_matches_mupdf(tmp_path, monkeypatch):
+    path = _write_pdf(tmp_path / "a.pdf")
+    fingerprint = compute_fingerprint(path)
+    cache_dir = str(tmp_path / "cache")
+
+    def process(strategy, cache_dir):
+        processor = PDFProcessor(path, strategy, fingerprint=fingerprint)
+        processor.layout_cache = PageLayoutCache(processor.doc, fingerprint.sha256, cache_dir=cache_dir)
+        blocks = processor.process_document()[1]
+        return [(b.page_number, b.text_content, b.x0, b.y0, b.x1, b.y1, b.font_name, b.font_size) for b in blocks]
+
+    expected = {strategy: process(strategy, None) for strategy in ("dict", "analysis")}
+    assert all(expected.values())
+    # The first strategy writes every page for the other
+    assert process("dict", cache_dir) == expected["dict"]
+
+    get_text = fitz.Page.get_text
+
+    def no_layouts(self, option="text", *args, **kwargs):
+        assert option != "dict", "page layout parsed again"
+        return get_text(self, option, *args, **kwargs)
+
+    monkeypatch.setattr(fitz.Page, "get_text", no_layouts)
+    for strategy in ("analysis", "dict"):
+        assert process(strategy, cache_dir) == expected[strategy]
+
+def test_malformed_entry_is_parsed_again(tmp_path):
+    path = _write_pdf(tmp_path / "a.pdf")
+    cache_dir = str(tmp_path / "cache")
+    cache = PageLayoutCache(fitz.open(path), "hash", cache_dir=cache_dir)
+    expected = _as_json(cache.get(0))
+    with open(cache._page_path(0), "w") as f:
+        f.write('{"blocks": ')
+    assert _as_json(PageLayoutCache(fitz.open(path), "hash", cache_dir=cache_dir).get(0)) == expected
+
+def test_least_recently_used_documents_are_evicted(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    caches = []
+    for index, word in enumerate(["Alpha", "Beta", "Gamma"]):
+        path = _write_pdf(tmp_path / f"{word}.pdf", word)
+        cache = PageLayoutCache(fitz.open(path), f"hash{index}", cache_dir=cache_dir, max_bytes=10 ** 9)
+        cache.get(0)
+        caches.append(cache)
+        # Directory mtimes order the documents
+        os.utime(cache._entry_dir(), (index, index))
+    entry_size = sum(entry.stat().st_size for entry in os.scandir(caches[0]._entry_dir()))
+
+    # Reading the oldest document makes it the most recently used
+    PageLayoutCache(caches[0].doc, "hash0", cache_dir=cache_dir).get(0)
+    writer = PageLayoutCache(caches[2].doc, "hash2", cache_dir=cache_dir, max_bytes=int(3.5 * entry_size))
+    writer.get(1)
+    assert sorted(os.listdir(cache_dir)) == sorted(
+        os.path.basename(cache._entry_dir()) for cache in (caches[0], caches[2])
+    )
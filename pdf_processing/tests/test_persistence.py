@@ -0,0 +1,119 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from src.config.settings import DATABASE_URL
+from src.database.models import Base, Document, StyleStatistics, TextBlock, PageStyleSpans
+from src.database.persistence import (
+    _copy_encoder, _row_values, _insert_columns, bulk_insert_style_statistics, bulk_insert_text_blocks,
+    bulk_insert_page_style_spans
+)
+
+def _encode(table, column, value):
+    return _copy_encoder(table.c[column])(value)
+
+@pytest.mark.parametrize("value, expected", [
+    ("plain text", "plain text"),
+    ("tab\there", "tab\\there"),
+    ("line\nbreak\r", "line\\nbreak\\r"),
+    ("back\\slash", "back\\\\slash"),
+    ("\\N", "\\\\N"),
+    ("Überschrift – „Zitat“", "Überschrift – „Zitat“"),
+])
+def test_copy_encoder_text(value, expected):
+    assert _encode(TextBlock.__table__, "text_content", value) == expected
+
+def test_copy_encoder_null():
+    for column in ("text_content", "x0", "page_number", "bbox_coordinates"):
+        assert _encode(TextBlock.__table__, column, None) == "\\N"
+    assert _encode(StyleStatistics.__table__, "is_bold", None) == "\\N"
+    assert _encode(PageStyleSpans.__table__, "rects", None) == "\\N"
+
+def test_copy_encoder_numbers_and_booleans():
+    assert _encode(TextBlock.__table__, "page_number", 12) == "12"
+    assert _encode(TextBlock.__table__, "x0", 72.125) == "72.125"
+    assert float(_encode(TextBlock.__table__, "x0", 0.1)) == 0.1
+    assert _encode(StyleStatistics.__table__, "is_bold", True) == "t"
+    assert _encode(StyleStatistics.__table__, "is_bold", False) == "f"
+
+def test_copy_encoder_json():
+    encoded = _encode(TextBlock.__table__, "bbox_coordinates", {"x0": 1.5, "note": "a\tb\\c"})
+    # JSON escapes the tab and backslash; COPY then escapes JSON's backslashes
+    assert encoded == '{"x0": 1.5, "note": "a\\\\tb\\\\\\\\c"}'
+
+def test_copy_encoder_bytes():
+    # bytea hex input, with the backslash escaped for COPY
+    assert _encode(PageStyleSpans.__table__, "rects", b"\x00\xff\x10") == "\\\\x00ff10"
+
+def test_row_values_leaves_out_unset_attributes():
+    block = TextBlock(page_number=1, text_content="a", font_size=10.0, font_name="f",
+                      font_color="#000000", block_type="body")
+    row = _row_values(block, _insert_columns(TextBlock.__table__))
+    assert row == {"page_number": 1, "text_content": "a", "font_size": 10.0, "font_name": "f",
+                   "font_color": "#000000", "block_type": "body"}
+
+def _bulk_round_trip(db):
+    document = Document(file_path="t.pdf", processed_at=datetime.now(), file_name="t.pdf", strategy="test")
+    db.add(document)
+    db.flush()
+    texts = ["tab\tsep", "new\nline", "back\\slash \\N", "Straße"]
+    bulk_insert_text_blocks(db, document.id, [
+        TextBlock(page_number=i + 1, text_content=value, bbox_coordinates={"x0": 1.0, "y0": 2.0},
+                  x0=1.0, y0=2.0, x1=3.0, y1=4.0, font_size=10.0, font_name="f",
+                  font_color="#000000", block_type="body")
+        for i, value in enumerate(texts)
+    ] + [
+        # Leaves out a column the rows before it set
+        TextBlock(page_number=9, text_content="no bbox", font_size=10.0, font_name="f",
+                  font_color="#000000", block_type="body")
+    ])
+    # No flags given: the column defaults apply instead of NULL; the second
+    # row sets a column the first one leaves out
+    bulk_insert_style_statistics(db, document.id, [
+        StyleStatistics(font_name="f", font_size=10.0, font_color="#000000", occurrence_count=3,
+                        examples=["a\tb"]),
+        StyleStatistics(font_name="g", font_size=12.0, font_color="#000000", occurrence_count=1,
+                        is_bold=True)
+    ])
+    bulk_insert_page_style_spans(db, document.id, [
+        PageStyleSpans(page_number=1, span_count=1, rects=b"\x00\x01\xfe\xff")
+    ])
+    stored = db.execute(text("SELECT text_content, bbox_coordinates FROM text_blocks "
+                             "WHERE document_id = :id ORDER BY id"), {"id": document.id}).fetchall()
+    stat, bold = db.query(StyleStatistics).filter_by(document_id=document.id).order_by(StyleStatistics.id).all()
+    spans = db.query(PageStyleSpans).filter_by(document_id=document.id).one()
+    assert [row[0] for row in stored] == texts + ["no bbox"]
+    assert stored[-1][1] is None
+    assert (bold.font_name, bold.is_bold, bold.is_italic) == ("g", True, False)
+    assert db.query(TextBlock).filter_by(document_id=document.id).first().bbox_coordinates == {"x0": 1.0, "y0": 2.0}
+    assert (stat.is_bold, stat.is_italic, stat.is_underlined, stat.examples) == (False, False, False, ["a\tb"])
+    assert bytes(spans.rects) == b"\x00\x01\xfe\xff"
+
+def test_bulk_insert_sqlite():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        _bulk_round_trip(db)
+    finally:
+        db.close()
+
+def test_bulk_insert_postgresql_copy():
+    """COPY round trip; needs DATABASE_URL to point at a PostgreSQL server with the schema"""
+    if not DATABASE_URL.startswith("postgresql"):
+        pytest.skip("DATABASE_URL is not a PostgreSQL database")
+    engine = create_engine(DATABASE_URL)
+    try:
+        connection = engine.connect()
+    except OperationalError:
+        pytest.skip("PostgreSQL database not reachable")
+    transaction = connection.begin()
+    db = sessionmaker(bind=connection)()
+    try:
+        _bulk_round_trip(db)
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
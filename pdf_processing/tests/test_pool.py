@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from src.config.settings import DB_POOL_RECYCLE, DB_POOL_TIMEOUT
+from src.database.connection import engine_options
+from src.database.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, pool_metrics
+
+def test_sqlite_keeps_the_default_pools():
+    options = engine_options("sqlite:////tmp/pdfs.db", 5, 10, 30000)
+    assert set(options) == {"pool_pre_ping"}
+
+def test_postgresql_pool_profiles():
+    options = engine_options("postgresql://db/pdfs", 7, 3, 30000)
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert (options["pool_size"], options["max_overflow"]) == (7, 3)
+    assert (options["pool_timeout"], options["pool_recycle"]) == (DB_POOL_TIMEOUT, DB_POOL_RECYCLE)
+    assert options["connect_args"] == {"options": "-c statement_timeout=30000"}
+
+    options = engine_options("postgresql+asyncpg://db/pdfs", 7, 3, 30000, is_async=True)
+    assert options["poolclass"] is InstrumentedAsyncQueuePool
+    assert options["connect_args"] == {"server_settings": {"statement_timeout": "30000"}}
+
+    # The ingest profile runs without a statement timeout
+    assert "connect_args" not in engine_options("postgresql://db/pdfs", 3, 0, 0)
+
+def test_instrumented_pool_counts_checkouts_and_timeouts(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = create_engine(url, poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+    plain = create_engine(url)
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE t (x INTEGER)"))
+            connection.execute(text("INSERT INTO t VALUES (1), (2)"))
+        # Queries return what the default pool returns
+        with engine.connect() as connection, plain.connect() as other:
+            assert connection.execute(text("SELECT x FROM t")).all() == other.execute(text("SELECT x FROM t")).all()
+
+            metrics = pool_metrics(engine)
+            assert (metrics["size"], metrics["checked_out"], metrics["max_overflow"]) == (1, 1, 0)
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+
+        metrics = pool_metrics(engine)
+        assert (metrics["checkouts"], metrics["timeouts"], metrics["checked_out"]) == (2, 1, 0)
+        assert metrics["max_wait_ms"] >= 50
+        # Disposing swaps the pool but keeps its statistics
+        engine.dispose()
+        with engine.connect():
+            pass
+        assert pool_metrics(engine)["checkouts"] == 3
+    finally:
+        engine.dispose()
+        plain.dispose()
+
+def test_uninstrumented_pools_report_no_checkout_statistics(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    try:
+        metrics = pool_metrics(engine)
+        assert metrics["pool"] == type(engine.pool).__name__
+        assert "checkouts" not in metrics
+    finally:
+        engine.dispose()
@@ -0,0 +1,281 @@
+import multiprocessing
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+import fitz
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import scripts.process_pdf as process_pdf
+from src.database.models import Base, Document, DocumentAnalysis, PageStyleSpans, StyleStatistics, TextBlock
+from src.database.persistence import (
+    find_document_by_hash, find_unchanged_document, save_batches, save_result,
+    sweep_partial_documents
+)
+from src.pdf_processing.fingerprint import compute_fingerprint
+from src.pdf_processing.processor import EXTRACTOR_VERSION, PDFProcessor
+
+def _write_pdf(path, word="Alpha", pages=2):
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"{word} Kapitel {page_number}", fontsize=16, fontname="hebo")
+        page.insert_text((72, 110), f"{word} Text auf Seite {page_number}", fontsize=10)
+        if page_number % 3 == 2:
+            page.insert_text((72, 780), f"Fußnote {page_number}", fontsize=8, fontname="heit")
+    # Uncompressed, so the same length of text gives the same file size
+    doc.save(str(path), expand=True)
+    doc.close()
+    return str(path)
+
+def _rewrite_keeping_stat(path, word):
+    """Give the file other bytes of the same size and set its mtime back"""
+    before = os.stat(path)
+    data = open(_write_pdf(f"{path}.new", word), "rb").read()
+    os.remove(f"{path}.new")
+    assert len(data) == before.st_size
+    while True:
+        with open(path, "r+b") as f:
+            f.write(data)
+        os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns))
+        # The ctime has the kernel's clock tick as resolution
+        if os.stat(path).st_ctime != before.st_ctime:
+            break
+        time.sleep(0.01)
+    after = os.stat(path)
+    assert (after.st_size, after.st_mtime) == (before.st_size, before.st_mtime)
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(process_pdf, "IngestSessionLocal", Session)
+    monkeypatch.setattr(process_pdf, "PDF_FOLDER", str(tmp_path))
+    yield Session
+    engine.dispose()
+
+def _documents(Session, **filters):
+    db = Session()
+    try:
+        return db.query(Document).filter_by(**filters).order_by(Document.id).all()
+    finally:
+        db.close()
+
+def _labels(*strategies):
+    return [PDFProcessor.strategy_label(strategy) for strategy in strategies]
+
+def _process(name, strategy="dict"):
+    assert process_pdf.process_single_pdf(name, strategy) == (name, None)
+
+def test_unchanged_file_is_skipped(Session, tmp_path):
+    _write_pdf(tmp_path / "a.pdf")
+    _process("a.pdf", ["dict", "blocks"])
+    _process("a.pdf", ["dict", "blocks"])
+    _process("a.pdf", "dict")
+    documents = _documents(Session)
+    assert [document.strategy for document in documents] == _labels("dict", "blocks")
+    assert all(document.extractor_version == EXTRACTOR_VERSION for document in documents)
+    # A strategy without a result is processed on its own
+    _process("a.pdf", ["dict", "words"])
+    assert [document.strategy for document in _documents(Session)] == _labels("dict", "blocks", "words")
+
+def test_rewrite_with_same_size_and_mtime_is_reprocessed(Session, tmp_path):
+    path = _write_pdf(tmp_path / "a.pdf", "Alpha")
+    _process("a.pdf")
+    _rewrite_keeping_stat(path, "Bravo")
+    _process("a.pdf")
+    first, second = _documents(Session)
+    assert first.file_hash != second.file_hash == compute_fingerprint(path).sha256
+    db = Session()
+    texts = [block.text_content for block in db.query(TextBlock).filter_by(document_id=second.id)]
+    db.close()
+    assert texts and all("Bravo" in text for text in texts)
+
+def test_new_extractor_version_is_reprocessed(Session, tmp_path, monkeypatch):
+    _write_pdf(tmp_path / "a.pdf")
+    _process("a.pdf")
+    monkeypatch.setattr(process_pdf, "EXTRACTOR_VERSION", "next")
+    monkeypatch.setattr("src.pdf_processing.processor.EXTRACTOR_VERSION", "next")
+    _process("a.pdf")
+    _process("a.pdf")
+    assert [document.extractor_version for document in _documents(Session)] == [EXTRACTOR_VERSION, "next"]
+
+def test_half_saved_document_is_never_matched(Session, tmp_path):
+    path = _write_pdf(tmp_path / "a.pdf")
+    fingerprint = compute_fingerprint(path)
+    db = Session()
+    # What save_batches() leaves behind until its last commit
+    db.add(Document(file_path=path, processed_at=datetime.now(),
+                    file_name="a.pdf", strategy=_labels("dict")[0], file_hash=fingerprint.sha256,
+                    file_size=fingerprint.size, file_mtime=fingerprint.mtime, file_ctime=fingerprint.ctime))
+    db.commit()
+    assert find_unchanged_document(db, path, fingerprint.size, fingerprint.mtime, fingerprint.ctime,
+                                   _labels("dict")[0], EXTRACTOR_VERSION) is None
+    assert find_document_by_hash(db, fingerprint.sha256, _labels("dict")[0], EXTRACTOR_VERSION) is None
+    db.close()
+    _process("a.pdf")
+    assert [document.extractor_version for document in _documents(Session)] == [None, EXTRACTOR_VERSION]
+
+def _rows(db, document_id):
+    analysis = db.query(DocumentAnalysis).filter_by(document_id=document_id).one_or_none()
+    return (
+        [(block.page_number, block.text_content, block.x0, block.y0, block.font_name, block.block_type)
+         for block in db.query(TextBlock).filter_by(document_id=document_id).order_by(TextBlock.id)],
+        analysis.analysis_data if analysis is not None else None,
+        [(stat.font_name, stat.font_size, stat.occurrence_count, stat.is_bold)
+         for stat in db.query(StyleStatistics).filter_by(document_id=document_id).order_by(StyleStatistics.id)],
+        [(page.page_number, page.span_count, bytes(page.rects))
+         for page in db.query(PageStyleSpans).filter_by(document_id=document_id).order_by(PageStyleSpans.id)],
+    )
+
+def test_copy_reuses_result(Session, tmp_path):
+    _write_pdf(tmp_path / "a.pdf")
+    _process("a.pdf", "analysis")
+    shutil.copy(tmp_path / "a.pdf", tmp_path / "b.pdf")
+    _process("b.pdf", "analysis")
+    original, copy = _documents(Session)
+    assert (copy.file_name, copy.file_hash, copy.extractor_version) == \
+        ("b.pdf", original.file_hash, EXTRACTOR_VERSION)
+    assert (copy.file_ctime, copy.file_mtime) == \
+        (os.stat(tmp_path / "b.pdf").st_ctime, os.stat(tmp_path / "b.pdf").st_mtime)
+
+    db = Session()
+    blocks, analysis, stats, spans = _rows(db, copy.id)
+    assert blocks and stats and spans
+    assert (blocks, analysis, stats, spans) == _rows(db, original.id)
+    db.close()
+    # Recorded, so the copy now matches on stat() alone
+    _process("b.pdf", "analysis")
+    assert len(_documents(Session)) == 2
+
+def test_touched_file_is_matched_by_hash_and_recorded(Session, tmp_path):
+    path = _write_pdf(tmp_path / "a.pdf")
+    _process("a.pdf")
+    os.utime(path, (1_000_000, 1_000_000))
+    existing, fingerprint = process_pdf.find_existing_document(path, "dict")
+    assert existing is not None and fingerprint is not None
+    [document] = _documents(Session)
+    assert (document.file_mtime, document.file_ctime) == (1_000_000, os.stat(path).st_ctime)
+    # Found on stat() alone now, without hashing
+    existing, fingerprint = process_pdf.find_existing_document(path, "dict")
+    assert (existing.id, fingerprint) == (document.id, None)
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 9)
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_rounded(item) for item in value)
+    return value
+
+@pytest.mark.parametrize("strategies", [["analysis"], ["analysis", "dict"]])
+def test_batched_save_equals_one_shot_save(Session, tmp_path, strategies):
+    path = _write_pdf(tmp_path / "a.pdf", pages=7)
+    db = Session()
+    one_shot = []
+    for strategy in strategies:
+        result = PDFProcessor(path, strategy).process_document()
+        one_shot.append(save_result(db, *result).id)
+    db.commit()
+    batched = [document.id for document in save_batches(db, PDFProcessor(path, strategies[0]), strategies, 2)]
+    for strategy, one_shot_id, batched_id in zip(strategies, one_shot, batched):
+        expected = _rows(db, one_shot_id)
+        assert expected[0] and (strategy != "analysis" or expected[2] and expected[3])
+        # Batches merge their running statistics, which may round differently
+        assert _rounded(_rows(db, batched_id)) == _rounded(expected)
+        assert db.get(Document, batched_id).extractor_version == EXTRACTOR_VERSION
+    db.close()
+
+def test_failed_batch_removes_partial_documents(Session, tmp_path, monkeypatch):
+    path = _write_pdf(tmp_path / "a.pdf", pages=7)
+    extract_range = PDFProcessor._extract_range
+
+    def fail_late(self, start, stop, strategy_names):
+        if start >= 4:
+            raise RuntimeError("extraction failed")
+        return extract_range(self, start, stop, strategy_names)
+
+    monkeypatch.setattr(PDFProcessor, "_extract_range", fail_late)
+    stored = []
+
+    def progress(done, total):
+        # Earlier batches are committed, so another session sees them
+        db = Session()
+        stored.append(db.query(TextBlock).count())
+        db.close()
+
+    db = Session()
+    with pytest.raises(RuntimeError, match="extraction failed"):
+        save_batches(db, PDFProcessor(path, "analysis"), ["analysis", "dict"], 2, progress=progress)
+    db.close()
+    assert len(stored) == 2 and 0 < stored[0] < stored[1]
+    db = Session()
+    for model in (Document, TextBlock, DocumentAnalysis, StyleStatistics, PageStyleSpans):
+        assert db.query(model).count() == 0
+    db.close()
+
+def _killed_save(url, path):
+    db = sessionmaker(bind=create_engine(url))()
+
+    def die(done, total):
+        # Neither except nor finally runs, as with SIGKILL or the OOM killer
+        os._exit(1)
+
+    save_batches(db, PDFProcessor(path, "analysis"), ["analysis"], 2, progress=die)
+
+def test_sweep_removes_documents_of_abandoned_saves(Session, tmp_path):
+    _write_pdf(tmp_path / "done.pdf")
+    _process("done.pdf")
+    path = _write_pdf(tmp_path / "a.pdf", pages=5)
+    db = Session()
+    db.add(Document(file_path=str(tmp_path / "legacy.pdf"), file_name="legacy.pdf",
+                    strategy=_labels("dict")[0], processed_at=datetime(2020, 1, 1)))
+    db.commit()
+    child = multiprocessing.get_context("fork").Process(
+        target=_killed_save, args=(str(db.get_bind().url), path)
+    )
+    child.start()
+    child.join()
+    assert child.exitcode == 1
+    abandoned = db.query(Document).filter_by(file_name="a.pdf").one()
+    assert abandoned.extractor_version is None
+    abandoned_id, stamped = abandoned.id, abandoned.processed_at
+    assert db.query(TextBlock).filter_by(document_id=abandoned_id).count() > 0
+
+    # The last batch was committed just now, so the save may still be running
+    assert sweep_partial_documents(db, stamped - timedelta(seconds=1)) == []
+    assert sweep_partial_documents(db, datetime.now() + timedelta(seconds=1)) == [abandoned_id]
+    db.close()
+    # Finished documents and those from before fingerprints were stored stay
+    assert [document.file_name for document in _documents(Session)] == ["done.pdf", "legacy.pdf"]
+    db = Session()
+    for model in (TextBlock, StyleStatistics, PageStyleSpans, DocumentAnalysis):
+        assert db.query(model).filter(model.document_id == abandoned_id).count() == 0
+    db.close()
+
+def test_worker_pool_matches_sequential_processing(Session, tmp_path):
+    for index, word in enumerate(["Alpha", "Beta", "Gamma"]):
+        _write_pdf(tmp_path / f"{index}.pdf", word=word, pages=3)
+    (tmp_path / "broken.pdf").write_bytes(b"not a pdf")
+    names = ["0.pdf", "1.pdf", "broken.pdf", "2.pdf"]
+
+    results = dict(process_pdf.process_all_pdfs(names, "analysis", workers=2))
+    # Every file is reported to the parent, the broken one with its error
+    assert set(results) == set(names)
+    assert results["broken.pdf"] and not any(results[name] for name in names if name != "broken.pdf")
+    pooled = {document.file_name: document.id for document in _documents(Session)}
+    assert set(pooled) == {"0.pdf", "1.pdf", "2.pdf"}
+
+    # The same files again, one after the other in this process
+    sequential_results = process_pdf.process_all_pdfs(names, "analysis", force=True)
+    assert [name for name, error in sequential_results if error] == ["broken.pdf"]
+    sequential = {document.file_name: document.id for document in _documents(Session)
+                  if document.id not in pooled.values()}
+    db = Session()
+    for name, document_id in pooled.items():
+        assert _rows(db, document_id)[0]
+        assert _rows(db, document_id) == _rows(db, sequential[name])
+    db.close()
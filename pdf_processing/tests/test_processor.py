@@ -0,0 +1,111 @@
+import random
+import fitz
+import pytest
+from src.pdf_processing.extraction import sort_words
+from src.pdf_processing.processor import PDFProcessor
+
+PAGES = 9
+
+@pytest.fixture(scope="module")
+def pdf_path(tmp_path_factory):
+    """Headings, body text and footnotes in several fonts over a few pages"""
+    path = str(tmp_path_factory.mktemp("pdf") / "doc.pdf")
+    doc = fitz.open()
+    for page_number in range(PAGES):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Kapitel {page_number}", fontsize=16, fontname="hebo")
+        page.insert_text((72, 110), f"Text auf Seite {page_number}", fontsize=10)
+        page.insert_text((72, 130), "Noch eine Zeile mit mehreren Wörtern", fontsize=10)
+        if page_number % 3 == 2:
+            page.insert_text((72, 780), f"Fußnote {page_number}", fontsize=8, fontname="heit", color=(0.4, 0, 0))
+    doc.save(path)
+    doc.close()
+    return path
+
+def _rounded(value):
+    # Merged running statistics may round differently in the last bits
+    if isinstance(value, float):
+        return round(value, 9)
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_rounded(item) for item in value)
+    return value
+
+def _comparable(result):
+    """A processing result as plain values, without ids or timestamps"""
+    document, text_blocks = result[:2]
+    rows = [
+        document.strategy,
+        [(b.page_number, b.text_content, b.x0, b.y0, b.x1, b.y1, b.font_size, b.font_name, b.font_color, b.block_type)
+         for b in text_blocks],
+    ]
+    if len(result) > 2:
+        document_analysis, style_stats, style_spans = result[2:]
+        rows.append(_rounded(document_analysis.analysis_data))
+        rows.append([(s.font_name, s.font_size, s.font_color, s.is_bold, s.is_italic, s.occurrence_count,
+                      _rounded(s.page_distribution)) for s in style_stats])
+        rows.append([(p.page_number, p.span_count, bytes(p.rects)) for p in style_spans])
+    return rows
+
+@pytest.mark.parametrize("strategy", sorted(PDFProcessor.STRATEGIES))
+def test_sharded_extraction_matches_serial(pdf_path, strategy):
+    serial = _comparable(PDFProcessor(pdf_path, strategy).process_document())
+    assert serial[1] and (strategy != "analysis" or serial[3] and serial[4])
+    reported = []
+    sharded = PDFProcessor(pdf_path, strategy).process_document(
+        workers=4, progress=lambda done, total: reported.append((done, total))
+    )
+    assert _comparable(sharded) == serial
+    # Progress arrives shard by shard, in page order, up to the last page
+    assert reported == sorted(reported) and reported[-1] == (PAGES, PAGES)
+
+@pytest.mark.parametrize("strategy", sorted(PDFProcessor.STRATEGIES))
+def test_typed_bbox_columns_match_the_json_bbox(pdf_path, strategy):
+    text_blocks = PDFProcessor(pdf_path, strategy).process_document()[1]
+    assert text_blocks
+    for block in text_blocks:
+        assert block.bbox_coordinates == {"x0": block.x0, "y0": block.y0, "x1": block.x1, "y1": block.y1}
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_single_pass_matches_separate_runs(pdf_path, workers):
+    strategies = sorted(PDFProcessor.STRATEGIES)
+    separate = [_comparable(PDFProcessor(pdf_path, strategy).process_document()) for strategy in strategies]
+    fused = PDFProcessor(pdf_path, strategies[0]).process_strategies(strategies, workers=workers)
+    assert [_comparable(result) for result in fused] == separate
+
+def _fitz_sort(words, tolerance=3):
+    """PyMuPDF's line-wise word sort of get_text("words", sort=True), on fitz.Rect"""
+    words = sorted(words, key=lambda w: (w[3], w[0]))
+    sorted_words = []
+    line = [words[0]]
+    line_rect = fitz.Rect(words[0][:4])
+    for word in words[1:]:
+        rect = fitz.Rect(word[:4])
+        if abs(rect.y0 - line_rect.y0) <= tolerance or abs(rect.y1 - line_rect.y1) <= tolerance:
+            line.append(word)
+            line_rect |= rect
+        else:
+            line.sort(key=lambda w: w[0])
+            sorted_words.extend(line)
+            line = [word]
+            line_rect = rect
+    line.sort(key=lambda w: w[0])
+    sorted_words.extend(line)
+    return sorted_words
+
+def test_sort_words_matches_pymupdf(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            assert sort_words(page.get_text("words")) == page.get_text("words", sort=True)
+
+    rng = random.Random(7)
+    for _ in range(500):
+        words = []
+        for index in range(rng.randint(1, 30)):
+            x0, y0 = rng.uniform(0, 500), rng.choice([100, 102.5, 104, 110, 111]) + rng.uniform(-2, 2)
+            # Some words have empty boxes, which the line union skips
+            width, height = rng.choice([0, -1, rng.uniform(1, 60)]), rng.choice([0, rng.uniform(5, 14)])
+            words.append((x0, y0, x0 + width, y0 + height, f"w{index}", 0, 0, index))
+        assert sort_words(list(words)) == _fitz_sort(words)
+    assert sort_words([]) == []
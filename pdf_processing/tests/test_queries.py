@@ -0,0 +1,197 @@
+import asyncio
+from datetime import datetime
+import re
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from src.database import queries
+from src.database.models import Base
+from scripts.benchmark import _plan_uses_index, seed_corpus
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queries.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_documents_before_pages_through_every_document(db):
+    document_ids = seed_corpus(db, 7, 1, 1)
+    db.commit()
+    seen = []
+    before = None
+    while True:
+        page = db.execute(queries.documents_before(before, 3)).scalars().all()
+        seen.extend(document.id for document in page)
+        if len(page) < 3:
+            break
+        before = page[-1].id
+    assert seen == sorted(document_ids, reverse=True)
+
+def test_endpoint_queries_use_indexes(db):
+    document_ids = seed_corpus(db, 50, 5, 5)
+    db.execute(text("ANALYZE"))
+    for name, statement in queries.endpoint_queries(document_ids[len(document_ids) // 2]):
+        uses_index, plan = _plan_uses_index(db, statement)
+        assert uses_index, f"{name}: {plan}"
+
+def test_document_list_links_older_pages(db, monkeypatch):
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database.connection import get_async_db
+    from src.web.app import app
+
+    document_ids = seed_corpus(db, 5, 1, 1)
+    db.commit()
+    async_engine = create_async_engine(db.get_bind().url.set(drivername="sqlite+aiosqlite"))
+    AsyncSession = async_sessionmaker(async_engine)
+
+    async def test_db():
+        async with AsyncSession() as session:
+            yield session
+
+    monkeypatch.setattr("src.web.app.DOCUMENT_LIST_PAGE_SIZE", 3)
+    app.dependency_overrides[get_async_db] = test_db
+    try:
+        client = TestClient(app)
+        first = client.get("/").text
+        older = client.get("/", params={"before": document_ids[2]}).text
+    finally:
+        del app.dependency_overrides[get_async_db]
+        asyncio.run(async_engine.dispose())
+
+    listed = lambda html: [int(i) for i in re.findall(r'href="/view/(\d+)"', html)]
+    assert listed(first) == document_ids[:1:-1]
+    assert f'href="/?before={document_ids[2]}"' in first
+    assert listed(older) == document_ids[1::-1]
+    assert "/?before=" not in older
+
+def test_pending_upload_is_listed_as_pending(db):
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database.connection import get_async_db
+    from src.database.jobs import PENDING_STRATEGY
+    from src.database.models import Document
+    from src.web.app import app
+
+    [processed_id] = seed_corpus(db, 1, 1, 1)
+    upload = Document(file_path="upload.pdf", processed_at=datetime.now(), file_name="upload.pdf",
+                      strategy=PENDING_STRATEGY)
+    db.add(upload)
+    db.commit()
+    async_engine = create_async_engine(db.get_bind().url.set(drivername="sqlite+aiosqlite"))
+    AsyncSession = async_sessionmaker(async_engine)
+
+    async def test_db():
+        async with AsyncSession() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = test_db
+    try:
+        client = TestClient(app)
+        listing = client.get("/").text
+        viewed = client.get(f"/view/{upload.id}")
+    finally:
+        del app.dependency_overrides[get_async_db]
+        asyncio.run(async_engine.dispose())
+
+    assert re.findall(r'href="/view/(\d+)"', listing) == [str(processed_id)]
+    assert "upload.pdf" in listing and "Pending processing" in listing
+    assert viewed.status_code == 409
+    assert f"/documents/{upload.id}/process" in viewed.json()["detail"]
+
+def test_page_windows_match_the_full_document(db):
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database.connection import get_async_db
+    from src.database.models import Document, TextBlock
+    from src.database.persistence import save_result
+    from src.web.app import app
+
+    # Pages without text are skipped; blocks are stored out of reading order
+    document = Document(file_path="a.pdf", processed_at=datetime.now(), file_name="a.pdf", strategy="test")
+    save_result(db, document, [
+        TextBlock(page_number=page, text_content=f"Seite {page} Zeile {line}", x0=72.0, y0=60.0 + line * 14,
+                  x1=500.0, y1=72.0 + line * 14, font_size=11.0, font_name="Helvetica", font_color="#000000",
+                  block_type="body")
+        for page in (7, 1, 2, 5, 4) for line in (2, 0, 1)
+    ])
+    db.commit()
+    # What /view/{id} used to render: every block, grouped by page
+    expected = {}
+    for block in db.query(TextBlock).filter(TextBlock.document_id == document.id)\
+            .order_by(TextBlock.page_number, TextBlock.y0):
+        expected.setdefault(block.page_number, []).append((block.id, block.text_content))
+
+    async_engine = create_async_engine(db.get_bind().url.set(drivername="sqlite+aiosqlite"))
+    AsyncSession = async_sessionmaker(async_engine)
+
+    async def test_db():
+        async with AsyncSession() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = test_db
+    try:
+        client = TestClient(app)
+        windows = []
+        after_page = 0
+        while after_page is not None:
+            body = client.get(f"/api/documents/{document.id}/pages",
+                              params={"after_page": after_page, "limit": 2}).json()
+            windows.append([page["page_number"] for page in body["pages"]])
+            pages = {page["page_number"]: [(b["id"], b["text_content"]) for b in page["blocks"]]
+                     for page in body["pages"]}
+            assert pages == {page: expected[page] for page in pages}
+            after_page = body["next_after_page"]
+        missing = client.get("/api/documents/999999/pages")
+    finally:
+        del app.dependency_overrides[get_async_db]
+        asyncio.run(async_engine.dispose())
+
+    assert windows == [[1, 2], [4, 5], [7]]
+    assert missing.status_code == 404
+
+def _values(row):
+    return tuple(
+        {column.name: getattr(item, column.name) for column in item.__table__.columns}
+        if hasattr(item, "__table__") else item
+        for item in row
+    )
+
+def test_async_session_returns_what_the_sync_session_did(db):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database.connection import async_url
+    from src.database.search import search_text_blocks, search_text_blocks_async
+
+    document_ids = seed_corpus(db, 4, 6, 3)
+    db.commit()
+    document_id = document_ids[1]
+    statements = queries.endpoint_queries(document_id)
+    expected = [[_values(row) for row in db.execute(statement).all()] for _, statement in statements]
+    assert all(expected[:6])
+    expected_search = search_text_blocks(db, "seite", limit=10, document_id=document_id)
+
+    async def run():
+        async_engine = create_async_engine(async_url(str(db.get_bind().url)))
+        try:
+            async with async_sessionmaker(async_engine)() as session:
+                rows = [[_values(row) for row in (await session.execute(statement)).all()]
+                        for _, statement in statements]
+                found = await search_text_blocks_async(session, "seite", limit=10, document_id=document_id)
+                return rows, found
+        finally:
+            await async_engine.dispose()
+
+    rows, found = asyncio.run(run())
+    assert rows == expected
+    assert found == expected_search and found["results"]
+
+def test_async_url_swaps_the_driver():
+    from src.database.connection import async_url
+    assert async_url("postgresql://user:secret@db/pdfs") == "postgresql+asyncpg://user:secret@db/pdfs"
+    assert async_url("postgresql+psycopg2://db/pdfs") == "postgresql+asyncpg://db/pdfs"
+    assert async_url("sqlite:////tmp/pdfs.db") == "sqlite+aiosqlite:////tmp/pdfs.db"
+    with pytest.raises(ValueError):
+        async_url("mysql://db/pdfs")
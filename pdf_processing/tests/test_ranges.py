@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from src.web.ranges import RangeNotSatisfiable, file_response, parse_range_header, tail_file
+
+SIZE = 1000
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=950-", [(950, 999)]),
+    ("bytes=900-2000", [(900, 999)]),
+    # Suffix ranges: the last N bytes, all of them if N exceeds the size
+    ("bytes=-100", [(900, 999)]),
+    ("bytes=-5000", [(0, 999)]),
+    # Overlapping and adjacent ranges merge; order does not matter
+    ("bytes=0-10,5-20,21-30,100-110", [(0, 30), (100, 110)]),
+    ("bytes=500-599, 0-9", [(0, 9), (500, 599)]),
+    ("bytes=0-9,-10", [(0, 9), (990, 999)]),
+    # Unsatisfiable parts are dropped as long as one range remains
+    ("bytes=0-9,5000-6000", [(0, 9)]),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, SIZE) == expected
+
+@pytest.mark.parametrize("header", ["items=0-9", "bytes=", "bytes=abc", "bytes=5-1", "bytes=0-x", "bytes=10"])
+def test_parse_range_header_ignores_malformed(header):
+    assert parse_range_header(header, SIZE) is None
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=2000-3000", "bytes=-0"])
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header(header, SIZE)
+
+@pytest.fixture
+def content(tmp_path):
+    return bytes(range(256)) * 4  # 1024 bytes
+
+@pytest.fixture
+def client(tmp_path, content):
+    path = tmp_path / "document.pdf"
+    path.write_bytes(content)
+    app = FastAPI()
+
+    @app.api_route("/file", methods=["GET", "HEAD"])
+    def serve(request: Request):
+        return file_response(request, str(path), media_type="application/pdf")
+
+    return TestClient(app)
+
+def test_full_response(client, content):
+    response = client.get("/file")
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(content))
+
+def test_single_range(client, content):
+    response = client.get("/file", headers={"Range": "bytes=-24"})
+    assert response.status_code == 206
+    assert response.content == content[-24:]
+    assert response.headers["content-range"] == f"bytes 1000-1023/{len(content)}"
+    assert response.headers["content-length"] == "24"
+
+def test_unsatisfiable_range(client, content):
+    response = client.get("/file", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(content)}"
+
+def test_malformed_range_serves_whole_file(client, content):
+    response = client.get("/file", headers={"Range": "bytes=oops"})
+    assert response.status_code == 200
+    assert response.content == content
+
+def test_if_range(client, content):
+    etag = client.get("/file").headers["etag"]
+    matching = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert matching.status_code == 206
+    assert matching.content == content[:10]
+    stale = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == content
+
+@pytest.mark.parametrize("make_tag", [lambda etag: etag, lambda etag: f"W/{etag}",
+                                      lambda etag: f'"other", {etag}', lambda etag: "*"])
+def test_if_none_match(client, make_tag):
+    first = client.get("/file")
+    response = client.get("/file", headers={"If-None-Match": make_tag(first.headers["etag"])})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == first.headers["etag"]
+
+def test_if_none_match_other_tag(client):
+    assert client.get("/file", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_if_modified_since(client):
+    last_modified = client.get("/file").headers["last-modified"]
+    assert client.get("/file", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/file", headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}).status_code == 200
+
+def test_multipart_ranges(client, content):
+    response = client.get("/file", headers={"Range": "bytes=0-9,100-119,-4"})
+    assert response.status_code == 206
+    media_type, _, boundary = response.headers["content-type"].partition("; boundary=")
+    assert media_type == "multipart/byteranges"
+    assert response.headers["content-length"] == str(len(response.content))
+
+    body = response.content
+    assert body.endswith(f"\r\n--{boundary}--\r\n".encode())
+    parts = body[:-len(f"\r\n--{boundary}--\r\n")].split(f"--{boundary}\r\n".encode())[1:]
+    expected = [(0, 9), (100, 119), (1020, 1023)]
+    assert len(parts) == len(expected)
+    for part, (start, end) in zip(parts, expected):
+        headers, _, data = part.partition(b"\r\n\r\n")
+        assert f"Content-Range: bytes {start}-{end}/{len(content)}".encode() in headers
+        assert data.removesuffix(b"\r\n") == content[start:end + 1]
+
+def test_head_multipart_has_length_but_no_body(client):
+    get = client.get("/file", headers={"Range": "bytes=0-9,100-119"})
+    head = client.head("/file", headers={"Range": "bytes=0-9,100-119"})
+    assert head.status_code == 206
+    assert head.content == b""
+    # The boundary is random per response, and has a fixed length
+    assert head.headers["content-length"] == get.headers["content-length"]
+
+def _append_in_thread(path, parts, future, error=None):
+    """Append parts to path with pauses, like a render worker, then settle future"""
+    def write():
+        for part in parts:
+            with open(path, "ab") as f:
+                f.write(part)
+            time.sleep(0.01)
+        if error is None:
+            future.set_result(str(path))
+        else:
+            future.set_exception(error)
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+async def _tail(path, future, received):
+    async for chunk in tail_file(str(path), asyncio.wrap_future(future), chunk_size=100, poll_seconds=0.001):
+        received.append(chunk)
+
+def test_tail_file_yields_the_final_bytes_while_appending(tmp_path):
+    path = tmp_path / "growing.pdf"
+    path.write_bytes(b"")
+    parts = [bytes([i]) * (37 * i + 1) for i in range(40)]
+    future, received = Future(), []
+    thread = _append_in_thread(path, parts, future)
+    asyncio.run(_tail(path, future, received))
+    thread.join()
+    # Read in several pieces before the writer finished
+    assert len(received) > 1
+    assert b"".join(received) == b"".join(parts) == path.read_bytes()
+
+def test_tail_file_raises_the_writers_error_after_its_bytes(tmp_path):
+    path = tmp_path / "growing.pdf"
+    path.write_bytes(b"")
+    future, received = Future(), []
+    thread = _append_in_thread(path, [b"a" * 150, b"b" * 50], future, RuntimeError("render failed"))
+    with pytest.raises(RuntimeError, match="render failed"):
+        asyncio.run(_tail(path, future, received))
+    thread.join()
+    assert b"".join(received) == b"a" * 150 + b"b" * 50
+
+def test_tail_file_gives_up_on_a_stalled_writer(tmp_path):
+    path = tmp_path / "growing.pdf"
+    path.write_bytes(b"a" * 150)
+    # Never settled, like a rendering that hangs
+    future, received = Future(), []
+
+    async def tail():
+        async for chunk in tail_file(str(path), asyncio.wrap_future(future), chunk_size=100,
+                                     poll_seconds=0.001, idle_timeout=0.05):
+            received.append(chunk)
+
+    with pytest.raises(TimeoutError, match="not grown"):
+        asyncio.run(tail())
+    assert b"".join(received) == b"a" * 150
+
+def test_tail_file_gives_up_on_a_stalled_reader(tmp_path):
+    path = tmp_path / "growing.pdf"
+    path.write_bytes(b"a" * 150)
+    future, received = Future(), []
+
+    async def tail():
+        async for chunk in tail_file(str(path), asyncio.wrap_future(future), chunk_size=100,
+                                     poll_seconds=0.001, idle_timeout=0.05):
+            received.append(chunk)
+            await asyncio.sleep(0.1)
+
+    with pytest.raises(TimeoutError, match="took no data"):
+        asyncio.run(tail())
+    assert received == [b"a" * 100]
@@ -0,0 +1,56 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from src.web.render_pool import RenderPool
+
+def _wait_for(path: str) -> str:
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    return path
+
+def _die():
+    os._exit(1)
+
+def _until(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(max_workers=1, max_pending=8, timeout=30)
+    yield pool
+    pool.shutdown()
+
+def test_metrics_count_jobs_executing_in_workers(pool, tmp_path):
+    release = str(tmp_path / "release")
+    futures = [pool.submit(_wait_for, release) for _ in range(3)]
+    try:
+        _until(lambda: pool.metrics()["running"] >= 1)
+        # The executor hands a second job to its call queue early; it is not running
+        time.sleep(0.2)
+        metrics = pool.metrics()
+        assert (metrics["in_flight"], metrics["running"], metrics["queued"]) == (3, 1, 2)
+    finally:
+        open(release, "w").close()
+    assert [future.result(timeout=30) for future in futures] == [release] * 3
+    _until(lambda: pool.metrics()["in_flight"] == 0)
+    metrics = pool.metrics()
+    assert (metrics["running"], metrics["queued"], metrics["completed"]) == (0, 0, 3)
+
+def test_broken_pool_is_shut_down_and_replaced(pool, tmp_path):
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(_die).result(timeout=30)
+    broken = pool._executor
+    shutdowns = []
+    shutdown = broken.shutdown
+    broken.shutdown = lambda **kwargs: shutdowns.append(kwargs) or shutdown(**kwargs)
+
+    path = str(tmp_path / "ready")
+    open(path, "w").close()
+    assert pool.submit(_wait_for, path).result(timeout=30) == path
+    assert pool._executor is not broken
+    assert shutdowns and shutdowns[0]["wait"] is False
+    assert pool.metrics()["failed"] == 1
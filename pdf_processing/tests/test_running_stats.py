@@ -0,0 +1,58 @@
+import random
+import statistics
+import pytest
+from src.pdf_processing.text_analysis import RunningStats
+
+def _stats(values):
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    return stats
+
+def test_add_matches_statistics():
+    rng = random.Random(1)
+    values = [rng.uniform(-50, 500) for _ in range(200)] + [3.5, 7.25, 7.25, 100.0, -2.0]
+    stats = _stats(values)
+    assert stats.count == len(values)
+    assert stats.min == min(values)
+    assert stats.max == max(values)
+    assert stats.mean == pytest.approx(statistics.fmean(values))
+    assert stats.stdev() == pytest.approx(statistics.stdev(values))
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merge_equals_sequential(seed):
+    rng = random.Random(seed)
+    values = [rng.gauss(400, 30) for _ in range(rng.randint(2, 300))]
+    cuts = sorted(rng.sample(range(len(values) + 1), 3))
+    parts = [values[:cuts[0]], values[cuts[0]:cuts[1]], values[cuts[1]:cuts[2]], values[cuts[2]:]]
+
+    merged = RunningStats()
+    for part in parts:  # some parts may be empty
+        merged.merge(_stats(part))
+    sequential = _stats(values)
+
+    assert merged.count == sequential.count
+    assert (merged.min, merged.max) == (sequential.min, sequential.max)
+    assert merged.mean == pytest.approx(sequential.mean, rel=1e-12)
+    assert merged.stdev() == pytest.approx(sequential.stdev(), rel=1e-9)
+
+def test_merge_with_empty():
+    stats = _stats([1.0, 2.0, 4.0])
+    assert stats.merge(RunningStats()) is stats
+    assert (stats.count, stats.mean) == (3, pytest.approx(7 / 3))
+
+    empty = RunningStats().merge(stats)
+    assert (empty.count, empty.min, empty.max, empty.mean, empty.m2) == \
+        (stats.count, stats.min, stats.max, stats.mean, stats.m2)
+
+def test_from_summary_merges_like_added_values():
+    left, right = [1.0, 5.0, 9.0], [2.0, 2.5]
+    mean = statistics.fmean(right)
+    summary = RunningStats.from_summary(len(right), min(right), max(right), mean,
+                                        sum((v - mean) ** 2 for v in right))
+    merged = _stats(left).merge(summary)
+    assert merged.stdev() == pytest.approx(statistics.stdev(left + right))
+
+def test_stdev_of_fewer_than_two_values():
+    assert RunningStats().stdev() == 0.0
+    assert _stats([3.0]).stdev() == 0.0
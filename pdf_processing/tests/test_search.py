@@ -0,0 +1,178 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from src.database.models import Base, Document, TextBlock
+from src.database.persistence import bulk_insert_text_blocks
+from src.database.search import search_text_blocks, supports_search
+
+def _block(page_number, text_content):
+    return TextBlock(page_number=page_number, text_content=text_content, x0=72.0, y0=100.0, x1=500.0, y1=112.0,
+                     font_size=11.0, font_name="Helvetica", font_color="#000000", block_type="body")
+
+def _document(db, name, blocks):
+    document = Document(file_path=name, processed_at=datetime.now(), file_name=name, strategy="test")
+    db.add(document)
+    db.flush()
+    bulk_insert_text_blocks(db, document.id, blocks)
+    return document
+
+def _hits(db, query, **kwargs):
+    return search_text_blocks(db, query, **kwargs)["results"]
+
+@pytest.fixture
+def db(tmp_path):
+    # A real database file built by create_all, as a SQLite deployment would have
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+def test_create_all_builds_the_index(db):
+    tables = db.execute(text("SELECT name FROM sqlite_master WHERE name LIKE 'text_blocks_fts%'")).scalars().all()
+    assert "text_blocks_fts" in tables
+    # Running it again on an existing database is harmless
+    Base.metadata.create_all(db.get_bind())
+
+def test_search_ranks_and_locates_hits(db):
+    first = _document(db, "a.pdf", [
+        _block(1, "Einleitung in die Verwaltung"),
+        _block(2, "Die Verwaltung der Verwaltung und ihre Verwaltung"),
+        _block(3, "Anhang ohne Treffer"),
+    ])
+    second = _document(db, "b.pdf", [_block(7, "Kurze Verwaltung")])
+    db.commit()
+
+    hits = _hits(db, "verwaltung")
+    assert {hit["document_id"] for hit in hits} == {first.id, second.id}
+    assert len(hits) == 3
+    assert hits[0]["text_content"] == "Die Verwaltung der Verwaltung und ihre Verwaltung"
+    assert hits[0]["file_name"] == "a.pdf"
+    assert hits[0]["page_number"] == 2
+    assert hits[0]["bbox"] == {"x0": 72.0, "y0": 100.0, "x1": 500.0, "y1": 112.0}
+    assert [hit["rank"] for hit in hits] == sorted((hit["rank"] for hit in hits), reverse=True)
+
+    assert [hit["page_number"] for hit in _hits(db, "verwaltung", document_id=second.id)] == [7]
+    assert len(_hits(db, "verwaltung", limit=1)) == 1
+    assert _hits(db, "fehlt") == []
+
+def test_search_ranks_the_newest_candidates(db, monkeypatch):
+    # The best block is stored first, behind many weaker matches
+    oldest = _document(db, "a.pdf", [_block(1, "Verwaltung Verwaltung")])
+    _document(db, "b.pdf", [_block(1, f"Verwaltung und anderer Text Nummer {i}") for i in range(500)])
+    db.commit()
+    found = search_text_blocks(db, "verwaltung", limit=1)
+    assert found["results"][0]["document_id"] == oldest.id
+    assert not found["truncated"]
+
+    monkeypatch.setattr("src.database.search.SEARCH_MAX_CANDIDATES", 100)
+    found = search_text_blocks(db, "verwaltung", limit=500)
+    # The cap never returns fewer hits than asked for
+    assert len(found["results"]) == 500
+    assert oldest.id not in {hit["document_id"] for hit in found["results"]}
+    assert found["truncated"]
+    assert found["max_ranked_matches"] == 500
+    # Exactly the cap's worth of matches is not truncated
+    assert not search_text_blocks(db, "verwaltung", limit=501)["truncated"]
+    newest = _hits(db, "verwaltung", limit=100)
+    assert [hit["text_content"] for hit in newest] == \
+        [f"Verwaltung und anderer Text Nummer {i}" for i in range(400, 500)]
+    # A better match among the newest blocks comes first
+    best = _document(db, "c.pdf", [_block(3, "Verwaltung Verwaltung")])
+    db.commit()
+    assert _hits(db, "verwaltung", limit=1)[0]["document_id"] == best.id
+    # Within one document the cap counts that document's matches
+    found = search_text_blocks(db, "verwaltung", limit=1, document_id=oldest.id)
+    assert found["results"][0]["document_id"] == oldest.id
+    assert not found["truncated"]
+
+def test_search_ranks_like_bm25(db):
+    # Every match is ranked while there are fewer than the cap
+    texts = ["Verwaltung", "Verwaltung der Verwaltung", "Text über die Verwaltung und noch viel mehr anderen Text",
+             "Verwaltung Verwaltung Verwaltung", "nur anderer Text"]
+    _document(db, "a.pdf", [_block(page, content) for page, content in enumerate(texts, 1)])
+    db.commit()
+    expected = db.execute(text(
+        "SELECT rowid FROM text_blocks_fts WHERE text_blocks_fts MATCH 'verwaltung' "
+        "ORDER BY bm25(text_blocks_fts), rowid"
+    )).scalars().all()
+    assert [hit["text_block_id"] for hit in _hits(db, "verwaltung")] == expected
+
+def test_search_input_is_not_query_syntax(db):
+    _document(db, "a.pdf", [_block(1, 'Er sagte "Hallo" AND ging NEAR(weg)')])
+    db.commit()
+    assert _hits(db, "   ") == []
+    assert len(_hits(db, 'hallo" OR "x')) == 0
+    assert len(_hits(db, "NEAR(weg)")) == 1
+    assert len(_hits(db, "AND")) == 1
+
+def test_index_follows_updates_and_deletes(db):
+    document = _document(db, "a.pdf", [_block(1, "alter Text")])
+    db.commit()
+    block = db.query(TextBlock).filter_by(document_id=document.id).one()
+    block.text_content = "neuer Text"
+    db.commit()
+    assert _hits(db, "alter") == []
+    assert len(_hits(db, "neuer")) == 1
+    db.delete(block)
+    db.commit()
+    assert _hits(db, "neuer") == []
+
+def test_unsupported_dialect():
+    assert supports_search("postgresql") and supports_search("sqlite")
+    assert not supports_search("mysql")
+
+def test_search_endpoint_rejects_unsupported_dialect():
+    from fastapi.testclient import TestClient
+    from src.database.connection import get_async_db
+    from src.web.app import app
+
+    # A session on a dialect without a search implementation
+    engine = create_engine("sqlite://")
+    engine.dialect.name = "mysql"
+
+    async def unsupported_db():
+        yield sessionmaker(bind=engine)()
+
+    app.dependency_overrides[get_async_db] = unsupported_db
+    try:
+        response = TestClient(app).get("/search", params={"q": "verwaltung"})
+    finally:
+        del app.dependency_overrides[get_async_db]
+        engine.dispose()
+    assert response.status_code == 501
+
+def test_search_endpoint_reports_truncation(db, monkeypatch):
+    import asyncio
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from src.database.connection import get_async_db
+    from src.web.app import app
+
+    _document(db, "a.pdf", [_block(1, f"Verwaltung {i}") for i in range(5)])
+    db.commit()
+    async_engine = create_async_engine(db.get_bind().url.set(drivername="sqlite+aiosqlite"))
+    AsyncSession = async_sessionmaker(async_engine)
+
+    async def test_db():
+        async with AsyncSession() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = test_db
+    try:
+        client = TestClient(app)
+        complete = client.get("/search", params={"q": "verwaltung"}).json()
+        monkeypatch.setattr("src.database.search.SEARCH_MAX_CANDIDATES", 3)
+        body = client.get("/search", params={"q": "verwaltung", "limit": 2}).json()
+    finally:
+        del app.dependency_overrides[get_async_db]
+        asyncio.run(async_engine.dispose())
+    assert complete["truncated"] is False and complete["notice"] is None
+    assert body["truncated"] is True
+    assert body["max_ranked_matches"] == 3
+    assert "Only the newest 3 matching text blocks were ranked" in body["notice"]
+    # Only the three newest blocks were ranked
+    assert len(body["results"]) == 2
+    assert {hit["text_content"] for hit in body["results"]} <= {"Verwaltung 2", "Verwaltung 3", "Verwaltung 4"}
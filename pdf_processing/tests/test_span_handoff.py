@@ -0,0 +1,50 @@
+import tracemalloc
+import fitz
+import pytest
+from src.pdf_processing.processor import PDFProcessor
+
+SPANS_PER_LINE = 3
+
+def _page_pdf(path, lines):
+    """One page of `lines` lines, each split into SPANS_PER_LINE spans"""
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=lines * 12 + 100)
+    fonts = ["helv", "hebo", "heit"]
+    for line in range(lines):
+        for part in range(SPANS_PER_LINE):
+            page.insert_text((50 + part * 150, 60 + line * 12), f"Zeile {line} Teil {part} ",
+                             fontsize=10, fontname=fonts[part])
+    page.clean_contents()
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def _extract(path):
+    [(blocks, analyzer, page_styles)] = PDFProcessor(path, "analysis")._extract_pages(0, 1)
+    return blocks, analyzer, page_styles
+
+@pytest.mark.parametrize("lines", [10, 80])
+def test_every_span_is_handed_off_once(tmp_path, lines):
+    blocks, analyzer, [page] = _extract(_page_pdf(tmp_path / "page.pdf", lines))
+    assert len(blocks) == lines
+    assert all("_spans" not in block_data for _, block_data in blocks)
+    # Per-line hand-off of the page's spans would count each span once per line
+    assert sum(stats.count for stats in analyzer.style_stats.values()) == lines * SPANS_PER_LINE
+    assert len(page.style) == lines * SPANS_PER_LINE
+
+def test_extraction_memory_is_linear_in_page_size(tmp_path):
+    small, large = 50, 400
+    paths = {lines: _page_pdf(tmp_path / f"lines_{lines}.pdf", lines) for lines in (small, large)}
+    # Warm up, so one-off allocations do not land in the first measurement
+    _extract(paths[small])
+
+    per_line = {}
+    for lines, path in paths.items():
+        tracemalloc.start()
+        result = _extract(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        per_line[lines] = peak / lines
+    # Quadratic growth would multiply bytes per line by the 8x size ratio
+    assert per_line[large] / per_line[small] < 2.0
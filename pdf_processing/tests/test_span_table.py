@@ -0,0 +1,95 @@
+import fitz
+import pytest
+from src.pdf_processing.analysis import TextAnalysisStrategy
+from src.pdf_processing.models import TextSpan
+from src.pdf_processing.span_table import SpanTable
+from src.pdf_processing.text_analysis import TextAnalyzer
+
+@pytest.fixture(scope="module")
+def pages(tmp_path_factory):
+    """Layouts of a few pages in regular, bold, italic and coloured fonts"""
+    path = str(tmp_path_factory.mktemp("pdf") / "styles.pdf")
+    doc = fitz.open()
+    for page_number in range(3):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Kapitel {page_number}", fontsize=16, fontname="hebo")
+        for line in range(6):
+            page.insert_text((72, 110 + line * 14), f"Zeile {line} auf Seite {page_number}", fontsize=10)
+            page.insert_text((300, 110 + line * 14), "kursiv", fontsize=10, fontname="heit")
+        page.insert_text((72, 780), "Fußnote", fontsize=8, color=(0.6, 0, 0))
+    doc.save(path)
+    doc.close()
+    with fitz.open(path) as doc:
+        yield [(page, page.get_text("dict")) for page in doc]
+
+def _spans(strategy, layout, page_number):
+    """One TextSpan per span, as the analysis strategy built them before SpanTable"""
+    spans = []
+    for block in layout["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                is_bold, is_italic, is_underlined = strategy._get_font_flags(span.get("flags", 0))
+                spans.append(TextSpan(
+                    text=span["text"], x0=span["bbox"][0], y0=span["bbox"][1], x1=span["bbox"][2], y1=span["bbox"][3],
+                    font_name=span["font"], font_size=span["size"],
+                    font_color=strategy._get_color_string(span.get("color")),
+                    is_bold=is_bold, is_italic=is_italic, is_underlined=is_underlined, page_number=page_number
+                ))
+    return spans
+
+def _blocks(strategy, spans, page_height):
+    """Line blocks as the analysis strategy built them from TextSpans"""
+    blocks = []
+    for line in strategy.analyzer._group_into_lines(spans):
+        main_span = max(line.spans, key=lambda s: len(s.text))
+        blocks.append({
+            "text_content": " ".join(span.text for span in line.spans),
+            "bbox_coordinates": {"x0": line.x0, "y0": line.y0, "x1": line.x1, "y1": line.y1},
+            "font_size": main_span.font_size,
+            "font_name": main_span.font_name,
+            "font_color": main_span.font_color,
+            "block_type": strategy._determine_block_type(main_span.font_size, line.y0, page_height)
+        })
+    return blocks
+
+def _rounded(report):
+    if isinstance(report, float):
+        return round(report, 9)
+    if isinstance(report, dict):
+        return {key: _rounded(value) for key, value in report.items()}
+    if isinstance(report, (list, tuple)):
+        return [_rounded(value) for value in report]
+    return report
+
+def test_table_holds_the_same_spans(pages):
+    strategy = TextAnalysisStrategy()
+    for page, layout in pages:
+        spans = _spans(strategy, layout, page.number + 1)
+        table = SpanTable.from_layout(layout, page.number + 1, strategy._get_color_string)
+        assert {span.is_bold for span in spans} == {True, False}
+        assert table.to_spans() == spans
+        assert SpanTable.from_spans(spans).to_spans() == spans
+
+def test_concatenated_pages_hold_every_span(pages):
+    strategy = TextAnalysisStrategy()
+    tables = [SpanTable.from_layout(layout, page.number + 1, strategy._get_color_string) for page, layout in pages]
+    expected = [span for page, layout in pages for span in _spans(strategy, layout, page.number + 1)]
+    assert SpanTable.concat(tables).to_spans() == expected
+    assert len(SpanTable.concat([SpanTable.empty()])) == 0
+
+def test_page_blocks_match_the_span_objects(pages):
+    strategy = TextAnalysisStrategy()
+    for page, layout in pages:
+        blocks, _ = strategy.extract_page(page, layout)
+        assert blocks == _blocks(strategy, _spans(strategy, layout, page.number + 1), page.rect.height)
+
+def test_table_statistics_match_the_span_objects(pages):
+    strategy = TextAnalysisStrategy()
+    by_spans, by_table = TextAnalyzer(), TextAnalyzer()
+    for page, layout in pages:
+        spans = _spans(strategy, layout, page.number + 1)
+        by_spans.add_spans(spans)
+        by_table.add_table(SpanTable.from_spans(spans))
+    report = by_spans.report()
+    assert report["common_styles"]
+    assert _rounded(by_table.report()) == _rounded(report)
@@ -0,0 +1,44 @@
+import os
+import re
+import pytest
+from scripts.vendor_pdfjs import FILES, PDFJS_VERSION, TARGET_DIR, vendor_pdfjs
+
+WEB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "web")
+TEMPLATES_DIR = os.path.join(WEB_DIR, "templates")
+PDFJS_PATHS = {f"js/pdfjs/{name}" for name in FILES.values()}
+
+def _static_paths(template):
+    with open(os.path.join(TEMPLATES_DIR, template), encoding="utf-8") as f:
+        return [path.lstrip("/") for path in re.findall(r"url_for\('static', path='([^']+)'\)", f.read())]
+
+@pytest.mark.parametrize("template", sorted(os.listdir(TEMPLATES_DIR)))
+def test_templates_only_reference_existing_static_files(template):
+    for path in _static_paths(template):
+        assert os.path.isfile(os.path.join(WEB_DIR, "static", path)), path
+
+def test_pdfjs_is_vendored():
+    for name in FILES.values():
+        assert os.path.isfile(os.path.join(TARGET_DIR, name)), f"run scripts/vendor_pdfjs.py to vendor {name}"
+    with open(os.path.join(TARGET_DIR, "pdf.mjs"), encoding="utf-8") as f:
+        assert f'pdfjsVersion = "{PDFJS_VERSION}"' in f.read()
+
+def test_viewer_loads_the_vendored_pdfjs_build():
+    paths = set(_static_paths("pdf_analysis_view.html"))
+    assert {"js/pdfjs/pdf.mjs", "js/pdfjs/pdf.worker.mjs"} <= paths <= PDFJS_PATHS
+
+def test_viewer_falls_back_to_the_highlighted_pdf():
+    with open(os.path.join(TEMPLATES_DIR, "pdf_analysis_view.html"), encoding="utf-8") as f:
+        assert 'data-fallback-url="/analysis/{{ document.id }}/highlighted-pdf"' in f.read()
+    with open(os.path.join(WEB_DIR, "static", "js", "viewer.js"), encoding="utf-8") as f:
+        assert "embedHighlightedPdf(highlightViewer)" in f.read()
+
+def test_viewer_never_evaluates_pdf_fonts():
+    with open(os.path.join(WEB_DIR, "static", "js", "viewer.js"), encoding="utf-8") as f:
+        viewer = f.read()
+    for call in re.findall(r"getDocument\(\{(.*?)\}\)", viewer, re.S):
+        assert re.search(r"isEvalSupported:\s*false", call)
+
+def test_vendoring_refuses_releases_with_font_eval(tmp_path):
+    with pytest.raises(ValueError, match="CVE-2024-4367"):
+        vendor_pdfjs("3.0.279", str(tmp_path))
+    assert os.listdir(tmp_path) == []